@@ -1,8 +1,33 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from src.app.api_overview import router as overview_router
+from src.app.api_recommendation import router as recommendation_router
+from src.app.api_anomaly_daily import router as anomaly_daily_router
+from src.app.api_anomaly_weekly import router as anomaly_weekly_router
+from src.app.api_export import router as export_router
+from src.app.api_funds import router as funds_router
+from src.app.snapshots import store
+
+try:  # brotli optionnel (pip install brotli-asgi), gzip sinon
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+COMPRESS_MIN_SIZE = 1024  # octets: en dessous, la compression ne vaut pas le coût
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # chargement / rechargement des datasets en tâche de fond (hors requêtes)
+    store.start()
+    yield
+    await store.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Configuration CORS pour permettre les requêtes du frontend
 app.add_middleware(
@@ -13,4 +38,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compression des réponses JSON (listes paginées, exports)
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESS_MIN_SIZE)  # repli gzip intégré
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE)
+
 app.include_router(overview_router, prefix="/api")
+app.include_router(recommendation_router, prefix="/api")
+app.include_router(anomaly_daily_router, prefix="/api")
+app.include_router(anomaly_weekly_router, prefix="/api")
+app.include_router(export_router, prefix="/api")
+app.include_router(funds_router, prefix="/api")
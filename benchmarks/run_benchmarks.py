@@ -0,0 +1,253 @@
+"""
+Benchmarks du pipeline sur marché synthétique (benchmarks/synthetic_market.py).
+
+Pour chaque échelle (fonds x années): copie de src/ dans un espace de travail
+temporaire, génération des fichiers bruts, exécution des étapes via
+l'orchestrateur (séquentiel: mesures non perturbées), puis sonde de l'API
+overview. Rapporte temps, CPU, pic mémoire, débit (lignes / s) et part lecture /
+écriture Excel (traces src/pipeline/tracing.py) et compare au baseline stocké.
+
+    python -m benchmarks.run_benchmarks                        # 100x1 (défaut)
+    python -m benchmarks.run_benchmarks --funds 100 1000 10000 --years 1 5 20
+    python -m benchmarks.run_benchmarks --save-baseline
+    python -m benchmarks.run_benchmarks --threshold 1.5         # tolérance vs baseline
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from benchmarks.synthetic_market import write_market
+from src.pipeline.tracing import wait_child
+
+ROOT = Path(__file__).resolve().parents[1]
+BENCH_DIR = ROOT / "benchmarks"
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+RESULTS_DIR = BENCH_DIR / "results"
+
+# limite d'une feuille Excel (en-tête compris): au-delà, la chaîne actuelle ne peut pas écrire
+EXCEL_MAX_ROWS = 1_048_575
+TRADING_DAYS = 252
+
+STAGES = [
+    "clean_daily", "clean_weekly",
+    "features_daily", "features_weekly",
+    "anomaly_daily", "anomaly_weekly",
+    "cross_anomalies", "fund_risk_scoring", "rollups",
+    "predict_model", "projection_30jrs", "recommender",
+]
+WEEKLY_STAGES = {"clean_weekly", "features_weekly", "anomaly_weekly"}
+
+# exécutée dans l'espace de travail (DATA_DIR relatif = src/scraper)
+OVERVIEW_PROBE = """
+import json, time
+from src.app.snapshots import uncached
+from src.app.api_overview import load_data, get_overview_metrics
+t0 = time.perf_counter()
+data = uncached(load_data)()
+t1 = time.perf_counter()
+for _ in range(5):
+    get_overview_metrics("WAFA GESTION", data=data)
+t2 = time.perf_counter()
+print(json.dumps({"load_s": t1 - t0, "metrics_s": (t2 - t1) / 5}))
+"""
+
+
+def _mb(value: Optional[float]) -> str:
+    return f"{value:>8.1f} Mo" if value is not None else f"{'n/d':>8} Mo"
+
+
+def _run(cmd: List[str], cwd: Path, env: Optional[dict] = None) -> dict:
+    """Process enfant: code retour, sortie, temps réel, CPU et pic RSS (None si non mesurables)."""
+    t0 = time.time()
+    proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            env={**os.environ, **(env or {})}, text=True)
+    out: List[str] = []
+    reader = threading.Thread(target=lambda: out.append(proc.stdout.read()), daemon=True)
+    reader.start()
+    usage = wait_child(proc)   # wait4 (POSIX) / psutil / None: voir src/pipeline/tracing.py
+    reader.join()
+    return {
+        "returncode": proc.returncode,
+        "output": "".join(out),
+        "wall_s": round(time.time() - t0, 3),
+        **usage,
+    }
+
+
+def _workspace(n_funds: int, years: float) -> Path:
+    ws = Path(tempfile.mkdtemp(prefix=f"opcvm_bench_{n_funds}x{years:g}_"))
+    shutil.copytree(
+        ROOT / "src", ws / "src",
+        ignore=shutil.ignore_patterns("__pycache__", "*.xlsx", "*.csv", "*.jsonl", "vl_panel",
+                                      "traces", "pipeline_logs", ".pipeline_state.json"),
+    )
+    return ws
+
+
+def _span_seconds(ws: Path, stage: str) -> Dict[str, float]:
+    """Temps des spans load / export de la dernière trace de l'étape (0 si non instrumentée)."""
+    path = ws / "src" / "scraper" / "traces" / f"{stage}.jsonl"
+    if not path.exists():
+        return {}
+    trace = json.loads(path.read_text(encoding="utf-8").splitlines()[-1])
+    out: Dict[str, float] = {}
+    for s in trace["spans"]:
+        if s["name"] in ("load", "export"):
+            out[f"{s['name']}_s"] = round(out.get(f"{s['name']}_s", 0.0) + s["wall_s"], 3)
+    return out
+
+
+def _quality(ws: Path) -> dict:
+    """Rappel des chocs injectés par l'Isolation Forest daily (détection au jour près)."""
+    data = ws / "src" / "scraper"
+    truth = pd.read_csv(data / "synthetic_truth.csv", parse_dates=["DATE"])
+    res = pd.read_excel(data / "anomaly_results_daily.xlsx", usecols=["CODE_ISIN", "DATE", "ANOMALY_FLAG_IF"])
+    res["DATE"] = pd.to_datetime(res["DATE"])
+    flagged = res[res["ANOMALY_FLAG_IF"] == 1][["CODE_ISIN", "DATE"]]
+    shocks = truth[truth["ANOMALY_TYPE"] == "SHOCK"]
+    hit = shocks.merge(flagged, on=["CODE_ISIN", "DATE"], how="inner")
+    return {
+        "injected_shocks": int(len(shocks)),
+        "shock_recall_if": round(len(hit) / len(shocks), 4) if len(shocks) else None,
+        "flag_rate_if": round(float(res["ANOMALY_FLAG_IF"].mean()), 4),
+    }
+
+
+def bench_scale(n_funds: int, years: float, seed: int = 42, keep: bool = False) -> dict:
+    key = f"{n_funds}x{years:g}"
+    est_rows = n_funds * int(round(TRADING_DAYS * years))
+    if est_rows > EXCEL_MAX_ROWS:
+        print(f"⏭ {key} : ~{est_rows} lignes > limite Excel ({EXCEL_MAX_ROWS}), échelle ignorée")
+        return {"scale": key, "skipped": f"~{est_rows} rows exceed the Excel sheet limit"}
+
+    ws = _workspace(n_funds, years)
+    print(f"\n🧪 {key} → {ws}")
+    try:
+        t0 = time.perf_counter()
+        info = write_market(ws / "src" / "scraper", n_funds, years, seed)
+        info["generate_s"] = round(time.perf_counter() - t0, 3)
+        print(f"✔ {info['daily_rows']} lignes daily générées ({info['generate_s']}s)")
+
+        run = _run([sys.executable, "-m", "src.pipeline.orchestrator", "--force", "--jobs", "1",
+                    "--only", *STAGES], cwd=ws)
+        if run["returncode"] != 0:
+            print(run["output"][-3000:])
+            return {"scale": key, **info, "failed": "pipeline"}
+
+        stages: Dict[str, dict] = {}
+        runs_file = ws / "src" / "scraper" / "pipeline_runs.jsonl"
+        for line in runs_file.read_text(encoding="utf-8").splitlines():
+            r = json.loads(line)
+            rows = info["weekly_rows"] if r["stage"] in WEEKLY_STAGES else info["daily_rows"]
+            stages[r["stage"]] = {
+                "wall_s": r["wall_s"], "cpu_s": r["cpu_s"], "max_rss_mb": r["max_rss_mb"],
+                "rows_per_s": round(rows / r["wall_s"], 1) if r["wall_s"] else None,
+                **_span_seconds(ws, r["stage"]),
+            }
+            print(f"  {r['stage']:<20} {r['wall_s']:>8.2f}s  {_mb(r['max_rss_mb'])}")
+
+        probe = _run([sys.executable, "-c", OVERVIEW_PROBE], cwd=ws)
+        if probe["returncode"] == 0:
+            timings = json.loads(probe["output"].strip().splitlines()[-1])
+            stages["api_overview"] = {
+                "wall_s": round(timings["load_s"] + timings["metrics_s"], 3),
+                "load_s": round(timings["load_s"], 3),
+                "metrics_s": round(timings["metrics_s"], 4),
+                "max_rss_mb": probe["max_rss_mb"],
+                "rows_per_s": round(info["daily_rows"] / timings["load_s"], 1),
+            }
+            print(f"  {'api_overview':<20} {stages['api_overview']['wall_s']:>8.2f}s  {_mb(probe['max_rss_mb'])}")
+        else:
+            print(f"❌ sonde overview en échec:\n{probe['output'][-2000:]}")
+
+        return {"scale": key, **info, "stages": stages, "quality": _quality(ws)}
+    finally:
+        if keep:
+            print(f"📁 espace de travail conservé: {ws}")
+        else:
+            shutil.rmtree(ws, ignore_errors=True)
+
+
+# ======================================================
+# Baseline
+# ======================================================
+def compare(results: dict, baseline: dict, threshold: float, min_wall_s: float = 0.5) -> List[dict]:
+    """Étapes plus lentes (ou plus gourmandes) que threshold x baseline, par échelle."""
+    out = []
+    for key, res in results["scales"].items():
+        base = baseline.get("scales", {}).get(key, {}).get("stages", {})
+        for stage, cur in res.get("stages", {}).items():
+            ref = base.get(stage)
+            if not ref:
+                continue
+            for metric in ("wall_s", "max_rss_mb"):
+                if ref.get(metric) and cur.get(metric) is not None:
+                    ratio = cur[metric] / ref[metric]
+                    if ratio >= threshold and (metric != "wall_s" or cur[metric] >= min_wall_s):
+                        out.append({"scale": key, "stage": stage, "metric": metric,
+                                    "current": cur[metric], "baseline": ref[metric], "ratio": round(ratio, 2)})
+    return out
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks du pipeline OPCVM (marché synthétique)")
+    parser.add_argument("--funds", type=int, nargs="+", default=[100])
+    parser.add_argument("--years", type=float, nargs="+", default=[1])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threshold", type=float, default=1.25, help="ratio max vs baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--keep", action="store_true", help="conserver les espaces de travail")
+    args = parser.parse_args(argv)
+
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count(), "pandas": pd.__version__},
+        "scales": {},
+    }
+    for n in args.funds:
+        for y in args.years:
+            res = bench_scale(n, y, args.seed, args.keep)
+            results["scales"][res["scale"]] = res
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out_file = RESULTS_DIR / f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    out_file.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"\n💾 Résultats → {out_file.relative_to(ROOT)}")
+
+    if args.save_baseline:
+        baseline = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {"scales": {}}
+        baseline.update({k: v for k, v in results.items() if k != "scales"})
+        baseline["scales"].update(results["scales"])
+        BASELINE_FILE.write_text(json.dumps(baseline, indent=2), encoding="utf-8")
+        print(f"📌 Baseline mis à jour → {BASELINE_FILE.relative_to(ROOT)}")
+        return 0
+
+    if not BASELINE_FILE.exists():
+        print("ℹ️ Pas de baseline (--save-baseline pour en créer un)")
+        return 0
+    regressions = compare(results, json.loads(BASELINE_FILE.read_text()), args.threshold)
+    if not regressions:
+        print(f"✅ Aucune régression vs baseline (seuil x{args.threshold})")
+        return 0
+    for r in regressions:
+        print(f"⚠️ {r['scale']:<8} {r['stage']:<20} {r['metric']:<11} "
+              f"{r['current']} vs {r['baseline']} (x{r['ratio']})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
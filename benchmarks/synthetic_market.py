@@ -0,0 +1,147 @@
+"""
+Marché OPCVM synthétique (format des fichiers fusionnés par les scrapers ASFIM).
+
+    N fonds x M jours ouvrés, trajectoires de VL par catégorie (volatilité par
+    régime), sociétés de gestion, classifications, et anomalies injectées
+    (chocs de VL, VL figées) dont la vérité terrain est renvoyée à part.
+
+    python -m benchmarks.synthetic_market --funds 100 --years 1 --out /tmp/market
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+END_DATE = "2025-06-30"
+
+# société -> poids (nb de fonds relatif)
+COMPANIES = {
+    "WAFA GESTION": 5, "CDG CAPITAL GESTION": 3, "BMCE CAPITAL GESTION": 3, "ATTIJARI": 2,
+    "UPLINE CAPITAL MANAGEMENT": 2, "SOGECAPITAL GESTION": 2, "CFG GESTION": 2,
+    "RMA ASSET MANAGEMENT": 1, "BMCI GESTION": 1, "VALORIS MANAGEMENT": 1,
+}
+# classification -> (rendement journalier moyen, volatilité journalière)
+CATEGORIES = {
+    "ACTIONS": (0.0004, 0.010),
+    "DIVERSIFIE": (0.0003, 0.005),
+    "OBLIGATIONS MLT": (0.0002, 0.002),
+    "OBLIGATIONS OCT": (0.00015, 0.0008),
+    "MONETAIRE": (0.0001, 0.0002),
+    "CONTRACTUEL": (0.0002, 0.003),
+}
+
+SHOCK_RATE = 0.002        # part des (fonds, jour) avec un choc de VL
+STALE_RATE = 0.001        # part des (fonds, jour) où la VL reste figée
+MISSING_RATE = 0.002      # lignes absentes (jour non publié pour le fonds)
+
+
+def _pct(x: np.ndarray) -> np.ndarray:
+    """Format des tableaux ASFIM: '0,123%' (virgule décimale)."""
+    out = np.char.mod("%.3f%%", np.nan_to_num(x * 100))
+    return np.char.replace(out, ".", ",")
+
+
+def generate_market(
+    n_funds: int,
+    years: float,
+    seed: int = 42,
+    end: str = END_DATE,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Retourne (daily_raw, weekly_raw, truth):
+      daily_raw / weekly_raw: colonnes brutes des scrapers (source_file, CODE ISIN, VL, 1 JOUR...)
+      truth: (CODE_ISIN, DATE, ANOMALY_TYPE) des anomalies injectées.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=end, periods=int(round(TRADING_DAYS * years)))
+    m, n = len(dates), n_funds
+
+    names = list(COMPANIES)
+    weights = np.array(list(COMPANIES.values()), dtype=float)
+    company = rng.choice(names, size=n, p=weights / weights.sum())
+    category = rng.choice(list(CATEGORIES), size=n)
+    mu = np.array([CATEGORIES[c][0] for c in category])
+    sigma = np.array([CATEGORIES[c][1] for c in category])
+
+    # volatilité par régime (marche aléatoire lissée du log-multiplicateur)
+    regime = np.exp(np.cumsum(rng.normal(0, 0.05, (m, n)), axis=0) * 0.2).clip(0.3, 3.0)
+    ret = mu + sigma * regime * rng.standard_normal((m, n))
+
+    shock = rng.random((m, n)) < SHOCK_RATE
+    ret[shock] += rng.choice([-1, 1], shock.sum()) * rng.uniform(0.04, 0.12, shock.sum())
+    stale = (rng.random((m, n)) < STALE_RATE) & ~shock
+    ret[stale] = 0.0
+    ret[0] = 0.0
+
+    vl = rng.uniform(100, 10_000, n) * np.cumprod(1 + ret, axis=0)
+
+    wide_ret = pd.DataFrame(ret, index=dates)
+    log_ret = np.log1p(wide_ret)
+    week = np.expm1(log_ret.rolling(5, min_periods=1).sum()).to_numpy()
+    month = np.expm1(log_ret.rolling(21, min_periods=1).sum()).to_numpy()
+    ytd = np.expm1(log_ret.groupby(dates.year).cumsum()).to_numpy()
+
+    # format long (fonds x jour), jours non publiés retirés
+    keep = rng.random((m, n)) >= MISSING_RATE
+    di, fi = np.nonzero(keep)
+    isin = np.char.add("MA", np.char.zfill(np.arange(n).astype(str), 10))
+    day_str = dates.strftime("%d-%m-%Y").to_numpy().astype(str)
+
+    daily = pd.DataFrame({
+        "source_file": np.char.add(np.char.add("Tableau_des_performances_quotidiennes_au_", day_str[di]), ".xlsx"),
+        "CODE ISIN": isin[fi],
+        "OPCVM": np.char.add("FONDS ", np.arange(n).astype(str))[fi],
+        "SOCIETE DE GESTION": company[fi],
+        "CLASSIFICATION": category[fi],
+        "PERIODICITE VL": "Quotidienne",
+        "SENSIBILITE": "-",
+        "VL": np.char.replace(np.char.mod("%.2f", vl[di, fi]), ".", ","),
+        "1 JOUR": _pct(ret[di, fi]),
+        "1 SEMAINE": _pct(week[di, fi]),
+        "1 MOIS": _pct(month[di, fi]),
+        "YTD": _pct(ytd[di, fi]),
+    })
+
+    # hebdomadaire: tableaux du vendredi
+    friday = dates.dayofweek[di] == 4
+    weekly = daily[friday].copy()
+    weekly["source_file"] = weekly["source_file"].str.replace("quotidiennes", "hebdomadaires", regex=False)
+    weekly = weekly.reset_index(drop=True)
+
+    t_day, t_fund = np.nonzero((shock | stale) & keep)
+    truth = pd.DataFrame({
+        "CODE_ISIN": isin[t_fund],
+        "DATE": dates[t_day],
+        "ANOMALY_TYPE": np.where(shock[t_day, t_fund], "SHOCK", "STALE"),
+    })
+    return daily, weekly, truth
+
+
+def write_market(out_dir, n_funds: int, years: float, seed: int = 42) -> dict:
+    """Écrit les fichiers bruts attendus par clean_daily / clean_weekly / fusion_asfim."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    daily, weekly, truth = generate_market(n_funds, years, seed)
+    daily.to_excel(out / "performance_quotidienne_asfim.xlsx", index=False)
+    weekly.to_excel(out / "performance_hebdomadaire_asfim.xlsx", index=False)
+    truth.to_csv(out / "synthetic_truth.csv", index=False)
+    return {"daily_rows": len(daily), "weekly_rows": len(weekly), "injected_anomalies": len(truth)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère un marché OPCVM synthétique")
+    parser.add_argument("--funds", type=int, default=100)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    print(f"🧪 Marché synthétique: {args.funds} fonds x {args.years} an(s)...")
+    info = write_market(args.out, args.funds, args.years, args.seed)
+    print(f"✔ {info['daily_rows']} lignes daily, {info['weekly_rows']} weekly, "
+          f"{info['injected_anomalies']} anomalies injectées → {args.out}")
@@ -2,12 +2,20 @@ import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
+import joblib
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.change_capture import plan
+from src.pipeline.tracing import span, step
 
 # ======================================================
 # CONFIG
 # ======================================================
 INPUT_FILE = "../scraper/features_anomaly_daily.xlsx"
 OUTPUT_FILE = "../scraper/anomaly_results_daily.xlsx"
+MODEL_FILE = "../scraper/anomaly_model_daily.joblib"   # scaler + Isolation Forest du dernier fit
 
 FEATURES = [
     "RET_1J",
@@ -18,12 +26,29 @@ FEATURES = [
 ]
 
 print("📥 Chargement features anomalies daily...")
-df = pd.read_excel(INPUT_FILE)
+with span("load", file=INPUT_FILE) as s:
+    df = pd.read_excel(INPUT_FILE)
+    s.rows = len(df)
+
+# Détection de changement sur toutes les features du modèle (les ZSCORE_* sont
+# normalisés sur l'historique du fonds: une séance ajoutée les modifie tous).
+# Re-fit à chaque nouvelle séance (ou nouveau fonds) => reconstruction complète,
+# identique à un calcul from scratch. Republications seules: toutes les
+# lignes des fonds touchés sont re-scorées avec le modèle du dernier fit.
+KEY = "FUND_ID" if "FUND_ID" in df.columns else "CODE_ISIN"
+inc = plan("anomaly_daily", df, KEY, outputs=[OUTPUT_FILE, MODEL_FILE], script=__file__,
+           columns=[KEY, "DATE"] + FEATURES)
+if not inc.full and (len(inc.tail) or not pd.Index(inc.changed).isin(inc.previous()[KEY]).all()):
+    inc.rebuild("nouvelle séance ou nouveau fonds => re-fit du modèle")
+print(f"✔ Mode : {inc.describe()}")
 
 # ======================================================
 # 1) Sélection & nettoyage des features
 # ======================================================
-X = df[FEATURES].copy()
+step("feature", rows=len(df))
+if not inc.full:
+    df = inc.carry(df, inc.previous(), ["ANOMALY_SCORE_IF", "ANOMALY_LABEL_IF"])
+X = df.loc[inc.touched(df), FEATURES].copy()
 
 # Remplacer inf par NaN
 X = X.replace([np.inf, -np.inf], np.nan)
@@ -37,26 +62,35 @@ print(f"✔ Lignes exploitables pour le ML : {len(X)}")
 # ======================================================
 # 2) Standardisation
 # ======================================================
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+if inc.full:
+    step("fit", rows=len(X))
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+else:
+    scaler, model = joblib.load(MODEL_FILE)
+    X_scaled = scaler.transform(X) if len(X) else np.empty((0, len(FEATURES)))
 
 # ======================================================
 # 3) Modèle Isolation Forest
 # ======================================================
-model = IsolationForest(
-    n_estimators=200,
-    contamination=0.02,   # ~2% anomalies
-    random_state=42,
-    n_jobs=-1
-)
+if inc.full:
+    model = IsolationForest(
+        n_estimators=200,
+        contamination=0.02,   # ~2% anomalies
+        random_state=42,
+        n_jobs=-1
+    )
 
-model.fit(X_scaled)
+    model.fit(X_scaled)
+    joblib.dump((scaler, model), MODEL_FILE)
 
 # ======================================================
 # 4) Scores & labels
 # ======================================================
-df.loc[valid_idx, "ANOMALY_SCORE_IF"] = model.decision_function(X_scaled)
-df.loc[valid_idx, "ANOMALY_LABEL_IF"] = model.predict(X_scaled)
+step("score", rows=len(X))
+if len(X):
+    df.loc[valid_idx, "ANOMALY_SCORE_IF"] = model.decision_function(X_scaled)
+    df.loc[valid_idx, "ANOMALY_LABEL_IF"] = model.predict(X_scaled)
 
 # Convention lisible
 df["ANOMALY_FLAG_IF"] = (df["ANOMALY_LABEL_IF"] == -1).astype(int)
@@ -73,5 +107,7 @@ print(top[["DATE", "CODE_ISIN", "RET_1J", "ZSCORE_1J", "VOL_20D", "DRAWDOWN", "A
 # ======================================================
 # 5) Export
 # ======================================================
+step("export", rows=len(df))
 df.to_excel(OUTPUT_FILE, index=False)
+inc.commit(df)
 print(f"🎉 Résultats exportés → {OUTPUT_FILE}")
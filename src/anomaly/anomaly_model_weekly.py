@@ -2,6 +2,11 @@ import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.tracing import span, step
 
 # ======================================================
 # CONFIG
@@ -10,11 +15,14 @@ INPUT_FILE = "../scraper/features_anomaly_weekly.xlsx"
 OUTPUT_FILE = "../scraper/anomaly_results_weekly.xlsx"
 
 print("📥 Chargement features anomalies weekly...")
-df = pd.read_excel(INPUT_FILE)
+with span("load", file=INPUT_FILE) as s:
+    df = pd.read_excel(INPUT_FILE)
+    s.rows = len(df)
 
 # ======================================================
 # 1️⃣ Sécurité sur la date
 # ======================================================
+step("feature", rows=len(df))
 df["WEEK_DATE"] = pd.to_datetime(df["WEEK_DATE"], errors="coerce")
 df = df.dropna(subset=["WEEK_DATE", "CODE_ISIN"])
 
@@ -45,6 +53,7 @@ print(f"✔ Lignes exploitables pour le ML : {len(X)}")
 # ======================================================
 # 3️⃣ Standardisation
 # ======================================================
+step("fit", rows=len(X))
 scaler = StandardScaler()
 X_scaled = scaler.fit_transform(X)
 
@@ -67,6 +76,7 @@ df["ANOMALY_IF"] = df["ANOMALY_IF"].map({1: 0, -1: 1})
 # ======================================================
 # 5️⃣ Résumé
 # ======================================================
+step("score", rows=len(df))
 anomaly_rate = df["ANOMALY_IF"].mean() * 100
 
 print("✔ Détection d’anomalies WEEKLY terminée")
@@ -85,5 +95,6 @@ print(
 # ======================================================
 # 6️⃣ Export
 # ======================================================
+step("export", rows=len(df))
 df.to_excel(OUTPUT_FILE, index=False)
 print(f"\n🎉 Résultats exportés → {OUTPUT_FILE}")
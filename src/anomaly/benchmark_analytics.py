@@ -0,0 +1,182 @@
+import pandas as pd
+import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.preprocessing.vl_panel import PANEL_DIR, load_panel
+
+# ======================================================
+# CONFIG
+# ======================================================
+INPUT_FILE = "../scraper/performance_quotidienne_asfim_clean.xlsx"
+OUTPUT_FILE = "../scraper/benchmark_analytics.xlsx"
+
+WINDOWS = [30, 90, 250]          # fenêtres glissantes (jours de cotation)
+DEFAULT_WINDOW = 90              # fenêtre exposée en BETA / CORRELATION / SHARPE_RATIO / TRACKING_ERROR
+MIN_PERIODS_RATIO = 0.8          # nb minimum d'observations communes dans la fenêtre
+ANNUALIZATION = 252
+RISK_FREE_RATE = 0.0             # taux sans risque annuel (Sharpe)
+
+CATEGORY_CANDIDATES = ["CLASSIFICATION", "CATEGORIE", "CATEGORY", "CLASSE", "TYPE_OPCVM"]
+
+
+# ======================================================
+# Matrices (dates x fonds)
+# ======================================================
+def wide_returns(df):
+    """
+    Pivot long -> large: VL (dates x ISIN) puis rendements journaliers
+    (fallback quand le panel memory-mappé n'existe pas).
+    """
+    vl = df.pivot_table(index="DATE", columns="CODE_ISIN", values="VL", aggfunc="last").sort_index()
+    return vl.pct_change(fill_method=None)
+
+
+def fund_categories(df, isins, category_col=None):
+    """Catégorie (dernière connue) de chaque ISIN du panel, "ALL" si pas de colonne catégorie."""
+    if not category_col:
+        return pd.Series("ALL", index=isins)
+    cats = df.dropna(subset=[category_col]).groupby("CODE_ISIN")[category_col].last()
+    return cats.reindex(isins).fillna("NON_CLASSE").astype(str)
+
+
+def category_index_returns(ret, cats):
+    """
+    Indice équipondéré par catégorie = moyenne (nan-safe) des rendements des fonds de la catégorie.
+    """
+    codes, labels = pd.factorize(cats, sort=True)
+    r = ret.to_numpy(dtype=float)
+    valid = ~np.isnan(r)
+
+    onehot = np.zeros((r.shape[1], len(labels)))
+    onehot[np.arange(r.shape[1]), codes] = 1.0
+    sums = np.where(valid, r, 0.0) @ onehot
+    counts = valid.astype(float) @ onehot
+    with np.errstate(invalid="ignore", divide="ignore"):
+        idx = sums / counts
+
+    return pd.DataFrame(idx, index=ret.index, columns=labels), codes
+
+
+def _rolling_sum(a, window):
+    """Somme glissante sur l'axe 0 via cumsum (toutes les colonnes d'un coup)."""
+    cs = np.cumsum(a, axis=0)
+    out = cs.copy()
+    out[window:] = cs[window:] - cs[:-window]
+    return out
+
+
+def rolling_benchmark_stats(r, b, window, min_periods):
+    """
+    r, b: (dates x fonds) rendements du fonds et de son indice catégorie.
+    Statistiques glissantes sur les observations communes (pairwise complete):
+    BETA, CORRELATION, SHARPE_RATIO (annualisé), TRACKING_ERROR (annualisée).
+    """
+    valid = ~np.isnan(r) & ~np.isnan(b)
+    x = np.where(valid, r, 0.0)
+    y = np.where(valid, b, 0.0)
+
+    n = _rolling_sum(valid.astype(float), window)
+    sx, sy = _rolling_sum(x, window), _rolling_sum(y, window)
+    sxx, syy, sxy = _rolling_sum(x * x, window), _rolling_sum(y * y, window), _rolling_sum(x * y, window)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = (sxy - sx * sy / n) / (n - 1)
+        var_x = (sxx - sx * sx / n) / (n - 1)
+        var_y = (syy - sy * sy / n) / (n - 1)
+        var_a = np.clip(var_x + var_y - 2 * cov, 0, None)
+
+        rf = RISK_FREE_RATE / ANNUALIZATION
+        stats = {
+            "BETA": cov / var_y,
+            "CORRELATION": cov / np.sqrt(var_x * var_y),
+            "SHARPE_RATIO": (sx / n - rf) / np.sqrt(var_x) * np.sqrt(ANNUALIZATION),
+            "TRACKING_ERROR": np.sqrt(var_a) * np.sqrt(ANNUALIZATION),
+        }
+
+    too_short = n < min_periods
+    for k, v in stats.items():
+        v[too_short | ~np.isfinite(v)] = np.nan
+    return stats
+
+
+def last_valid(a):
+    """Dernière valeur non-NaN de chaque colonne (vectorisé)."""
+    ok = ~np.isnan(a)
+    pos = np.where(ok, np.arange(a.shape[0])[:, None], -1).max(axis=0)
+    out = np.full(a.shape[1], np.nan)
+    has = pos >= 0
+    out[has] = a[pos[has], np.flatnonzero(has)]
+    return out
+
+
+if __name__ == "__main__":
+    try:
+        panel = load_panel(PANEL_DIR)
+        print(f"📥 Panel VL memory-mappé ({panel.meta['version']})...")
+    except FileNotFoundError:
+        panel = None
+
+    # sans panel: la VL est relue depuis le fichier long
+    wanted = {"CODE_ISIN", "DATE", "OPCVM", "SOCIETE_DE_GESTION", *CATEGORY_CANDIDATES}
+    if panel is None:
+        wanted.add("VL")
+
+    print("📥 Chargement données daily clean...")
+    df = pd.read_excel(INPUT_FILE, usecols=lambda c: str(c).upper().strip() in wanted)
+    df.columns = df.columns.str.upper().str.strip()
+    df["DATE"] = pd.to_datetime(df["DATE"], errors="coerce")
+    df["CODE_ISIN"] = df["CODE_ISIN"].astype(str).str.strip().str.upper()
+    df = df.dropna(subset=["DATE", "CODE_ISIN"])
+
+    cat_col = next((c for c in CATEGORY_CANDIDATES if c in df.columns), None)
+    print(f"✔ Colonne catégorie : {cat_col or 'aucune (indice marché unique)'}")
+
+    # ======================================================
+    # 1) Panel rendements + indices catégorie équipondérés
+    # ======================================================
+    if panel is not None:
+        ret = pd.DataFrame(np.asarray(panel.ret, dtype=float), index=panel.dates, columns=panel.isins)
+    else:
+        ret = wide_returns(df.dropna(subset=["VL"]))
+    cats = fund_categories(df, ret.columns, cat_col)
+    idx_ret, codes = category_index_returns(ret, cats)
+    print(f"✔ Panel : {ret.shape[0]} dates x {ret.shape[1]} fonds, {idx_ret.shape[1]} indice(s)")
+
+    r = ret.to_numpy(dtype=float)
+    b = idx_ret.to_numpy(dtype=float)[:, codes]   # indice de la catégorie de chaque fonds
+
+    # ======================================================
+    # 2) Statistiques glissantes 30 / 90 / 250 jours
+    # ======================================================
+    print("📊 Bêta / corrélation / Sharpe / tracking error glissants...")
+    latest = pd.DataFrame(index=ret.columns)
+    latest["CATEGORY"] = cats.values
+    for w in WINDOWS:
+        stats = rolling_benchmark_stats(r, b, w, min_periods=int(np.ceil(w * MIN_PERIODS_RATIO)))
+        for name, arr in stats.items():
+            latest[f"{name}_{w}D"] = last_valid(arr)
+
+    # colonnes attendues par api_wafa_vs_market.compute_basic_metrics
+    for name in ["BETA", "CORRELATION", "SHARPE_RATIO", "TRACKING_ERROR"]:
+        latest[name] = latest[f"{name}_{DEFAULT_WINDOW}D"]
+
+    ident_cols = [c for c in ["OPCVM", "SOCIETE_DE_GESTION"] if c in df.columns]
+    ident = df.sort_values("DATE").groupby("CODE_ISIN")[ident_cols].last()
+    latest = ident.join(latest, how="right")
+    latest.index.name = "CODE_ISIN"
+    latest = latest.reset_index().round(6)
+
+    # niveau des indices (base 100) pour les graphes
+    idx_level = (1 + idx_ret.fillna(0)).cumprod() * 100
+
+    # ======================================================
+    # 3) Export
+    # ======================================================
+    with pd.ExcelWriter(OUTPUT_FILE, engine="openpyxl") as writer:
+        latest.to_excel(writer, sheet_name="FUND_BENCHMARK_METRICS", index=False)
+        idx_level.round(4).to_excel(writer, sheet_name="CATEGORY_INDEX")
+
+    print(f"✔ Fonds : {len(latest)}")
+    print(f"\n🎉 Analytics vs indice catégorie exportées → {OUTPUT_FILE}")
@@ -1,5 +1,11 @@
 import pandas as pd
 import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.tracing import span, step
+from src.preprocessing.asof_join import asof_join, format_report
 
 # =====================================================
 # CONFIG
@@ -8,14 +14,23 @@ DAILY_FILE = "../scraper/anomaly_results_daily.xlsx"
 WEEKLY_FILE = "../scraper/anomaly_results_weekly.xlsx"
 OUTPUT_FILE = "../scraper/anomaly_cross_daily_weekly.xlsx"
 
+# Ancienneté max (jours) du signal hebdo rattaché à un jour (au-delà: flag weekly = 0).
+# None = pas de limite (comportement historique); ex: 14 pour ignorer les signaux périmés
+WEEKLY_TOLERANCE_DAYS = None
+
 print("📥 Chargement des résultats d’anomalies...")
 
-df_daily = pd.read_excel(DAILY_FILE)
-df_weekly = pd.read_excel(WEEKLY_FILE)
+with span("load", file=DAILY_FILE) as s:
+    df_daily = pd.read_excel(DAILY_FILE)
+    s.rows = len(df_daily)
+with span("load", file=WEEKLY_FILE) as s:
+    df_weekly = pd.read_excel(WEEKLY_FILE)
+    s.rows = len(df_weekly)
 
 # =====================================================
 # 1) Préparation dates
 # =====================================================
+step("clean", rows=len(df_daily))
 df_daily["DATE"] = pd.to_datetime(df_daily["DATE"])
 df_weekly["WEEK_DATE"] = pd.to_datetime(df_weekly["WEEK_DATE"])
 
@@ -26,37 +41,39 @@ df_daily["ANOMALY_DAILY_FLAG"] = (df_daily["ANOMALY_SCORE_IF"] < 0).astype(int)
 df_weekly["ANOMALY_WEEKLY_FLAG"] = (df_weekly["ANOMALY_SCORE_IF"] < 0).astype(int)
 
 # =====================================================
-# 3) Merge asof ISIN par ISIN (SOLUTION ROBUSTE)
+# 3) Jointure as-of DAILY ↔ WEEKLY (une passe, tous fonds)
 # =====================================================
-print("🔗 Croisement DAILY ↔ WEEKLY par CODE_ISIN...")
-
-results = []
+step("merge", rows=len(df_daily))
+print("🔗 Croisement DAILY ↔ WEEKLY (as-of)...")
 
-for isin in df_daily["CODE_ISIN"].unique():
-    d_daily = df_daily[df_daily["CODE_ISIN"] == isin].sort_values("DATE")
-    d_weekly = df_weekly[df_weekly["CODE_ISIN"] == isin].sort_values("WEEK_DATE")
-
-    if d_weekly.empty:
-        d_daily["ANOMALY_WEEKLY_FLAG"] = 0
-        results.append(d_daily)
-        continue
-
-    merged = pd.merge_asof(
-        d_daily,
-        d_weekly[["WEEK_DATE", "ANOMALY_WEEKLY_FLAG"]],
-        left_on="DATE",
-        right_on="WEEK_DATE",
-        direction="backward"
+# Clés entières (FUND_ID / DATE_ID) si présentes des deux côtés, sinon CODE_ISIN / dates
+both = set(df_daily.columns) & set(df_weekly.columns)
+KEY = "FUND_ID" if "FUND_ID" in both else "CODE_ISIN"
+if "DATE_ID" in both:
+    ON, RIGHT_ON, TOLERANCE = "DATE_ID", "DATE_ID", WEEKLY_TOLERANCE_DAYS
+else:
+    ON, RIGHT_ON, TOLERANCE = "DATE", "WEEK_DATE", (
+        pd.Timedelta(days=WEEKLY_TOLERANCE_DAYS) if WEEKLY_TOLERANCE_DAYS is not None else None
     )
 
-    merged["ANOMALY_WEEKLY_FLAG"] = merged["ANOMALY_WEEKLY_FLAG"].fillna(0)
-    results.append(merged)
+df_daily = df_daily.sort_values(["CODE_ISIN", "DATE"], kind="stable")
+df_cross, report = asof_join(
+    df_daily,
+    df_weekly,
+    on=ON,
+    right_on=RIGHT_ON,
+    by=KEY,
+    columns=["WEEK_DATE", "ANOMALY_WEEKLY_FLAG"],
+    tolerance=TOLERANCE,
+)
+df_cross["ANOMALY_WEEKLY_FLAG"] = df_cross["ANOMALY_WEEKLY_FLAG"].fillna(0)
 
-df_cross = pd.concat(results, ignore_index=True)
+print(f"✔ {format_report(report)}")
 
 # =====================================================
 # 4) Score combiné
 # =====================================================
+step("score", rows=len(df_cross))
 df_cross["ANOMALY_COMBINED_SCORE"] = (
     2 * df_cross["ANOMALY_WEEKLY_FLAG"] +
     1 * df_cross["ANOMALY_DAILY_FLAG"]
@@ -86,5 +103,6 @@ print(df_cross["RISK_LEVEL"].value_counts(normalize=True).round(4) * 100)
 # =====================================================
 # 7) Export
 # =====================================================
+step("export", rows=len(df_cross))
 df_cross.to_excel(OUTPUT_FILE, index=False)
 print(f"\n🎉 Fichier final exporté → {OUTPUT_FILE}")
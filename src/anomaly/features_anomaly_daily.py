@@ -1,56 +1,89 @@
 import pandas as pd
 import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.change_capture import plan
+from src.pipeline.tracing import span, step
 
 INPUT_FILE = "../scraper/performance_quotidienne_asfim_clean.xlsx"
 OUTPUT_FILE = "../scraper/features_anomaly_daily.xlsx"
 
 print("📥 Chargement données daily clean...")
-df = pd.read_excel(INPUT_FILE)
+with span("load", file=INPUT_FILE) as s:
+    df = pd.read_excel(INPUT_FILE)
+    s.rows = len(df)
 
 # Sécurité
 df["DATE"] = pd.to_datetime(df["DATE"])
+# Clé fonds: FUND_ID (int32, attribué au nettoyage) sinon CODE_ISIN
+KEY = "FUND_ID" if "FUND_ID" in df.columns else "CODE_ISIN"
 df = df.sort_values(["CODE_ISIN", "DATE"])
 
+# Recalcul incrémental (change_capture): nouvelles séances => seule la queue
+# de chaque fonds est recalculée (+ WINDOW séances d'amorce pour la volatilité
+# glissante); séances republiées => fonds recalculé en entier
+WINDOW = 20
+inc = plan("features_daily", df, KEY, outputs=[OUTPUT_FILE], script=__file__)
+print(f"✔ Mode : {inc.describe()}")
+df = inc.select(df, context=WINDOW).copy()
+
 # ======================================================
 # 1) RETOUR JOURNALIER (si VL dispo)
 # ======================================================
+step("feature", rows=len(df))
 if "VL" in df.columns:
-    df["RET_1J"] = df.groupby("CODE_ISIN")["VL"].pct_change()
+    df["RET_1J"] = df.groupby(KEY)["VL"].pct_change()
 else:
     df["RET_1J"] = df["1_JOUR"] / 100
 
 # ======================================================
-# 2) Z-SCORE DES PERFORMANCES
+# 2) VOLATILITÉ ROLLING 20 JOURS
+# ======================================================
+df["VOL_20D"] = (
+    df.groupby(KEY)["RET_1J"]
+      .rolling(WINDOW)
+      .std()
+      .reset_index(level=0, drop=True)
+)
+
+# Lignes non recalculées: sortie précédente (amorce écartée)
+if not inc.full:
+    df = inc.merge(inc.previous().drop(columns="ANOMALY_SCORE_RULES"), df)
+    df = df.sort_values(["CODE_ISIN", "DATE"], kind="stable")
+fresh = inc.rows(df)
+touched = inc.touched(df)
+
 # ======================================================
+# 3) Z-SCORE DES PERFORMANCES
+# ======================================================
+# moyenne / écart-type sur tout l'historique du fonds: recalculés pour chaque
+# fonds touché
 def zscore(x):
     return (x - x.mean()) / x.std(ddof=0)
 
-df["ZSCORE_1J"] = df.groupby("CODE_ISIN")["RET_1J"].transform(zscore)
+part = df[touched]
+df.loc[touched, "ZSCORE_1J"] = part.groupby(KEY)["RET_1J"].transform(zscore)
 
 if "1_SEMAINE" in df.columns:
-    df["ZSCORE_1W"] = df.groupby("CODE_ISIN")["1_SEMAINE"].transform(zscore)
+    df.loc[touched, "ZSCORE_1W"] = part.groupby(KEY)["1_SEMAINE"].transform(zscore)
 else:
     df["ZSCORE_1W"] = np.nan
 
-# ======================================================
-# 3) VOLATILITÉ ROLLING 20 JOURS
-# ======================================================
-df["VOL_20D"] = (
-    df.groupby("CODE_ISIN")["RET_1J"]
-      .rolling(20)
-      .std()
-      .reset_index(level=0, drop=True)
-)
-
 # ======================================================
 # 4) DRAWDOWN
 # ======================================================
-df["CUM_MAX_VL"] = df.groupby("CODE_ISIN")["VL"].cummax()
+# lignes reprises: leur CUM_MAX_VL amorce le max cumulé de la queue
+seed = df["VL"].where(fresh, df.get("CUM_MAX_VL"))
+df.loc[touched, "CUM_MAX_VL"] = seed[touched].groupby(df.loc[touched, KEY]).cummax()
 df["DRAWDOWN"] = (df["VL"] - df["CUM_MAX_VL"]) / df["CUM_MAX_VL"]
 
 # ======================================================
 # 5) SCORE D’ANOMALIE (RÈGLES SIMPLES)
 # ======================================================
+# sur tous les fonds: le seuil de volatilité est un quantile global
+step("score", rows=len(df))
 df["ANOMALY_SCORE_RULES"] = 0
 
 df.loc[df["ZSCORE_1J"].abs() > 3, "ANOMALY_SCORE_RULES"] += 1
@@ -63,5 +96,7 @@ print("✔ Features anomalies calculées")
 # ======================================================
 # 6) EXPORT
 # ======================================================
+step("export", rows=len(df))
 df.to_excel(OUTPUT_FILE, index=False)
+inc.commit(df)
 print(f"🎉 Features anomalies exportées → {OUTPUT_FILE}")
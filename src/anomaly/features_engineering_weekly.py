@@ -1,5 +1,10 @@
 import pandas as pd
 import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.tracing import span, step
 
 # ======================================================
 # CONFIG
@@ -8,20 +13,25 @@ INPUT_FILE = "../scraper/performance_hebdomadaire_asfim_clean.xlsx"
 OUTPUT_FILE = "../scraper/features_anomaly_weekly.xlsx"
 
 print("📥 Chargement données weekly clean...")
-df = pd.read_excel(INPUT_FILE)
+with span("load", file=INPUT_FILE) as s:
+    df = pd.read_excel(INPUT_FILE)
+    s.rows = len(df)
 
 # Sécurité dates
 df["WEEK_DATE"] = pd.to_datetime(df["WEEK_DATE"], errors="coerce")
 df = df.dropna(subset=["WEEK_DATE"])
 
 # Trier
+# Clé fonds: FUND_ID (int32, attribué au nettoyage) sinon CODE_ISIN
+KEY = "FUND_ID" if "FUND_ID" in df.columns else "CODE_ISIN"
 df = df.sort_values(["CODE_ISIN", "WEEK_DATE"])
 
 # ======================================================
 # 1️⃣ RETOUR HEBDOMADAIRE
 # ======================================================
+step("feature", rows=len(df))
 if "VL" in df.columns:
-    df["RET_1W"] = df.groupby("CODE_ISIN")["VL"].pct_change()
+    df["RET_1W"] = df.groupby(KEY)["VL"].pct_change()
 else:
     df["RET_1W"] = df["1_SEMAINE"] / 100
 
@@ -31,13 +41,13 @@ else:
 def zscore(x):
     return (x - x.mean()) / x.std(ddof=0)
 
-df["ZSCORE_1W"] = df.groupby("CODE_ISIN")["RET_1W"].transform(zscore)
+df["ZSCORE_1W"] = df.groupby(KEY)["RET_1W"].transform(zscore)
 
 # ======================================================
 # 3️⃣ VOLATILITÉ 12 SEMAINES
 # ======================================================
 df["VOL_12W"] = (
-    df.groupby("CODE_ISIN")["RET_1W"]
+    df.groupby(KEY)["RET_1W"]
       .rolling(12)
       .std()
       .reset_index(level=0, drop=True)
@@ -46,21 +56,21 @@ df["VOL_12W"] = (
 # ======================================================
 # 4️⃣ DRAWDOWN HEBDOMADAIRE
 # ======================================================
-df["CUM_MAX_VL"] = df.groupby("CODE_ISIN")["VL"].cummax()
+df["CUM_MAX_VL"] = df.groupby(KEY)["VL"].cummax()
 df["DRAWDOWN"] = (df["VL"] - df["CUM_MAX_VL"]) / df["CUM_MAX_VL"]
 
 # ======================================================
 # 5️⃣ MOMENTUM
 # ======================================================
 df["MOM_4W"] = (
-    df.groupby("CODE_ISIN")["RET_1W"]
+    df.groupby(KEY)["RET_1W"]
       .rolling(4)
       .mean()
       .reset_index(level=0, drop=True)
 )
 
 df["MOM_12W"] = (
-    df.groupby("CODE_ISIN")["RET_1W"]
+    df.groupby(KEY)["RET_1W"]
       .rolling(12)
       .mean()
       .reset_index(level=0, drop=True)
@@ -69,6 +79,7 @@ df["MOM_12W"] = (
 # ======================================================
 # 6️⃣ SCORE D’ANOMALIE – RULE BASED
 # ======================================================
+step("score", rows=len(df))
 df["ANOMALY_SCORE_RULES"] = 0
 
 df.loc[df["ZSCORE_1W"].abs() > 3, "ANOMALY_SCORE_RULES"] += 1
@@ -81,5 +92,6 @@ print("✔ Features anomalies WEEKLY calculées")
 # ======================================================
 # EXPORT
 # ======================================================
+step("export", rows=len(df))
 df.to_excel(OUTPUT_FILE, index=False)
 print(f"🎉 Features anomalies WEEKLY exportées → {OUTPUT_FILE}")
@@ -1,5 +1,11 @@
 import pandas as pd
 import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.change_capture import plan
+from src.pipeline.tracing import span, step
 
 # ======================================================
 # CONFIG
@@ -8,11 +14,14 @@ INPUT_FILE = "../scraper/anomaly_cross_daily_weekly.xlsx"
 OUTPUT_FILE = "../scraper/fund_risk_score.xlsx"
 
 print("📥 Chargement des anomalies croisées...")
-df = pd.read_excel(INPUT_FILE)
+with span("load", file=INPUT_FILE) as s:
+    df = pd.read_excel(INPUT_FILE)
+    s.rows = len(df)
 
 # ======================================================
 # 1) Normalisation minimale
 # ======================================================
+step("clean", rows=len(df))
 df.columns = df.columns.str.upper().str.strip()
 df["RISK_LEVEL"] = df["RISK_LEVEL"].str.upper()
 
@@ -31,9 +40,21 @@ df["RISK_POINTS"] = df["RISK_LEVEL"].map(RISK_MAP).fillna(0)
 # ======================================================
 # 3) Agrégation par fonds (CODE_ISIN)
 # ======================================================
+step("score", rows=len(df))
 print("📊 Calcul des scores par fonds...")
 
-agg = df.groupby("CODE_ISIN").agg(
+# Groupement sur FUND_ID (int32) si présent; CODE_ISIN reste dans la sortie
+KEY = "FUND_ID" if "FUND_ID" in df.columns else "CODE_ISIN"
+ident = {"CODE_ISIN": ("CODE_ISIN", "first")} if KEY == "FUND_ID" else {}
+
+# Nouvelles séances: agrégats de la queue ajoutés à ceux du run précédent;
+# séances republiées: fonds ré-agrégé en entier
+inc = plan("fund_risk_scoring", df, KEY, outputs=[OUTPUT_FILE], script=__file__,
+           columns=[KEY, "DATE", "RISK_LEVEL", "SOCIETE_DE_GESTION", "OPCVM"] + list(ident))
+print(f"✔ Mode : {inc.describe()}")
+
+agg = inc.select(df).groupby(KEY).agg(
+    **ident,
     SOCIETE_DE_GESTION=("SOCIETE_DE_GESTION", "first"),
     OPCVM=("OPCVM", "first"),
     TOTAL_DAYS=("RISK_LEVEL", "count"),
@@ -41,9 +62,25 @@ agg = df.groupby("CODE_ISIN").agg(
     MEDIUM_RISK_DAYS=("RISK_LEVEL", lambda x: (x == "MEDIUM_RISK").sum()),
     LOW_RISK_DAYS=("RISK_LEVEL", lambda x: (x == "LOW_RISK").sum()),
     RISK_SCORE=("RISK_POINTS", "mean"),
-    LAST_RISK_LEVEL=("RISK_LEVEL", "last")
+    LAST_RISK_LEVEL=("RISK_LEVEL", "last"),
+    RISK_POINTS_SUM=("RISK_POINTS", "sum"),   # état incrémental (non exporté)
+    N_ROWS=("RISK_POINTS", "size"),
 ).reset_index()
 
+# Fonds complétés: compteurs cumulés, RISK_SCORE = somme / nombre de séances
+# (points entiers => identique à la moyenne d'un calcul complet)
+if not inc.full and len(inc.tail):
+    new = agg.set_index(KEY)
+    t = new.index.isin(inc.tail.index)
+    old = inc.previous().set_index(KEY).reindex(new.index[t])
+    for c in ["TOTAL_DAYS", "HIGH_RISK_DAYS", "MEDIUM_RISK_DAYS", "LOW_RISK_DAYS", "RISK_POINTS_SUM", "N_ROWS"]:
+        new.loc[t, c] += old[c]
+    first = [c for c in ["CODE_ISIN", "SOCIETE_DE_GESTION", "OPCVM"] if c in new.columns]
+    new.loc[t, first] = old[first].combine_first(new.loc[t, first])
+    new.loc[t, "LAST_RISK_LEVEL"] = new.loc[t, "LAST_RISK_LEVEL"].fillna(old["LAST_RISK_LEVEL"])
+    new.loc[t, "RISK_SCORE"] = new.loc[t, "RISK_POINTS_SUM"] / new.loc[t, "N_ROWS"]
+    agg = new.reset_index()
+
 # ======================================================
 # 4) Pourcentages
 # ======================================================
@@ -63,7 +100,11 @@ def final_risk_class(row):
     else:
         return "LOW_RISK"
 
-agg["FINAL_RISK_CLASS"] = agg.apply(final_risk_class, axis=1)
+agg["FINAL_RISK_CLASS"] = agg.apply(final_risk_class, axis=1) if len(agg) else pd.Series(dtype=object)
+
+# Fonds inchangés: scores de la sortie précédente
+if not inc.full:
+    agg = inc.merge(inc.previous(), agg)
 
 print("✔ FINAL_RISK_CLASS calculée")
 
@@ -89,8 +130,10 @@ print(f"✔ Fonds WAFA Gestion : {len(wafa_df)}")
 # ======================================================
 # 7) Export Excel multi-feuilles
 # ======================================================
+step("export", rows=len(agg))
 with pd.ExcelWriter(OUTPUT_FILE, engine="openpyxl") as writer:
-    agg.to_excel(writer, sheet_name="ALL_FUNDS", index=False)
-    wafa_df.to_excel(writer, sheet_name="WAFA_GESTION", index=False)
+    agg.drop(columns=["RISK_POINTS_SUM", "N_ROWS"]).to_excel(writer, sheet_name="ALL_FUNDS", index=False)
+    wafa_df.drop(columns=["RISK_POINTS_SUM", "N_ROWS"]).to_excel(writer, sheet_name="WAFA_GESTION", index=False)
+inc.commit(agg)
 
 print(f"\n🎉 Scoring de risque exporté → {OUTPUT_FILE}")
@@ -0,0 +1,183 @@
+import pandas as pd
+import numpy as np
+import os
+
+# ======================================================
+# CONFIG
+# ======================================================
+FUND_SCORE_FILE = "../scraper/fund_risk_score.xlsx"              # historique par fonds
+PRED_30D_FILE   = "../scraper/prediction_future_risk.xlsx"      # projection 30 jours
+PERF_FILE       = "../scraper/performance_quotidienne_asfim_clean.xlsx"  # optionnel (sur/sous-perf)
+OUTPUT_FILE     = "../scraper/peer_comparison_cube.xlsx"
+
+SHEET_FUND_SCORE = "ALL_FUNDS"
+SHEET_PRED_30D   = "PROJECTION_30D_ALL"
+
+RISK_CLASSES = ["NORMAL", "LOW_RISK", "MEDIUM_RISK", "HIGH_RISK"]
+
+# métriques moyennées / médianes / écart-type (société vs marché hors société)
+HIST_METRICS = ["RISK_SCORE", "PCT_HIGH_RISK", "PCT_MEDIUM_HIGH"]
+D30_METRICS = ["RISK_SCORE_30D", "P_HIGH_RISK_30D", "P_MEDIUM_OR_HIGH_30D"]
+PERF_METRICS = ["YTD", "1_MOIS", "1_SEMAINE"]
+
+
+# ======================================================
+# Agrégats "société vs marché hors société" en une passe
+# ======================================================
+def _median_ex_company(values, codes, n_companies):
+    """
+    Médiane du marché hors société, pour toutes les sociétés à la fois.
+    Tri unique des valeurs, puis rang "hors société c" = rang global - nb de valeurs de c
+    déjà vues (cumsum one-hot) => searchsorted pour trouver les 2 valeurs centrales.
+    """
+    ok = ~np.isnan(values)
+    values, codes = values[ok], codes[ok]
+    out = np.full(n_companies, np.nan)
+    n = len(values)
+    if n == 0:
+        return out
+
+    order = np.argsort(values, kind="stable")
+    v_sorted, c_sorted = values[order], codes[order]
+
+    onehot = np.zeros((n, n_companies), dtype=np.int32)
+    onehot[np.arange(n), c_sorted] = 1
+    rank_ex = np.arange(1, n + 1)[:, None] - np.cumsum(onehot, axis=0)
+    m = n - onehot.sum(axis=0)
+
+    for c in np.flatnonzero(m > 0):
+        k_lo, k_hi = (m[c] + 1) // 2, m[c] // 2 + 1
+        i_lo, i_hi = np.searchsorted(rank_ex[:, c], [k_lo, k_hi], side="left")
+        out[c] = (v_sorted[i_lo] + v_sorted[i_hi]) / 2.0
+    return out
+
+
+def peer_cube(df, metrics, class_col):
+    """
+    Une ligne par société: stats société + stats marché hors société + écarts.
+    Les stats "hors société" sont déduites des totaux (somme, somme des carrés, effectifs)
+    => un seul groupby, pas de recalcul par société.
+    """
+    df = df.dropna(subset=["SOCIETE_DE_GESTION"])
+    codes, companies = pd.factorize(df["SOCIETE_DE_GESTION"], sort=True)
+    n_comp = len(companies)
+
+    cube = pd.DataFrame(index=pd.Index(companies, name="SOCIETE_DE_GESTION"))
+    n_funds = np.bincount(codes, minlength=n_comp).astype(float)
+    cube["NB_FUNDS"] = n_funds
+    cube["MARKET_EX_NB_FUNDS"] = n_funds.sum() - n_funds
+
+    for col in metrics:
+        if col not in df.columns:
+            continue
+        x = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+        valid = ~np.isnan(x)
+        xv = np.where(valid, x, 0.0)
+
+        n_c = np.bincount(codes, weights=valid, minlength=n_comp)
+        s_c = np.bincount(codes, weights=xv, minlength=n_comp)
+        q_c = np.bincount(codes, weights=xv * xv, minlength=n_comp)
+        n_m, s_m, q_m = n_c.sum() - n_c, s_c.sum() - s_c, q_c.sum() - q_c
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_c, mean_m = s_c / n_c, s_m / n_m
+            std_c = np.sqrt(np.clip((q_c - s_c * mean_c) / (n_c - 1), 0, None))
+            std_m = np.sqrt(np.clip((q_m - s_m * mean_m) / (n_m - 1), 0, None))
+
+        med_c = pd.Series(x).groupby(codes).median().reindex(range(n_comp)).to_numpy()
+        med_m = _median_ex_company(x, codes, n_comp)
+
+        cube[f"AVG_{col}"] = mean_c
+        cube[f"MEDIAN_{col}"] = med_c
+        cube[f"STD_{col}"] = std_c
+        cube[f"MARKET_EX_AVG_{col}"] = mean_m
+        cube[f"MARKET_EX_MEDIAN_{col}"] = med_m
+        cube[f"MARKET_EX_STD_{col}"] = std_m
+        cube[f"DIFF_AVG_{col}"] = mean_c - mean_m
+
+    if class_col in df.columns:
+        cls = df[class_col].astype(str).str.upper().str.strip()
+        counts = pd.crosstab(codes, cls).reindex(index=range(n_comp), columns=RISK_CLASSES, fill_value=0)
+        counts_m = counts.sum(axis=0).to_numpy() - counts.to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pct_c = counts.to_numpy() / counts.to_numpy().sum(axis=1, keepdims=True) * 100
+            pct_m = counts_m / counts_m.sum(axis=1, keepdims=True) * 100
+        for j, k in enumerate(RISK_CLASSES):
+            cube[f"PCT_{k}"] = pct_c[:, j]
+            cube[f"MARKET_EX_PCT_{k}"] = pct_m[:, j]
+        cube["PCT_MEDIUM_HIGH_FUNDS"] = cube["PCT_MEDIUM_RISK"] + cube["PCT_HIGH_RISK"]
+        cube["MARKET_EX_PCT_MEDIUM_HIGH_FUNDS"] = (
+            cube["MARKET_EX_PCT_MEDIUM_RISK"] + cube["MARKET_EX_PCT_HIGH_RISK"]
+        )
+
+    return cube.round(4).reset_index()
+
+
+def percent_scale(s):
+    """
+    Unité d'une colonne de performances, décidée une fois pour toute la colonne:
+    médiane des |valeurs| <= 1.5 => ratios (x100), sinon déjà en %.
+    """
+    med = pd.to_numeric(s, errors="coerce").abs().median()
+    return 100.0 if pd.notna(med) and med <= 1.5 else 1.0
+
+
+def as_percent(s, scale=None):
+    """Colonne en % (`scale` imposé, sinon percent_scale de la colonne)."""
+    s = pd.to_numeric(s, errors="coerce")
+    return s * (percent_scale(s) if scale is None else scale)
+
+
+if __name__ == "__main__":
+    print("📥 Chargement des fichiers...")
+    df_hist = pd.read_excel(FUND_SCORE_FILE, sheet_name=SHEET_FUND_SCORE)
+    df_30d = pd.read_excel(PRED_30D_FILE, sheet_name=SHEET_PRED_30D)
+
+    # ======================================================
+    # 1) Normalisation minimale
+    # ======================================================
+    for d in (df_hist, df_30d):
+        d.columns = d.columns.str.upper().str.strip()
+        d["SOCIETE_DE_GESTION"] = d["SOCIETE_DE_GESTION"].astype(str).str.upper().str.strip()
+
+    # ======================================================
+    # 2) Cube historique + cube 30 jours
+    # ======================================================
+    print("📊 Cube société vs marché hors société (historique)...")
+    cube_hist = peer_cube(df_hist, HIST_METRICS, "FINAL_RISK_CLASS")
+
+    print("📊 Cube société vs marché hors société (30 jours)...")
+    cube_30d = peer_cube(df_30d, D30_METRICS, "FINAL_RISK_CLASS_30D")
+
+    # ======================================================
+    # 3) Sur/sous-performance (dernier snapshot par fonds, si dispo)
+    # ======================================================
+    cube_perf = pd.DataFrame()
+    if os.path.exists(PERF_FILE):
+        print("📈 Sur/sous-performance vs marché hors société...")
+        df_perf = pd.read_excel(PERF_FILE)
+        df_perf.columns = df_perf.columns.str.upper().str.strip()
+        df_perf["DATE"] = pd.to_datetime(df_perf["DATE"], errors="coerce")
+        df_perf = df_perf.dropna(subset=["DATE"]).sort_values("DATE")
+        df_perf = df_perf.groupby("CODE_ISIN", as_index=False).tail(1)
+        df_perf["SOCIETE_DE_GESTION"] = df_perf["SOCIETE_DE_GESTION"].astype(str).str.upper().str.strip()
+
+        perf_cols = [c for c in PERF_METRICS if c in df_perf.columns]
+        for c in perf_cols:
+            df_perf[c] = as_percent(df_perf[c])
+
+        cube_perf = peer_cube(df_perf, perf_cols, class_col=None)
+        for c in perf_cols:
+            cube_perf[f"OUTPERF_{c}"] = cube_perf[f"DIFF_AVG_{c}"]
+
+    # ======================================================
+    # 4) Export
+    # ======================================================
+    with pd.ExcelWriter(OUTPUT_FILE, engine="openpyxl") as writer:
+        cube_hist.to_excel(writer, sheet_name="PEER_CUBE_HIST", index=False)
+        cube_30d.to_excel(writer, sheet_name="PEER_CUBE_30D", index=False)
+        if not cube_perf.empty:
+            cube_perf.to_excel(writer, sheet_name="PEER_CUBE_PERF", index=False)
+
+    print(f"✔ Sociétés : {len(cube_hist)}")
+    print(f"\n🎉 Cube de comparaison société vs marché exporté → {OUTPUT_FILE}")
@@ -0,0 +1,141 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.anomaly.peer_comparison import as_percent, percent_scale
+
+# ======================================================
+# CONFIG
+# ======================================================
+INPUT_FILE = "../scraper/anomaly_cross_daily_weekly.xlsx"
+OUTPUT_FILE = "../scraper/peer_daily_series.csv"   # append-only (1 ligne par jour x société)
+# à incrémenter quand le calcul change: une série d'une autre version est reconstruite
+# (2: performances en %, même convention que le cube pairs; 3: unité par colonne)
+SERIES_VERSION = 3
+
+RISK_MAP = {
+    "NORMAL": 0,
+    "LOW_RISK": 1,
+    "MEDIUM_RISK": 2,
+    "HIGH_RISK": 3
+}
+
+# métrique -> colonne source (moyennes société vs marché hors société)
+PERF_METRICS = ["YTD", "1_MOIS"]
+METRICS = {
+    "RISK_POINTS": "RISK_POINTS",
+    "PCT_HIGH_RISK": "IS_HIGH_RISK",
+    "YTD": "YTD",
+    "1_MOIS": "1_MOIS",
+}
+
+
+def _last_date(path):
+    """
+    Dernière DATE déjà présente dans la série (colonnes DATE / SERIES_VERSION seules);
+    None si la série est absente ou d'une autre version (=> reconstruction complète).
+    """
+    if not os.path.exists(path):
+        return None
+    if "SERIES_VERSION" not in pd.read_csv(path, nrows=0).columns:
+        return None
+    done = pd.read_csv(path, usecols=["DATE", "SERIES_VERSION"], parse_dates=["DATE"])
+    if done.empty or (done["SERIES_VERSION"] != SERIES_VERSION).any():
+        return None
+    return done["DATE"].max()
+
+
+def daily_peer_rows(df):
+    """
+    Une ligne par (DATE, SOCIETE_DE_GESTION): moyennes société, moyennes marché hors société
+    (déduites des totaux du jour) et écart société - marché.
+    """
+    sums, counts = {}, {}
+    keys = ["DATE", "SOCIETE_DE_GESTION"]
+    for name, col in METRICS.items():
+        # colonne absente => NaN (schéma du CSV identique d'un append à l'autre)
+        x = pd.to_numeric(df[col], errors="coerce") if col in df.columns else pd.Series(np.nan, index=df.index)
+        sums[name] = x.fillna(0.0)
+        counts[name] = x.notna().astype(float)
+
+    parts = pd.DataFrame(
+        {**{f"S_{k}": v for k, v in sums.items()}, **{f"N_{k}": v for k, v in counts.items()}},
+        index=df.index,
+    )
+    parts[keys] = df[keys]
+    parts["NB_FUNDS"] = 1.0
+
+    by_comp = parts.groupby(keys, sort=True).sum()
+    by_day = by_comp.groupby(level="DATE").sum()
+    market = by_day.reindex(by_comp.index.get_level_values("DATE")).set_axis(by_comp.index) - by_comp
+
+    out = pd.DataFrame(index=by_comp.index)
+    out["NB_FUNDS"] = by_comp["NB_FUNDS"]
+    out["MARKET_EX_NB_FUNDS"] = market["NB_FUNDS"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for name in sums:
+            comp = by_comp[f"S_{name}"] / by_comp[f"N_{name}"]
+            mkt = market[f"S_{name}"] / market[f"N_{name}"]
+            if name == "PCT_HIGH_RISK":
+                comp, mkt = comp * 100, mkt * 100
+            out[f"MEAN_{name}"] = comp
+            out[f"MARKET_EX_MEAN_{name}"] = mkt
+            out[f"SPREAD_{name}"] = comp - mkt
+
+    out["SERIES_VERSION"] = SERIES_VERSION
+    return out.replace([np.inf, -np.inf], np.nan).round(6).reset_index()
+
+
+if __name__ == "__main__":
+    last = _last_date(OUTPUT_FILE)
+
+    print("📥 Chargement des anomalies croisées...")
+    df = pd.read_excel(INPUT_FILE)
+    df.columns = df.columns.str.upper().str.strip()
+    df["DATE"] = pd.to_datetime(df["DATE"], errors="coerce").dt.normalize()
+    df = df.dropna(subset=["DATE", "CODE_ISIN"])
+
+    # unité des performances décidée sur tout l'historique (pas sur les seuls jours ajoutés)
+    scales = {c: percent_scale(df[c]) for c in PERF_METRICS if c in df.columns}
+
+    # ======================================================
+    # 1) Incrémental: uniquement les jours pas encore calculés
+    # ======================================================
+    if last is not None:
+        df = df[df["DATE"] > last]
+        print(f"✔ Série existante jusqu'au {last.date()} → {df['DATE'].nunique()} nouveau(x) jour(s)")
+    elif os.path.exists(OUTPUT_FILE):
+        print(f"♻️ Série d'une version antérieure (≠ v{SERIES_VERSION}) → reconstruction complète")
+
+    if df.empty:
+        print("✔ Rien à ajouter, série à jour.")
+        raise SystemExit(0)
+
+    # ======================================================
+    # 2) Colonnes de calcul
+    # ======================================================
+    df["SOCIETE_DE_GESTION"] = df["SOCIETE_DE_GESTION"].astype(str).str.upper().str.strip()
+    df["RISK_LEVEL"] = df["RISK_LEVEL"].astype(str).str.upper()
+    df["RISK_POINTS"] = df["RISK_LEVEL"].map(RISK_MAP).fillna(0)
+    df["IS_HIGH_RISK"] = (df["RISK_LEVEL"] == "HIGH_RISK").astype(float)
+    # performances en % (ratio ou déjà %), comme peer_comparison
+    for c, scale in scales.items():
+        df[c] = as_percent(df[c], scale)
+
+    # ======================================================
+    # 3) Agrégats jour x société + marché hors société
+    # ======================================================
+    print("📊 Agrégats quotidiens société vs marché...")
+    rows = daily_peer_rows(df)
+
+    # ======================================================
+    # 4) Append (les jours déjà écrits ne sont jamais recalculés)
+    # ======================================================
+    append = last is not None
+    rows.to_csv(OUTPUT_FILE, mode="a" if append else "w", header=not append, index=False, date_format="%Y-%m-%d")
+
+    print(f"✔ Lignes ajoutées : {len(rows)}")
+    print(f"\n🎉 Série quotidienne société vs marché → {OUTPUT_FILE}")
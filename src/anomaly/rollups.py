@@ -0,0 +1,138 @@
+import pandas as pd
+import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.preprocessing.data_quality import DQ_COLUMN, is_valid
+
+# ======================================================
+# CONFIG
+# ======================================================
+INPUT_FILE = "../scraper/anomaly_cross_daily_weekly.xlsx"
+OUTPUT_FILE = "../scraper/rollups.xlsx"
+
+GRAINS = {"DAY": "ROLLUP_DAY", "WEEK": "ROLLUP_WEEK", "MONTH": "ROLLUP_MONTH"}
+DIMENSIONS = ["SOCIETE_DE_GESTION", "CATEGORY", "RISK_LEVEL"]
+CATEGORY_CANDIDATES = ["CLASSIFICATION", "CATEGORIE", "CATEGORY", "CLASSE", "TYPE_OPCVM"]
+
+# métriques additives: N_ (nb non-NaN), SUM_, MIN_, MAX_ => moyennes dérivables à tout niveau
+METRICS = [
+    "RISK_POINTS", "IS_HIGH_RISK", "ANOMALY_DAILY_FLAG", "ANOMALY_WEEKLY_FLAG",
+    "RET_1J", "VOL_20D", "DRAWDOWN", "ZSCORE_1J_ABS", "ANOMALY_COMBINED_SCORE",
+    "YTD", "1_MOIS",
+]
+
+# lignes valides = sans règle DQ bloquante (DQ_FLAGS); à défaut lignes "complètes"
+CORE_COLS = ["RET_1J", "ZSCORE_1J", "VOL_20D", "DRAWDOWN", "ANOMALY_COMBINED_SCORE", "RISK_LEVEL"]
+
+RISK_MAP = {
+    "NORMAL": 0,
+    "LOW": 1, "LOW_RISK": 1, "LOWRISK": 1,
+    "MEDIUM": 2, "MEDIUM_RISK": 2, "MEDIUMRISK": 2,
+    "HIGH": 3, "HIGH_RISK": 3, "HIGHRISK": 3, "CRITICAL": 3,
+}
+
+
+def period_start(dates, grain):
+    """Début de période: jour, lundi de la semaine, 1er du mois."""
+    d = pd.to_datetime(dates).dt.normalize()
+    if grain == "WEEK":
+        return d - pd.to_timedelta(d.dt.weekday, unit="D")
+    if grain == "MONTH":
+        return d.dt.to_period("M").dt.start_time
+    return d
+
+
+def prepare(df):
+    """Colonnes de dimension + métriques dérivées."""
+    df = df.copy()
+    df["DATE"] = pd.to_datetime(df["DATE"], errors="coerce").dt.normalize()
+    df = df.dropna(subset=["DATE"])
+    df["SOCIETE_DE_GESTION"] = df["SOCIETE_DE_GESTION"].astype(str).str.upper().str.strip()
+
+    cat_col = next((c for c in CATEGORY_CANDIDATES if c in df.columns), None)
+    df["CATEGORY"] = df[cat_col].astype(str).str.strip() if cat_col else "ALL"
+
+    if "RISK_LEVEL" in df.columns:
+        level = df["RISK_LEVEL"].astype(str).str.upper().str.strip()
+        df["RISK_POINTS"] = level.map(RISK_MAP).fillna(0)
+    elif "RISK_LEVEL_NUM" in df.columns:
+        df["RISK_POINTS"] = pd.to_numeric(df["RISK_LEVEL_NUM"], errors="coerce")
+        level = pd.Series("UNKNOWN", index=df.index)
+    else:
+        df["RISK_POINTS"] = np.nan
+        level = pd.Series("UNKNOWN", index=df.index)
+    df["RISK_LEVEL"] = level
+    # dérivé des points (HIGH, HIGH_RISK, CRITICAL... => 3), NaN si niveau inconnu
+    df["IS_HIGH_RISK"] = (df["RISK_POINTS"] == 3).astype(float).where(df["RISK_POINTS"].notna())
+
+    if "ZSCORE_1J" in df.columns:
+        df["ZSCORE_1J_ABS"] = pd.to_numeric(df["ZSCORE_1J"], errors="coerce").abs()
+
+    core = [c for c in CORE_COLS if c in df.columns]
+    if DQ_COLUMN in df.columns:
+        df["VALID_CORE"] = is_valid(df[DQ_COLUMN]).astype(float)
+    else:
+        df["VALID_CORE"] = df[core].notna().all(axis=1).astype(float) if len(core) >= 2 else np.nan
+    return df
+
+
+def day_rollup(df):
+    """Grain jour x société x catégorie x classe de risque (une seule passe groupby)."""
+    metrics = [m for m in METRICS if m in df.columns]
+    vals = df[metrics].apply(pd.to_numeric, errors="coerce")
+    vals[DIMENSIONS + ["DATE"]] = df[DIMENSIONS + ["DATE"]]
+    vals["VALID_CORE"] = df["VALID_CORE"]
+
+    g = vals.groupby(["DATE"] + DIMENSIONS, sort=True)
+    out = g.size().to_frame("NB_ROWS")
+    out["NB_VALID_CORE"] = g["VALID_CORE"].sum(min_count=1)
+    for m in metrics:
+        out[f"N_{m}"] = g[m].count()
+        out[f"SUM_{m}"] = g[m].sum(min_count=1)
+        out[f"MIN_{m}"] = g[m].min()
+        out[f"MAX_{m}"] = g[m].max()
+    return out.reset_index().rename(columns={"DATE": "PERIOD"})
+
+
+def coarsen(day, grain):
+    """Semaine / mois dérivés du grain jour (sommes, effectifs, min, max restent additifs)."""
+    d = day.copy()
+    d["PERIOD"] = period_start(d["PERIOD"], grain)
+    values = [c for c in d.columns if c not in ["PERIOD"] + DIMENSIONS]
+    mins = [c for c in values if c.startswith("MIN_")]
+    maxs = [c for c in values if c.startswith("MAX_")]
+    sums = [c for c in values if c not in mins + maxs]
+
+    g = d.groupby(["PERIOD"] + DIMENSIONS, sort=True)
+    out = pd.concat([g[sums].sum(min_count=1), g[mins].min(), g[maxs].max()], axis=1)
+    return out[values].reset_index()
+
+
+if __name__ == "__main__":
+    print("📥 Chargement des anomalies croisées...")
+    df = pd.read_excel(INPUT_FILE)
+    df.columns = df.columns.str.upper().str.strip()
+
+    # ======================================================
+    # 1) Dimensions + métriques
+    # ======================================================
+    df = prepare(df)
+
+    # ======================================================
+    # 2) Rollups jour / semaine / mois
+    # ======================================================
+    print("📊 Rollups jour x société x catégorie x classe de risque...")
+    day = day_rollup(df)
+    rollups = {"DAY": day, "WEEK": coarsen(day, "WEEK"), "MONTH": coarsen(day, "MONTH")}
+
+    # ======================================================
+    # 3) Export
+    # ======================================================
+    with pd.ExcelWriter(OUTPUT_FILE, engine="openpyxl") as writer:
+        for grain, sheet in GRAINS.items():
+            rollups[grain].to_excel(writer, sheet_name=sheet, index=False)
+            print(f"✔ {sheet} : {len(rollups[grain])} lignes")
+
+    print(f"\n🎉 Rollups exportés → {OUTPUT_FILE}")
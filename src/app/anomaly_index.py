@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import heapq
+
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# ======================================================
+# Index trié (CODE_ISIN, DATE) pour les tables d'anomalies longues
+# ======================================================
+def build_anomaly_index(df: pd.DataFrame, date_col: str, flag=None) -> Dict[str, Any]:
+    """
+    Trie une fois la table par (CODE_ISIN, date) et pré-calcule:
+      - bounds     : ISIN -> (start, stop) du bloc contigu de l'ISIN
+      - by_company : société -> ISIN (triés) de la société
+      - dates      : colonne date en datetime64 (triée à l'intérieur de chaque bloc)
+      - extent     : ISIN -> (première, dernière) date valide du bloc
+      - anomaly_cs : cumsum du flag IS_ANOMALY => nb d'anomalies d'un intervalle en O(1)
+      - anomaly_pos: positions des lignes en anomalie (triées)
+    Une requête ne touche ensuite que les blocs / sous-intervalles concernés.
+    flag (optionnel, aligné sur df): flag d'anomalie à utiliser à la place de IS_ANOMALY.
+    """
+    if flag is not None:
+        df = df.assign(_FLAG=np.asarray(flag, dtype=bool))
+    df = df.sort_values(["CODE_ISIN", date_col], kind="stable", na_position="last").reset_index(drop=True)
+
+    isins = df["CODE_ISIN"].astype(str).to_numpy()
+    starts = np.flatnonzero(np.r_[True, isins[1:] != isins[:-1]]) if len(isins) else np.array([], dtype=int)
+    stops = np.r_[starts[1:], len(isins)].astype(int)
+    bounds = {isins[s]: (int(s), int(e)) for s, e in zip(starts, stops)}
+
+    by_company: Dict[str, List[str]] = {}
+    if "SOCIETE_DE_GESTION" in df.columns:
+        firsts = df.iloc[starts]
+        for company, isin in zip(firsts["SOCIETE_DE_GESTION"].astype(str), firsts["CODE_ISIN"].astype(str)):
+            by_company.setdefault(company, []).append(isin)
+
+    if flag is not None:
+        flag = df.pop("_FLAG").to_numpy(dtype=bool)
+    elif "IS_ANOMALY" in df.columns:
+        flag = df["IS_ANOMALY"].fillna(False).to_numpy(dtype=bool)
+    else:
+        flag = np.zeros(len(df), dtype=bool)
+
+    dates = df[date_col].to_numpy(dtype="datetime64[ns]")
+    # NaT triés en fin de bloc: dernière date valide = avant le premier NaT
+    valid_cs = np.r_[0, np.cumsum(~np.isnat(dates))]
+    extent = {}
+    for isin, (lo, hi) in bounds.items():
+        n_valid = int(valid_cs[hi] - valid_cs[lo])
+        if n_valid:
+            extent[isin] = (dates[lo], dates[lo + n_valid - 1])
+
+    return {
+        "df": df,
+        "date_col": date_col,
+        "dates": dates,
+        "bounds": bounds,
+        "isins": sorted(bounds),
+        "by_company": by_company,
+        "extent": extent,
+        "anomaly": flag,
+        "anomaly_cs": np.r_[0, np.cumsum(flag)],
+        "anomaly_pos": np.flatnonzero(flag),
+    }
+
+
+def filter_ranges(index: Dict[str, Any], company: str, isin: Optional[str], start, end) -> List[Tuple[int, int]]:
+    """
+    Intervalles [lo, hi) (ordre croissant) correspondant aux filtres société / ISIN / dates.
+    Le filtre date = 2 searchsorted à l'intérieur de chaque bloc ISIN.
+    """
+    bounds = index["bounds"]
+    if isin:
+        isins = [isin.strip().upper()]
+    elif company and company != "ALL":
+        isins = index["by_company"].get(company.strip().upper(), [])
+    else:
+        isins = list(bounds)
+
+    t0 = None if start is None else np.datetime64(pd.Timestamp(start), "ns")
+    t1 = None if end is None else np.datetime64(pd.Timestamp(end), "ns")
+
+    dates = index["dates"]
+    out = []
+    for i in isins:
+        if i not in bounds:
+            continue
+        lo, hi = bounds[i]
+        block = dates[lo:hi]
+        a = lo if t0 is None else lo + int(np.searchsorted(block, t0, side="left"))
+        b = hi if t1 is None else lo + int(np.searchsorted(block, t1, side="right"))
+        if a < b:
+            out.append((a, b))
+    out.sort()
+    return out
+
+
+def query_anomalies(
+    index: Dict[str, Any],
+    company: str = "ALL",
+    isin: Optional[str] = None,
+    start=None,
+    end=None,
+    anomaly_only: bool = False,
+    cursor: int = 0,
+    limit: int = 100,
+) -> Tuple[pd.DataFrame, int, Optional[int]]:
+    """
+    Page de résultats dans l'ordre (CODE_ISIN, date).
+    cursor = position (dans la table triée) à partir de laquelle reprendre; la réponse
+    renvoie next_cursor (None en fin de résultats). Retourne (page, total, next_cursor).
+    """
+    ranges = filter_ranges(index, company, isin, start, end)
+    cs = index["anomaly_cs"]
+    if anomaly_only:
+        total = int(sum(cs[b] - cs[a] for a, b in ranges))
+    else:
+        total = int(sum(b - a for a, b in ranges))
+
+    def remaining(a, b):
+        """Lignes retenues dans [a, b) (anomalies: cumsum => O(1))."""
+        return int(cs[b] - cs[a]) if anomaly_only else b - a
+
+    cursor = max(int(cursor), 0)
+    ap = index["anomaly_pos"]
+    picked: List[np.ndarray] = []
+    n = 0
+    next_cursor = None
+    for k, (a, b) in enumerate(ranges):
+        if b <= cursor:
+            continue
+        a = max(a, cursor)
+        if anomaly_only:
+            pos = ap[np.searchsorted(ap, a):np.searchsorted(ap, b)]
+        else:
+            pos = np.arange(a, b)
+        take = pos[: limit - n]
+        picked.append(take)
+        n += len(take)
+        if n >= limit:
+            # reprise juste après la dernière ligne renvoyée, seulement s'il reste
+            # des lignes retenues (sinon le client demanderait une page vide)
+            resume = int(take[-1]) + 1
+            if remaining(resume, b) + sum(remaining(a2, b2) for a2, b2 in ranges[k + 1:]):
+                next_cursor = resume
+            break
+
+    positions = np.concatenate(picked) if picked else np.array([], dtype=int)
+    return index["df"].iloc[positions], total, next_cursor
+
+
+def iter_positions(
+    index: Dict[str, Any],
+    company: str = "ALL",
+    isin: Optional[str] = None,
+    start=None,
+    end=None,
+    anomaly_only: bool = False,
+    chunk_rows: int = 5000,
+) -> Iterator[np.ndarray]:
+    """
+    Positions (ordre CODE_ISIN, date) de toutes les lignes filtrées, par paquets
+    d'environ chunk_rows (export en streaming: mémoire bornée par un paquet).
+    """
+    buf: List[np.ndarray] = []
+    n = 0
+    for a, b in filter_ranges(index, company, isin, start, end):
+        pos = np.arange(a, b)
+        if anomaly_only:
+            pos = pos[index["anomaly"][a:b]]
+        buf.append(pos)
+        n += len(pos)
+        if n >= chunk_rows:
+            yield np.concatenate(buf)
+            buf, n = [], 0
+    if n:
+        yield np.concatenate(buf)
+
+
+# ======================================================
+# Requêtes de la page Anomaly Daily (coût ~ taille du résultat)
+# ======================================================
+def company_isins(index: Dict[str, Any], company: Optional[str] = None) -> List[str]:
+    """ISIN (triés) d'une société, ou de tout le marché si company est vide / ALL."""
+    if company and company != "ALL":
+        return sorted(index["by_company"].get(company.strip().upper(), []))
+    return index["isins"]
+
+
+def date_extent(index: Dict[str, Any], company: Optional[str] = None, isin: Optional[str] = None):
+    """(min, max) des dates pour la sélection société / ISIN (None si aucune date valide)."""
+    isins = [isin.strip().upper()] if isin else company_isins(index, company)
+    ext = [index["extent"][i] for i in isins if i in index["extent"]]
+    if not ext:
+        return None
+    return pd.Timestamp(min(e[0] for e in ext)), pd.Timestamp(max(e[1] for e in ext))
+
+
+def count_rows(index: Dict[str, Any], ranges: List[Tuple[int, int]]) -> Tuple[int, int]:
+    """(nb lignes, nb anomalies) des intervalles, en O(nb intervalles)."""
+    cs = index["anomaly_cs"]
+    return int(sum(b - a for a, b in ranges)), int(sum(cs[b] - cs[a] for a, b in ranges))
+
+
+def range_positions(index: Dict[str, Any], ranges: List[Tuple[int, int]], anomaly_only: bool = False) -> np.ndarray:
+    """Positions (ordre CODE_ISIN, date) des lignes des intervalles."""
+    if not ranges:
+        return np.array([], dtype=np.int64)
+    if anomaly_only:
+        ap = index["anomaly_pos"]
+        return np.concatenate([ap[np.searchsorted(ap, a):np.searchsorted(ap, b)] for a, b in ranges])
+    return np.concatenate([np.arange(a, b) for a, b in ranges])
+
+
+def top_recent(
+    index: Dict[str, Any],
+    ranges: List[Tuple[int, int]],
+    n: int,
+    anomaly_only: bool = False,
+) -> np.ndarray:
+    """
+    Positions des n lignes les plus récentes (date décroissante) sans tri global:
+    chaque intervalle est déjà trié par date => fusion k-voies depuis la fin de
+    chaque intervalle (tas de taille k), coût O(n log k). NaT renvoyés en dernier.
+    """
+    dates = index["dates"]
+    if anomaly_only:
+        ap = index["anomaly_pos"]
+        cursors = [(int(np.searchsorted(ap, a)), int(np.searchsorted(ap, b))) for a, b in ranges]
+        pos_of = ap
+    else:
+        cursors = list(ranges)
+        pos_of = None
+
+    def _pos(i: int) -> int:
+        return int(pos_of[i]) if pos_of is not None else i
+
+    # NaT en fin de bloc: on les saute ici et on les ajoute après si besoin
+    heap, nat = [], []
+    for k, (lo, hi) in enumerate(cursors):
+        j = hi - 1
+        while j >= lo and np.isnat(dates[_pos(j)]):
+            nat.append(_pos(j))
+            j -= 1
+        if j >= lo:
+            heap.append((-dates[_pos(j)].astype(np.int64), k, j))
+    heapq.heapify(heap)
+
+    out: List[int] = []
+    while heap and len(out) < n:
+        _, k, j = heapq.heappop(heap)
+        out.append(_pos(j))
+        if j - 1 >= cursors[k][0]:
+            heapq.heappush(heap, (-dates[_pos(j - 1)].astype(np.int64), k, j - 1))
+    out.extend(nat[: max(n - len(out), 0)])
+    return np.asarray(out, dtype=np.int64)
+
+
+def records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
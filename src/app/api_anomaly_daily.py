@@ -1,10 +1,25 @@
 import pandas as pd
+from datetime import date
 from pathlib import Path
+from typing import Optional
 import streamlit as st
 
+from src.app.anomaly_index import build_anomaly_index, query_anomalies, records
+from src.app.columns import usecols
+from src.app.fund_reference import fund_label, load_fund_reference
+
 DATA_DIR = Path("src/scraper")
 DAILY_FILE = DATA_DIR / "anomaly_results_daily.xlsx"
 
+# Colonnes servies par /anomalies/daily et l'export (projection à la lecture)
+IDENTITY_COLUMNS = ("CODE_ISIN", "OPCVM", "SOCIETE_DE_GESTION", "CLASSIFICATION")
+FLAG_COLUMNS = ("ANOMALY_LABEL_IF", "ANOMALY_DAILY_FLAG", "ANOMALY_FLAG_IF", "ANOMALY_FLAG", "IS_ANOMALY", "ANOMALY_SCORE_IF")
+DAILY_COLUMNS = (
+    *IDENTITY_COLUMNS, "DATE", "VL",
+    "RET_1J", "ZSCORE_1J", "ZSCORE_1W", "VOL_20D", "DRAWDOWN", "ANOMALY_SCORE_RULES",
+    *FLAG_COLUMNS,
+)
+
 
 def _normalize_cols(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
@@ -48,11 +63,15 @@ def _infer_anomaly_flag(df: pd.DataFrame) -> pd.Series:
 
 
 @st.cache_data(ttl=3600)
-def load_daily_anomalies() -> pd.DataFrame:
+def load_daily_anomalies(columns: Optional[tuple] = None) -> pd.DataFrame:
+    """
+    Table daily normalisée + IS_ANOMALY.
+    columns: colonnes à lire (None => toutes); inclure FLAG_COLUMNS pour un IS_ANOMALY fidèle.
+    """
     if not DAILY_FILE.exists():
         raise FileNotFoundError(f"Fichier introuvable: {DAILY_FILE}")
 
-    df = pd.read_excel(DAILY_FILE)
+    df = pd.read_excel(DAILY_FILE, usecols=usecols(columns))
     df = _normalize_cols(df)
 
     # Date
@@ -90,12 +109,17 @@ def load_daily_anomalies() -> pd.DataFrame:
 
 
 def get_daily_filters(df: pd.DataFrame):
+    # options tirées de df (valeurs réellement filtrables); le référentiel fonds ne
+    # sert qu'aux libellés « ISIN — Nom » des fonds présents
     companies = ["ALL"]
     if "SOCIETE_DE_GESTION" in df.columns:
         companies += sorted([x for x in df["SOCIETE_DE_GESTION"].dropna().unique().tolist() if x])
 
     funds = []
-    if "CODE_ISIN" in df.columns:
+    ref = load_fund_reference()
+    if ref is not None and "CODE_ISIN" in df.columns:
+        funds = [fund_label(ref, i) for i in sorted(df["CODE_ISIN"].dropna().astype(str).unique())]
+    elif "CODE_ISIN" in df.columns:
         if "OPCVM" in df.columns:
             tmp = df[["CODE_ISIN", "OPCVM"]].drop_duplicates()
             funds = [f"{r['CODE_ISIN']} — {r['OPCVM']}" for _, r in tmp.iterrows()]
@@ -103,3 +127,70 @@ def get_daily_filters(df: pd.DataFrame):
             funds = sorted(df["CODE_ISIN"].dropna().unique().tolist())
 
     return companies, funds
+
+
+# ======================================================
+# FastAPI Router
+# ======================================================
+from fastapi import APIRouter, HTTPException, Query, Request
+from functools import lru_cache
+from src.app.snapshots import files_version, store, uncached
+from src.app.http_cache import not_modified, cached_json
+
+
+@lru_cache(maxsize=1)
+def _daily_index(version: str):
+    return build_anomaly_index(uncached(load_daily_anomalies)(DAILY_COLUMNS), "DATE")
+
+
+def load_daily_index():
+    """
+    Index (CODE_ISIN, DATE) de la table daily, construit une fois par version du
+    fichier: partagé par /anomalies/daily, l'export et la fiche fonds (api_funds).
+    """
+    return _daily_index(files_version([DAILY_FILE]))
+
+
+# index (CODE_ISIN, DATE) rechargé en tâche de fond
+store.register("anomalies_daily", load_daily_index, [DAILY_FILE])
+
+router = APIRouter()
+
+@router.get("/anomalies/daily")
+async def api_anomalies_daily(
+    request: Request,
+    company: str = "ALL",
+    isin: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    anomaly_only: bool = False,
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    Anomalies daily filtrées (société / ISIN / période / anomalies seules), ordre (CODE_ISIN, DATE),
+    pagination par curseur (renvoyer next_cursor pour la page suivante).
+    """
+    try:
+        snap = await store.get("anomalies_daily")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    cached = not_modified(request, snap)
+    if cached is not None:
+        return cached
+    index = snap.data
+
+    page, total, next_cursor = query_anomalies(
+        index, company=company, isin=isin, start=start, end=end,
+        anomaly_only=anomaly_only, cursor=cursor, limit=limit,
+    )
+    return cached_json(request, snap, {
+        "company": company,
+        "isin": isin,
+        "total": total,
+        "limit": limit,
+        "cursor": cursor,
+        "next_cursor": next_cursor,
+        "items": records(page),
+    })
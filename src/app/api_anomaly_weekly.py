@@ -1,10 +1,24 @@
 import pandas as pd
+from datetime import date
 from pathlib import Path
+from typing import Optional
 import streamlit as st
 
+from src.app.anomaly_index import build_anomaly_index, query_anomalies, records
+from src.app.columns import usecols
+from src.app.fund_reference import fund_label, load_fund_reference
+
 DATA_DIR = Path("src/scraper")
 WEEKLY_FILE = DATA_DIR / "anomaly_results_weekly.xlsx"
 
+# Colonnes servies par /anomalies/weekly (projection à la lecture)
+FLAG_COLUMNS = ("ANOMALY_LABEL_IF", "ANOMALY_WEEKLY_FLAG", "ANOMALY_FLAG_IF", "ANOMALY_FLAG", "IS_ANOMALY", "ANOMALY_SCORE_IF")
+WEEKLY_COLUMNS = (
+    "CODE_ISIN", "OPCVM", "DENOMINATION_OPCVM", "SOCIETE_DE_GESTION", "CLASSIFICATION", "WEEK_DATE", "VL",
+    "RET_1W", "ZSCORE_1W", "VOL_12W", "DRAWDOWN", "MOM_4W", "MOM_12W", "ANOMALY_SCORE_RULES", "ANOMALY_IF",
+    *FLAG_COLUMNS,
+)
+
 
 def _normalize_cols(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
@@ -40,11 +54,15 @@ def _infer_anomaly_flag(df: pd.DataFrame) -> pd.Series:
 
 
 @st.cache_data(ttl=3600)
-def load_weekly_anomalies() -> pd.DataFrame:
+def load_weekly_anomalies(columns: Optional[tuple] = None) -> pd.DataFrame:
+    """
+    Table weekly normalisée + IS_ANOMALY.
+    columns: colonnes à lire (None => toutes); inclure FLAG_COLUMNS pour un IS_ANOMALY fidèle.
+    """
     if not WEEKLY_FILE.exists():
         raise FileNotFoundError(f"Fichier introuvable: {WEEKLY_FILE}")
 
-    df = pd.read_excel(WEEKLY_FILE)
+    df = pd.read_excel(WEEKLY_FILE, usecols=usecols(columns))
     df = _normalize_cols(df)
 
     # Date weekly
@@ -82,12 +100,17 @@ def load_weekly_anomalies() -> pd.DataFrame:
 
 
 def get_weekly_filters(df: pd.DataFrame):
+    # options tirées de df (valeurs réellement filtrables); le référentiel fonds ne
+    # sert qu'aux libellés « ISIN — Nom » des fonds présents
     companies = ["ALL"]
     if "SOCIETE_DE_GESTION" in df.columns:
         companies += sorted([x for x in df["SOCIETE_DE_GESTION"].dropna().unique().tolist() if x])
 
     funds = []
-    if "CODE_ISIN" in df.columns:
+    ref = load_fund_reference()
+    if ref is not None and "CODE_ISIN" in df.columns:
+        funds = [fund_label(ref, i) for i in sorted(df["CODE_ISIN"].dropna().astype(str).unique())]
+    elif "CODE_ISIN" in df.columns:
         name_col = "OPCVM" if "OPCVM" in df.columns else ("DENOMINATION_OPCVM" if "DENOMINATION_OPCVM" in df.columns else None)
 
         if name_col:
@@ -97,3 +120,59 @@ def get_weekly_filters(df: pd.DataFrame):
             funds = sorted(df["CODE_ISIN"].dropna().unique().tolist())
 
     return companies, funds
+
+
+# ======================================================
+# FastAPI Router
+# ======================================================
+from fastapi import APIRouter, HTTPException, Query, Request
+from src.app.snapshots import store, uncached
+from src.app.http_cache import not_modified, cached_json
+
+# index (CODE_ISIN, WEEK_DATE) rechargé en tâche de fond
+store.register(
+    "anomalies_weekly",
+    lambda: build_anomaly_index(uncached(load_weekly_anomalies)(WEEKLY_COLUMNS), "WEEK_DATE"),
+    [WEEKLY_FILE],
+)
+
+router = APIRouter()
+
+@router.get("/anomalies/weekly")
+async def api_anomalies_weekly(
+    request: Request,
+    company: str = "ALL",
+    isin: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    anomaly_only: bool = False,
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    Anomalies weekly filtrées (société / ISIN / période / anomalies seules), ordre (CODE_ISIN, WEEK_DATE),
+    pagination par curseur (renvoyer next_cursor pour la page suivante).
+    """
+    try:
+        snap = await store.get("anomalies_weekly")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    cached = not_modified(request, snap)
+    if cached is not None:
+        return cached
+    index = snap.data
+
+    page, total, next_cursor = query_anomalies(
+        index, company=company, isin=isin, start=start, end=end,
+        anomaly_only=anomaly_only, cursor=cursor, limit=limit,
+    )
+    return cached_json(request, snap, {
+        "company": company,
+        "isin": isin,
+        "total": total,
+        "limit": limit,
+        "cursor": cursor,
+        "next_cursor": next_cursor,
+        "items": records(page),
+    })
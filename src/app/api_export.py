@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import io
+from datetime import date
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from src.app.snapshots import store
+from src.app.anomaly_index import iter_positions
+from src.app.api_recommendation import get_company_entry
+# imports pour enregistrer les snapshots exportables
+import src.app.api_anomaly_daily  # noqa: F401
+import src.app.api_anomaly_weekly  # noqa: F401
+import src.app.api_projection_30j  # noqa: F401
+
+try:  # Arrow IPC optionnel
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+CHUNK_ROWS = 5000
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+# dataset exposé -> snapshot
+DATASETS = {
+    "anomalies_daily": "anomalies_daily",
+    "anomalies_weekly": "anomalies_weekly",
+    "recommendations": "recommendations",
+    "projection_30d": "projection_30d",
+}
+
+
+# ======================================================
+# Sélection des lignes (par paquets, sans matérialiser le résultat)
+# ======================================================
+def _frame_chunks(df: pd.DataFrame, mask: Optional[np.ndarray], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    positions = np.flatnonzero(mask) if mask is not None else np.arange(len(df))
+    for i in range(0, len(positions), chunk_rows):
+        yield df.iloc[positions[i:i + chunk_rows]]
+
+
+def _filter_mask(df: pd.DataFrame, company: str, isin: Optional[str], start, end) -> Optional[np.ndarray]:
+    mask = np.ones(len(df), dtype=bool)
+    if company and company != "ALL" and "SOCIETE_DE_GESTION" in df.columns:
+        mask &= (df["SOCIETE_DE_GESTION"].astype(str).str.upper() == company.strip().upper()).to_numpy()
+    if isin and "CODE_ISIN" in df.columns:
+        mask &= (df["CODE_ISIN"].astype(str).str.upper() == isin.strip().upper()).to_numpy()
+    if "DATE" in df.columns and (start is not None or end is not None):
+        d = pd.to_datetime(df["DATE"], errors="coerce")
+        if start is not None:
+            mask &= (d >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (d <= pd.Timestamp(end)).to_numpy()
+    return mask
+
+
+def source_frame(dataset: str, data) -> pd.DataFrame:
+    """Table complète d'où sont tirés les paquets (colonnes et dtypes de l'export)."""
+    if dataset.startswith("anomalies_"):
+        return data["df"]
+    if dataset == "recommendations":
+        return data["by_company"]["ALL"]["rows"]
+    return data
+
+
+def dataset_chunks(
+    dataset: str,
+    data,
+    company: str = "ALL",
+    isin: Optional[str] = None,
+    start=None,
+    end=None,
+    anomaly_only: bool = False,
+    chunk_rows: int = CHUNK_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """Paquets de lignes filtrées d'un dataset (snapshot déjà chargé)."""
+    if dataset.startswith("anomalies_"):
+        df = data["df"]
+        for pos in iter_positions(data, company, isin, start, end, anomaly_only, chunk_rows):
+            yield df.iloc[pos]
+        return
+
+    if dataset == "recommendations":
+        df = get_company_entry(data, company)["rows"]   # déjà restreint et trié par priorité
+        company = "ALL"
+    else:
+        df = data
+    yield from _frame_chunks(df, _filter_mask(df, company, isin, start, end), chunk_rows)
+
+
+# ======================================================
+# Encodeurs (un paquet => un morceau de la réponse)
+# ======================================================
+def encode_csv(chunks: Iterator[pd.DataFrame]) -> Iterator[bytes]:
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header, date_format="%Y-%m-%d").encode("utf-8")
+        header = False
+
+
+def encode_ndjson(chunks: Iterator[pd.DataFrame]) -> Iterator[bytes]:
+    for chunk in chunks:
+        if len(chunk):
+            yield chunk.to_json(orient="records", lines=True, date_format="iso", force_ascii=False).encode("utf-8")
+            yield b"\n"
+
+
+def _arrow_schema(df: pd.DataFrame):
+    """
+    Schéma Arrow depuis les dtypes déclarés de la table source (pas d'inférence
+    par paquet): colonnes texte / objet => string.
+    """
+    fields = []
+    for c, dtype in df.dtypes.items():
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            t = pa.timestamp("ns")
+        elif pd.api.types.is_bool_dtype(dtype):
+            t = pa.bool_()
+        elif pd.api.types.is_numeric_dtype(dtype):
+            t = pa.from_numpy_dtype(dtype)
+        else:
+            t = pa.string()
+        fields.append(pa.field(str(c), t))
+    return pa.schema(fields)
+
+
+def _arrow_batch(chunk: pd.DataFrame, schema) -> "pa.RecordBatch":
+    """Paquet converti colonne par colonne vers le schéma fixé (valeurs non convertibles => null)."""
+    arrays = []
+    for f in schema:
+        col = chunk[f.name]
+        if pa.types.is_string(f.type):
+            col = col.astype("string")
+        elif pa.types.is_timestamp(f.type):
+            col = pd.to_datetime(col, errors="coerce")
+        elif not pa.types.is_boolean(f.type):
+            col = pd.to_numeric(col, errors="coerce")
+        arrays.append(pa.Array.from_pandas(col, type=f.type, safe=False))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def encode_arrow(chunks: Iterator[pd.DataFrame], schema=None) -> Iterator[bytes]:
+    """Flux Arrow IPC; `schema` = _arrow_schema(table source), sinon celui du 1er paquet."""
+    sink = io.BytesIO()
+    writer = None
+    for chunk in chunks:
+        if schema is None:
+            schema = _arrow_schema(chunk)
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_batch(_arrow_batch(chunk, schema))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    if writer is not None:
+        writer.close()
+        yield sink.getvalue()
+
+
+ENCODERS = {"csv": encode_csv, "ndjson": encode_ndjson, "arrow": encode_arrow}
+
+
+# ======================================================
+# FastAPI Router
+# ======================================================
+router = APIRouter()
+
+@router.get("/export/{dataset}")
+async def api_export(
+    dataset: str,
+    format: str = Query("csv", pattern="^(csv|ndjson|arrow)$"),
+    company: str = "ALL",
+    isin: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    anomaly_only: bool = False,
+):
+    """
+    Export en streaming (CSV / NDJSON / Arrow IPC) d'un sous-ensemble filtré,
+    généré paquet par paquet depuis le snapshot en mémoire.
+    """
+    if dataset not in DATASETS:
+        raise HTTPException(status_code=404, detail=f"Dataset inconnu: {dataset}. Dispo: {list(DATASETS)}")
+    if format == "arrow" and pa is None:
+        raise HTTPException(status_code=501, detail="Export Arrow indisponible (pyarrow non installé)")
+
+    try:
+        snap = await store.get(DATASETS[dataset])
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    chunks = dataset_chunks(dataset, snap.data, company, isin, start, end, anomaly_only)
+    if format == "arrow":
+        body = encode_arrow(chunks, _arrow_schema(source_frame(dataset, snap.data)))
+    else:
+        body = ENCODERS[format](chunks)
+    media_type, ext = FORMATS[format]
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{ext}"'},
+    )
@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.app.snapshots import store, uncached
+from src.app.downsample import multi_indices
+from src.app.api_anomaly_daily import DAILY_FILE, load_daily_index
+from src.app.fund_reference import REFERENCE_FILE, fund_identity, fund_isins, load_fund_reference
+from src.app.api_projection_30j import RISK_FILE, PRED_FILE, load_merged_risk_and_pred
+from src.app.api_recommendation import _find_reco_file, load_recommendations_merged
+from src.preprocessing.fund_keys import KEYS_FILE
+from src.preprocessing.vl_panel import CURRENT as PANEL_CURRENT, PANEL_DIR, load_panel
+from src.recommendation.risk_history import HISTORY_DIR, MANIFEST, load_history
+
+TIMELINE_MAX_POINTS = 400   # points renvoyés (VL + drawdown, hors anomalies toujours gardées)
+
+IDENTITY_COLS = ["OPCVM", "SOCIETE_DE_GESTION", "CLASSIFICATION"]
+CURRENT_RISK_COLS = {
+    "risk_class": "CURRENT_FINAL_RISK_CLASS",
+    "risk_score": "CURRENT_RISK_SCORE",
+    "pct_high_risk": "CURRENT_PCT_HIGH_RISK",
+    "pct_medium_high": "CURRENT_PCT_MEDIUM_HIGH",
+}
+RISK_30D_COLS = {
+    "risk_class": "FINAL_RISK_CLASS_30D",
+    "risk_score": "RISK_SCORE_30D",
+    "p_high_risk": "P_HIGH_RISK_30D",
+    "p_medium_or_high": "P_MEDIUM_OR_HIGH_30D",
+}
+RECO_COLS = {
+    "recommendation": "RECOMMENDATION",
+    "priority_score": "PRIORITY_SCORE",
+    "comment": "COMMENTAIRE_TECH",
+}
+
+
+def _clean(v):
+    if v is None:
+        return None
+    if isinstance(v, (np.floating, float)):
+        return None if np.isnan(v) else float(v)
+    if isinstance(v, np.integer):
+        return int(v)
+    if isinstance(v, pd.Timestamp):
+        return v.isoformat()
+    return v
+
+
+def _first_present(*values):
+    """Première valeur renseignée (ni None, ni NaN, ni chaîne vide)."""
+    return next((v for v in values if v is not None and pd.notna(v) and v != ""), None)
+
+
+def _pick(row: Optional[Dict[str, Any]], mapping: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    if not row:
+        return None
+    return {k: _clean(row.get(c)) for k, c in mapping.items()}
+
+
+def _by_isin(df: Optional[pd.DataFrame]) -> Dict[str, Dict[str, Any]]:
+    """Table de hachage ISIN -> ligne (dict)."""
+    if df is None or df.empty or "CODE_ISIN" not in df.columns:
+        return {}
+    d = df.drop_duplicates("CODE_ISIN").copy()
+    d["CODE_ISIN"] = d["CODE_ISIN"].astype(str).str.strip().str.upper()
+    return d.set_index("CODE_ISIN").to_dict(orient="index")
+
+
+# ======================================================
+# Index ISIN -> fiche fonds (pré-agrégée)
+# ======================================================
+def build_fund_index(
+    df_proj: Optional[pd.DataFrame],
+    df_reco: Optional[pd.DataFrame],
+    daily_index: Optional[Dict[str, Any]],
+    max_points: int = TIMELINE_MAX_POINTS,
+    ref: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Une entrée par ISIN: identité, risque courant / 30j, recommandation et timeline
+    VL / drawdown / anomalies déjà sous-échantillonnée => lookup O(1) par requête.
+    ref: référentiel fonds (src/app/fund_reference.py), prioritaire pour l'identité.
+    """
+    proj = _by_isin(df_proj)
+    reco = _by_isin(df_reco)
+
+    timelines: Dict[str, Dict[str, Any]] = {}
+    last_rows: Dict[str, Dict[str, Any]] = {}   # identité de la dernière séance du fonds
+    if daily_index is not None:
+        df = daily_index["df"]
+        dates = pd.DatetimeIndex(daily_index["dates"])
+        vl = pd.to_numeric(df["VL"], errors="coerce").to_numpy(dtype=float) if "VL" in df.columns \
+            else np.full(len(df), np.nan)
+        dd = pd.to_numeric(df["DRAWDOWN"], errors="coerce").to_numpy(dtype=float) if "DRAWDOWN" in df.columns \
+            else np.full(len(df), np.nan)
+        flag = daily_index["anomaly"]
+        ident_cols = [c for c in IDENTITY_COLS if c in df.columns]
+
+        for isin, (lo, hi) in daily_index["bounds"].items():
+            # LTTB sur VL et drawdown (pics / creux conservés) + jours d'anomalie
+            pos = lo + multi_indices(dates[lo:hi].values, [vl[lo:hi], dd[lo:hi]], max_points, keep=flag[lo:hi])
+            timelines[isin] = {
+                "dates": dates[pos].strftime("%Y-%m-%d").tolist(),
+                "vl": [_clean(x) for x in vl[pos]],
+                "drawdown": [_clean(x) for x in dd[pos]],
+                "anomaly_dates": dates[lo:hi][flag[lo:hi]].strftime("%Y-%m-%d").tolist(),
+                "nb_points_total": int(hi - lo),
+            }
+            last_rows[isin] = df.iloc[hi - 1][ident_cols].to_dict()
+
+    index: Dict[str, Dict[str, Any]] = {}
+    for isin in set(proj) | set(reco) | set(timelines):
+        p, r, f = proj.get(isin, {}), reco.get(isin, {}), last_rows.get(isin, {})
+        d = fund_identity(ref, isin)
+        identity = {"code_isin": isin}
+        for c in IDENTITY_COLS:
+            identity[c.lower()] = _clean(_first_present(d.get(c), p.get(c), r.get(c), f.get(c)))
+        index[isin] = {
+            "identity": identity,
+            "current_risk": _pick(p, CURRENT_RISK_COLS),
+            "risk_30d": _pick(p, RISK_30D_COLS),
+            "recommendation": _pick(r, RECO_COLS),
+            "timeline": timelines.get(isin),
+        }
+    return index
+
+
+def _optional(loader: Callable[[], Any]):
+    try:
+        return loader()
+    except FileNotFoundError:
+        return None
+
+
+def load_fund_index() -> Dict[str, Dict[str, Any]]:
+    return build_fund_index(
+        _optional(uncached(load_merged_risk_and_pred)),
+        _optional(uncached(load_recommendations_merged)),
+        _optional(load_daily_index),   # même index que /anomalies/daily (une construction par version)
+        ref=load_fund_reference(),
+    )
+
+
+def _fund_files() -> List:
+    files = [RISK_FILE, PRED_FILE, DAILY_FILE, REFERENCE_FILE]
+    try:
+        files.append(_find_reco_file())
+    except FileNotFoundError:
+        pass
+    return files
+
+
+store.register("funds", load_fund_index, _fund_files)
+
+
+def _load_reference() -> Dict[str, Any]:
+    ref = load_fund_reference()
+    if ref is None:
+        raise FileNotFoundError(f"Fichier introuvable: {REFERENCE_FILE}")
+    return ref
+
+
+store.register("fund_reference", _load_reference, [REFERENCE_FILE])
+
+
+def _load_risk_history():
+    if not (HISTORY_DIR / MANIFEST).exists():
+        raise FileNotFoundError(f"Historique introuvable: {HISTORY_DIR / MANIFEST} (étape risk_history)")
+    return load_history()
+
+
+# panel VL memory-mappé (src/preprocessing/vl_panel.py): pages partagées avec
+# les autres process via le cache OS; nouvelle version => nouveau snapshot
+store.register("vl_panel", load_panel, [PANEL_DIR / PANEL_CURRENT])
+
+
+# registre ISIN <-> FUND_ID résolu au chargement: rechargé s'il change
+store.register("risk_history", _load_risk_history, [HISTORY_DIR / MANIFEST, KEYS_FILE])
+
+
+# ======================================================
+# FastAPI Router
+# ======================================================
+from fastapi import APIRouter, HTTPException, Request
+from src.app.http_cache import not_modified, cached_json
+
+router = APIRouter()
+
+
+def _history_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    out = df.copy()
+    for c in ("AS_OF_DATE", "RECORDED_AT"):
+        out[c] = out[c].dt.strftime("%Y-%m-%d" if c == "AS_OF_DATE" else "%Y-%m-%dT%H:%M:%S")
+    return out.astype(object).where(out.notna(), None).to_dict(orient="records")
+
+
+def _timestamp(value: Optional[str], name: str) -> Optional[pd.Timestamp]:
+    if value is None:
+        return None
+    try:
+        return pd.Timestamp(value)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"{name} invalide: {value}")
+
+
+@router.get("/funds")
+async def api_funds_list(request: Request, company: str = "ALL"):
+    """
+    Options de filtre depuis le référentiel fonds: sociétés de gestion et fonds
+    (ISIN, nom, société, catégorie, périodicité), éventuellement d'une seule société.
+    """
+    try:
+        snap = await store.get("fund_reference")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    cached = not_modified(request, snap)
+    if cached is not None:
+        return cached
+    ref = snap.data
+
+    df = ref["df"]
+    rows = df.iloc[df["CODE_ISIN"].searchsorted(fund_isins(ref, company.strip().upper()))]
+    return cached_json(request, snap, {
+        "company": company,
+        "companies": ref["companies"],
+        "total": len(rows),
+        "items": rows.astype(object).where(rows.notna(), None).to_dict(orient="records"),
+    })
+
+
+@router.get("/risk-history")
+async def api_risk_history(
+    request: Request, as_of: Optional[str] = None, known_at: Optional[str] = None, company: str = "ALL",
+):
+    """
+    Classe de risque, projection 30j et recommandation de chaque fonds à la date de
+    valeur `as_of` (défaut: dernier snapshot), telles que connues à `known_at`.
+    """
+    try:
+        snap = await store.get("risk_history")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    cached = not_modified(request, snap)
+    if cached is not None:
+        return cached
+    hist = snap.data
+
+    date = _timestamp(as_of, "as_of") or hist.last_as_of()
+    df = hist.as_of(date, _timestamp(known_at, "known_at")) if date is not None else pd.DataFrame()
+    if company.strip().upper() != "ALL" and len(df):
+        try:
+            ref = (await store.get("fund_reference")).data
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        df = df[df["CODE_ISIN"].isin(fund_isins(ref, company.strip().upper()))]
+    return cached_json(request, snap, {
+        "as_of": date.strftime("%Y-%m-%d") if date is not None else None,
+        "known_at": known_at,
+        "company": company,
+        "total": len(df),
+        "items": _history_records(df) if len(df) else [],
+    })
+
+
+@router.get("/funds/{isin}/history")
+async def api_fund_history(request: Request, isin: str, known_at: Optional[str] = None):
+    """Versions successives (changements de classe / recommandation) d'un fonds."""
+    try:
+        snap = await store.get("risk_history")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    cached = not_modified(request, snap)
+    if cached is not None:
+        return cached
+
+    code = isin.strip().upper()
+    fund_id = snap.data.fund_id(code)
+    if fund_id is None:
+        raise HTTPException(status_code=404, detail=f"ISIN inconnu: {isin}")
+    df = snap.data.timeline(fund_id, _timestamp(known_at, "known_at"))
+    return cached_json(request, snap, {"code_isin": code, "total": len(df), "items": _history_records(df)})
+
+
+@router.get("/funds/{isin}/performance")
+async def api_fund_performance(
+    request: Request, isin: str, start: Optional[str] = None, end: Optional[str] = None,
+):
+    """
+    Performance cumulée (sous-échantillonnée), volatilité annualisée et max
+    drawdown d'un fonds sur [start, end], lus en tranche de colonne du panel VL.
+    """
+    try:
+        snap = await store.get("vl_panel")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    cached = not_modified(request, snap)
+    if cached is not None:
+        return cached
+
+    panel = snap.data
+    code = isin.strip().upper()
+    if code not in panel.isins:
+        raise HTTPException(status_code=404, detail=f"ISIN absent du panel VL: {isin}")
+    lo, hi = _timestamp(start, "start"), _timestamp(end, "end")
+    stats = panel.performance([code], lo, hi).iloc[0]
+    cum = panel.cumulative(code, lo, hi)
+    pos = multi_indices(cum.index.values, [cum.to_numpy()], TIMELINE_MAX_POINTS)
+    return cached_json(request, snap, {
+        "code_isin": code,
+        "panel_version": panel.version,
+        "first_date": stats["FIRST_DATE"].strftime("%Y-%m-%d") if pd.notna(stats["FIRST_DATE"]) else None,
+        "last_date": stats["LAST_DATE"].strftime("%Y-%m-%d") if pd.notna(stats["LAST_DATE"]) else None,
+        "nb_points": int(stats["NB_POINTS"]),
+        "performance": _clean(stats["PERFORMANCE"]),
+        "volatility": _clean(stats["VOLATILITY"]),
+        "max_drawdown": _clean(stats["MAX_DRAWDOWN"]),
+        "series": {
+            "dates": cum.index[pos].strftime("%Y-%m-%d").tolist(),
+            "cumulative": [_clean(x) for x in cum.to_numpy()[pos]],
+        },
+    })
+
+
+@router.get("/funds/{isin}")
+async def api_fund_detail(request: Request, isin: str):
+    """
+    Fiche fonds: identité, risque courant et 30j, recommandation, timeline
+    VL / drawdown / anomalies (sous-échantillonnée). Lookup hash sur l'ISIN.
+    """
+    snap = await store.get("funds")
+    cached = not_modified(request, snap)
+    if cached is not None:
+        return cached
+
+    entry = snap.data.get(isin.strip().upper())
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"ISIN inconnu: {isin}")
+    return cached_json(request, snap, entry)
@@ -4,24 +4,60 @@ from pathlib import Path
 import streamlit as st
 from datetime import datetime, timedelta
 
+from src.app.columns import usecols
+from src.app.rollups import ROLLUP_FILE, load_rollups, query_rollup, rollup_mean
+from src.app.snapshots import uncached
+from src.preprocessing.data_quality import DQ_COLUMN, is_valid
+from src.preprocessing.trading_calendar import TradingCalendar, load_calendar
+
 DATA_DIR = Path("src/scraper")
 WAFA_NAME = "WAFA GESTION"
+# société -> motif recherché dans SOCIETE_DE_GESTION (variantes de libellé:
+# "WAFA GESTION SA"...); les autres sociétés: égalité exacte du nom normalisé
+COMPANY_ALIASES = {WAFA_NAME: "WAFA"}
+SESSIONS_30D = 21  # fenêtre « 30 jours » = 21 séances de cotation (≈ 1 mois)
+
+# Colonnes lues par fichier (projection à la lecture): uniquement celles utilisées
+# par get_overview_metrics, variantes de noms comprises
+ANOMALY_FLAG_COLS = ["ANOMALY_LABEL_IF", "ANOMALY_FLAG_IF", "ANOMALY_DAILY_FLAG", "ANOMALY_WEEKLY_FLAG"]
+ZSCORE_COLS = ["ZSCORE_1J", "ZSCORE", "Z_SCORE", "ZSCORE_1D"]
+DRAWDOWN_COLS = ["DRAWDOWN", "MAX_DRAWDOWN", "DD"]
+VOL_COLS = ["VOL_30D", "VOL_20D", "VOLATILITY_30D", "VOLATILITY"]
+YTD_COLS = ["YTD", "PERFORMANCE_YTD", "PERF_YTD"]
+M1_COLS = ["1_MOIS", "30J", "M30", "PERF_30J", "PERFORMANCE_30D"]
+W1_COLS = ["1_SEMAINE", "W1", "PERF_1W", "PERFORMANCE_WEEKLY"]
+RISK_CLASS_COLS = ["FINAL_RISK_CLASS", "RISK_CLASS", "RISK_LEVEL", "RISK_STATUS"]
+RISK_CLASS_30D_COLS = ["FINAL_RISK_CLASS_30D", "FINAL_RISK_CLASS", "RISK_CLASS_30D"]
+
+DAILY_COLUMNS = ["DATE", "SOCIETE_DE_GESTION", *ANOMALY_FLAG_COLS, *ZSCORE_COLS, *DRAWDOWN_COLS, *VOL_COLS]
+WEEKLY_COLUMNS = ["WEEK_DATE", "SOCIETE_DE_GESTION", *ANOMALY_FLAG_COLS]
+CROSS_COLUMNS = [
+    "DATE", "BDAY_ID", DQ_COLUMN, "SOCIETE_DE_GESTION", "RISK_LEVEL", "RISK_LEVEL_NUM",
+    "RET_1J", "ANOMALY_COMBINED_SCORE", *ZSCORE_COLS, *DRAWDOWN_COLS, *VOL_COLS,
+]
+RISK_COLUMNS = ["DATE", "CODE_ISIN", "SOCIETE_DE_GESTION", "RISK_SCORE", "PCT_MEDIUM_HIGH", *RISK_CLASS_COLS]
+PRED_COLUMNS = ["DATE", "SOCIETE_DE_GESTION", *RISK_CLASS_30D_COLS]
+PERF_COLUMNS = ["DATE", "CODE_ISIN", DQ_COLUMN, "SOCIETE_DE_GESTION", *YTD_COLS, *M1_COLS, *W1_COLS]
 
 # ======================================================
 # Helpers (anti-erreurs)
 # ======================================================
-def _safe_read_excel(path: Path, sheet_name=None) -> pd.DataFrame:
-    """Lit un excel sans crash. Si fichier/feuille absent -> DataFrame vide."""
+def _safe_read_excel(path: Path, sheet_name=None, columns=None) -> pd.DataFrame:
+    """
+    Lit un excel sans crash. Si fichier/feuille absent -> DataFrame vide.
+    columns: colonnes à lire (noms normalisés), None => toutes.
+    """
     try:
         if not path.exists():
             return pd.DataFrame()
+        cols = usecols(columns)
         if sheet_name is None:
-            return pd.read_excel(path)
+            return pd.read_excel(path, usecols=cols)
         # si sheet_name existe, sinon fallback première feuille
         xls = pd.ExcelFile(path)
         if sheet_name in xls.sheet_names:
-            return pd.read_excel(path, sheet_name=sheet_name)
-        return pd.read_excel(path, sheet_name=xls.sheet_names[0])
+            return pd.read_excel(xls, sheet_name=sheet_name, usecols=cols)
+        return pd.read_excel(xls, sheet_name=xls.sheet_names[0], usecols=cols)
     except Exception:
         return pd.DataFrame()
 
@@ -39,15 +75,53 @@ def _to_datetime_col(df: pd.DataFrame, col: str) -> pd.DataFrame:
         df[col] = pd.to_datetime(df[col], errors="coerce")
     return df
 
-def _is_wafa(df: pd.DataFrame) -> pd.Series:
+def company_key(company) -> str:
+    """Nom de société normalisé (strip + majuscules), comme le cube pairs."""
+    return str(company).strip().upper()
+
+def known_companies(data) -> frozenset:
+    """Sociétés (normalisées) présentes dans les fichiers chargés par load_data()."""
+    names = set()
+    for df in data[:6]:
+        if not df.empty and "SOCIETE_DE_GESTION" in df.columns:
+            names.update(df["SOCIETE_DE_GESTION"].dropna().astype(str).str.strip().str.upper())
+    return frozenset(names)
+
+def _company_filter(company: str) -> dict:
+    """Filtre query_rollup d'une société: motif COMPANY_ALIASES, sinon nom exact."""
+    key = company_key(company)
+    alias = COMPANY_ALIASES.get(key)
+    return {"match": alias} if alias else {"company": key}
+
+def _is_company(df: pd.DataFrame, company: str) -> pd.Series:
+    """
+    Lignes de la société `company`: SOCIETE_DE_GESTION contient son motif
+    COMPANY_ALIASES, sinon lui est égal (normalisé des deux côtés).
+    """
     if df.empty or "SOCIETE_DE_GESTION" not in df.columns:
         return pd.Series([False] * len(df))
-    return (
-        df["SOCIETE_DE_GESTION"]
-        .astype(str)
-        .str.upper()
-        .str.contains("WAFA", na=False)
-    )
+    soc = df["SOCIETE_DE_GESTION"].astype(str).str.strip().str.upper()
+    key = company_key(company)
+    alias = COMPANY_ALIASES.get(key)
+    if alias:
+        return soc.str.contains(alias, regex=False, na=False)
+    return soc.eq(key)
+
+def _calendar(*dates) -> TradingCalendar:
+    """Calendrier de séances de clean_daily, sinon déduit des dates disponibles."""
+    cal = load_calendar()
+    if cal is None:
+        known = [pd.Series(d) for d in dates if d is not None]
+        cal = TradingCalendar.from_publications(pd.concat(known, ignore_index=True) if known else [])
+    return cal
+
+def _last_sessions(df: pd.DataFrame, cal: TradingCalendar, n: int) -> pd.Series:
+    """Lignes des n dernières séances de df (la dernière incluse): BDAY_ID si présent, sinon DATE."""
+    if "BDAY_ID" in df.columns:
+        ids = pd.to_numeric(df["BDAY_ID"], errors="coerce")
+    else:
+        ids = pd.Series(cal.index(df["DATE"]), index=df.index).where(lambda x: x >= 0)
+    return ids > ids.max() - n
 
 def _pick_col(df: pd.DataFrame, candidates) -> str | None:
     for c in candidates:
@@ -118,8 +192,8 @@ def _dominant_anomaly_type(df_anom: pd.DataFrame) -> str:
 
     # on essaie de scorer quel facteur "explique" le + les anomalies
     # z-score: abs(ZSCORE_1J) ; drawdown: abs(DRAWDOWN) ; vol: VOL_20D
-    z_col = _pick_col(df_anom, ["ZSCORE_1J", "ZSCORE", "Z_SCORE", "ZSCORE_1D"])
-    d_col = _pick_col(df_anom, ["DRAWDOWN", "MAX_DRAWDOWN", "DD"])
+    z_col = _pick_col(df_anom, ZSCORE_COLS)
+    d_col = _pick_col(df_anom, DRAWDOWN_COLS)
     v_col = _pick_col(df_anom, ["VOL_20D", "VOL_30D", "VOLATILITY_30D", "VOLATILITY"])
 
     scores = {"z-score": 0, "drawdown": 0, "volatilité": 0}
@@ -143,25 +217,31 @@ def _dominant_anomaly_type(df_anom: pd.DataFrame) -> str:
 @st.cache_data(ttl=3600)
 def load_data():
     """
-    Charge TOUS les fichiers utiles (sans crash).
+    Charge TOUS les fichiers utiles (sans crash), limités aux colonnes *_COLUMNS.
     """
-    df_daily = _normalize_cols(_safe_read_excel(DATA_DIR / "anomaly_results_daily.xlsx"))
-    df_weekly = _normalize_cols(_safe_read_excel(DATA_DIR / "anomaly_results_weekly.xlsx"))
-    df_cross = _normalize_cols(_safe_read_excel(DATA_DIR / "anomaly_cross_daily_weekly.xlsx"))
-    df_risk = _normalize_cols(_safe_read_excel(DATA_DIR / "fund_risk_score.xlsx", sheet_name="ALL_FUNDS"))
+    df_daily = _normalize_cols(_safe_read_excel(DATA_DIR / "anomaly_results_daily.xlsx", columns=DAILY_COLUMNS))
+    df_weekly = _normalize_cols(_safe_read_excel(DATA_DIR / "anomaly_results_weekly.xlsx", columns=WEEKLY_COLUMNS))
+    df_cross = _normalize_cols(_safe_read_excel(DATA_DIR / "anomaly_cross_daily_weekly.xlsx", columns=CROSS_COLUMNS))
+    df_risk = _normalize_cols(_safe_read_excel(DATA_DIR / "fund_risk_score.xlsx", sheet_name="ALL_FUNDS", columns=RISK_COLUMNS))
     if df_risk.empty:
         # fallback si pas de feuille ALL_FUNDS
-        df_risk = _normalize_cols(_safe_read_excel(DATA_DIR / "fund_risk_score.xlsx"))
+        df_risk = _normalize_cols(_safe_read_excel(DATA_DIR / "fund_risk_score.xlsx", columns=RISK_COLUMNS))
 
-    df_pred = _normalize_cols(_safe_read_excel(DATA_DIR / "prediction_future_risk.xlsx", sheet_name="PROJECTION_30D_ALL"))
+    df_pred = _normalize_cols(_safe_read_excel(DATA_DIR / "prediction_future_risk.xlsx", sheet_name="PROJECTION_30D_ALL", columns=PRED_COLUMNS))
     if df_pred.empty:
-        df_pred = _normalize_cols(_safe_read_excel(DATA_DIR / "prediction_future_risk.xlsx"))
+        df_pred = _normalize_cols(_safe_read_excel(DATA_DIR / "prediction_future_risk.xlsx", columns=PRED_COLUMNS))
+
+    df_perf = _normalize_cols(_safe_read_excel(DATA_DIR / "performance_quotidienne_asfim_clean.xlsx", columns=PERF_COLUMNS))
 
-    df_perf = _normalize_cols(_safe_read_excel(DATA_DIR / "performance_quotidienne_asfim_clean.xlsx"))
-    return df_daily, df_weekly, df_cross, df_risk, df_pred, df_perf
+    # rollups jour/semaine/mois (src/anomaly/rollups.py) si construits, sinon {}
+    try:
+        rollups = uncached(load_rollups)()
+    except Exception:
+        rollups = {}
+    return df_daily, df_weekly, df_cross, df_risk, df_pred, df_perf, rollups
 
 
-def get_overview_metrics():
+def get_overview_metrics(societe: str = WAFA_NAME, data=None):
     """
     KPI OVERVIEW demandés:
     - Score risque global (0-100)
@@ -171,9 +251,15 @@ def get_overview_metrics():
     - Volatilité 30j / max drawdown / z-score moyen
     - Signal ML global (STABLE / MONITOR / REDUCE)
     - Qualité des données: total fonds, % valide, dernière MAJ
+
+    societe: société filtrée (égalité exacte sur SOCIETE_DE_GESTION normalisé).
+    data: tuple déjà chargé (snapshot API), sinon load_data().
     """
+    match = company_key(societe)
+
     try:
-        df_daily, df_weekly, df_cross, df_risk, df_pred, df_perf = load_data()
+        df_daily, df_weekly, df_cross, df_risk, df_pred, df_perf, rollups = data if data is not None else load_data()
+        day_roll = rollups.get("DAY", pd.DataFrame())
 
         # Parse dates (si présentes)
         df_daily = _to_datetime_col(df_daily, "DATE")
@@ -183,6 +269,9 @@ def get_overview_metrics():
         df_risk = _to_datetime_col(df_risk, "DATE")  # parfois absent
         df_pred = _to_datetime_col(df_pred, "DATE")  # généralement absent dans projection 30d
 
+        # Séances: fenêtres « 30 jours » et J-1 en arithmétique d'index
+        cal = _calendar(df_cross.get("DATE"), day_roll.get("PERIOD"))
+
         # ======================================================
         # 0) DATA QUALITY + LAST UPDATE
         # ======================================================
@@ -203,14 +292,20 @@ def get_overview_metrics():
         if dates_candidates:
             last_update = max(dates_candidates).isoformat()
 
-        # valid % from cross last 30 days if date exists
-        if not df_cross.empty and "DATE" in df_cross.columns:
-            dmax = df_cross["DATE"].dropna().max()
-            if pd.notna(dmax):
-                cutoff = dmax - pd.Timedelta(days=30)
-                sub = df_cross[df_cross["DATE"] >= cutoff].copy()
+        # valid % from cross last 30 days: rollups si dispo (pas de scan du cross);
+        # fenêtre lue sur les semaines entières (WEEK) + jours des bords (DAY)
+        if not day_roll.empty and day_roll["NB_VALID_CORE"].notna().any():
+            dmax = day_roll["PERIOD"].max()
+            tot = query_rollup(rollups, start=cal.window_start(dmax, SESSIONS_30D), end=dmax)
+            if not tot.empty and tot["NB_ROWS"].iloc[0] > 0:
+                valid_pct = float(tot["NB_VALID_CORE"].iloc[0] / tot["NB_ROWS"].iloc[0]) * 100.0
+        elif not df_cross.empty and "DATE" in df_cross.columns:
+            if df_cross["DATE"].notna().any():
+                sub = df_cross[_last_sessions(df_cross, cal, SESSIONS_30D)].copy()
                 core_cols = [c for c in ["RET_1J", "ZSCORE_1J", "VOL_20D", "DRAWDOWN", "ANOMALY_COMBINED_SCORE", "RISK_LEVEL"] if c in sub.columns]
-                if len(core_cols) >= 2 and len(sub) > 0:
+                if DQ_COLUMN in sub.columns and len(sub) > 0:
+                    valid_pct = is_valid(sub[DQ_COLUMN]).mean() * 100.0
+                elif len(core_cols) >= 2 and len(sub) > 0:
                     valid_pct = (sub[core_cols].notna().all(axis=1).mean()) * 100.0
 
         # fallback valid_pct
@@ -218,7 +313,9 @@ def get_overview_metrics():
             # si pas cross: on estime via perf
             if not df_perf.empty:
                 cols = [c for c in ["YTD", "1_MOIS", "1_SEMAINE"] if c in df_perf.columns]
-                if cols:
+                if DQ_COLUMN in df_perf.columns:
+                    valid_pct = is_valid(df_perf[DQ_COLUMN]).mean() * 100.0
+                elif cols:
                     valid_pct = (df_perf[cols].notna().all(axis=1).mean()) * 100.0
                 else:
                     valid_pct = 0.0
@@ -228,8 +325,8 @@ def get_overview_metrics():
         # ======================================================
         # 1) ANOMALIES daily/weekly (WAFA)
         # ======================================================
-        daily_wafa = df_daily[_is_wafa(df_daily)] if not df_daily.empty else pd.DataFrame()
-        weekly_wafa = df_weekly[_is_wafa(df_weekly)] if not df_weekly.empty else pd.DataFrame()
+        daily_wafa = df_daily[_is_company(df_daily, match)] if not df_daily.empty else pd.DataFrame()
+        weekly_wafa = df_weekly[_is_company(df_weekly, match)] if not df_weekly.empty else pd.DataFrame()
 
         anomalies_daily = int(_anomaly_mask(daily_wafa).sum()) if not daily_wafa.empty else 0
         anomalies_weekly = int(_anomaly_mask(weekly_wafa).sum()) if not weekly_wafa.empty else 0
@@ -240,7 +337,7 @@ def get_overview_metrics():
         risk_status = "UNKNOWN"
         risk_score_100 = np.nan
 
-        risk_wafa = df_risk[_is_wafa(df_risk)] if not df_risk.empty else pd.DataFrame()
+        risk_wafa = df_risk[_is_company(df_risk, match)] if not df_risk.empty else pd.DataFrame()
 
         # risk score numeric: basé sur RISK_SCORE (0..3) => *100/3
         if not risk_wafa.empty:
@@ -250,7 +347,7 @@ def get_overview_metrics():
                     risk_score_100 = float(np.clip((mean_rs / 3.0) * 100.0, 0.0, 100.0))
 
             # risk class: prendre la "pire" classe ou la plus fréquente
-            class_col = _pick_col(risk_wafa, ["FINAL_RISK_CLASS", "RISK_CLASS", "RISK_LEVEL", "RISK_STATUS"])
+            class_col = _pick_col(risk_wafa, RISK_CLASS_COLS)
             if class_col:
                 # pire classe (max num) pour éviter de minimiser
                 tmp = risk_wafa[class_col].astype(str).map(_risk_to_num)
@@ -273,7 +370,7 @@ def get_overview_metrics():
         risk_change_pct = np.nan
         risk_change_dir = "—"
 
-        cross_wafa = df_cross[_is_wafa(df_cross)] if not df_cross.empty else pd.DataFrame()
+        cross_wafa = df_cross[_is_company(df_cross, match)] if not df_cross.empty else pd.DataFrame()
         if not cross_wafa.empty and "DATE" in cross_wafa.columns:
             cross_wafa = cross_wafa.dropna(subset=["DATE"]).sort_values("DATE")
             if "RISK_LEVEL" in cross_wafa.columns:
@@ -283,11 +380,18 @@ def get_overview_metrics():
             else:
                 cross_wafa["_RISK_NUM"] = np.nan
 
-            # moyenne par date
-            by_date = cross_wafa.groupby(cross_wafa["DATE"].dt.date)["_RISK_NUM"].mean().dropna()
-            if len(by_date) >= 2:
+            # moyenne par date: rollup jour (SUM / N) si dispo, sinon groupby sur le brut
+            roll_wafa = query_rollup(rollups, "DAY", **_company_filter(match), by=["PERIOD"]) if not day_roll.empty else pd.DataFrame()
+            if not roll_wafa.empty:
+                by_date = rollup_mean(roll_wafa, "RISK_POINTS").set_axis(roll_wafa["PERIOD"]).dropna()
+            else:
+                by_date = cross_wafa.groupby(cross_wafa["DATE"].dt.date)["_RISK_NUM"].mean().dropna()
+            # J-1 = séance précédant la dernière (pas de comparaison si elle n'a pas de données)
+            by_date.index = pd.to_datetime(by_date.index)
+            prev = by_date.get(cal.shift(by_date.index[-1], -1), np.nan) if len(by_date) >= 2 else np.nan
+            if pd.notna(prev):
                 today = float(by_date.iloc[-1])
-                prev = float(by_date.iloc[-2])
+                prev = float(prev)
                 if prev != 0:
                     risk_change_pct = ((today - prev) / abs(prev)) * 100.0
                 else:
@@ -328,12 +432,12 @@ def get_overview_metrics():
                 if "CODE_ISIN" in perf_df.columns:
                     perf_df = perf_df.groupby("CODE_ISIN", as_index=False).tail(1)
 
-            wafa_perf = perf_df[_is_wafa(perf_df)]
-            market_perf = perf_df[~_is_wafa(perf_df)]
+            wafa_perf = perf_df[_is_company(perf_df, match)]
+            market_perf = perf_df[~_is_company(perf_df, match)]
 
-            ytd_col = _pick_col(perf_df, ["YTD", "PERFORMANCE_YTD", "PERF_YTD"])
-            m1_col = _pick_col(perf_df, ["1_MOIS", "30J", "M30", "PERF_30J", "PERFORMANCE_30D"])
-            w1_col = _pick_col(perf_df, ["1_SEMAINE", "W1", "PERF_1W", "PERFORMANCE_WEEKLY"])
+            ytd_col = _pick_col(perf_df, YTD_COLS)
+            m1_col = _pick_col(perf_df, M1_COLS)
+            w1_col = _pick_col(perf_df, W1_COLS)
 
             def _mean_pct(_df, col):
                 if _df.empty or col is None or col not in _df.columns:
@@ -363,15 +467,24 @@ def get_overview_metrics():
         max_dd = np.nan
         zscore_mean = np.nan
 
-        if not cross_wafa.empty and "DATE" in cross_wafa.columns:
+        roll_cols = {"SUM_VOL_20D", "MIN_DRAWDOWN", "SUM_ZSCORE_1J_ABS"}
+        if not cross_wafa.empty and not day_roll.empty and roll_cols <= set(day_roll.columns):
+            # 30 derniers jours de la société depuis les rollups (cover_range)
             dmax = cross_wafa["DATE"].dropna().max()
             if pd.notna(dmax):
-                cutoff = dmax - pd.Timedelta(days=30)
-                sub = cross_wafa[cross_wafa["DATE"] >= cutoff].copy()
-
-                vol_col = _pick_col(sub, ["VOL_30D", "VOL_20D", "VOLATILITY_30D", "VOLATILITY"])
-                dd_col = _pick_col(sub, ["DRAWDOWN", "MAX_DRAWDOWN", "DD"])
-                z_col = _pick_col(sub, ["ZSCORE_1J", "ZSCORE", "Z_SCORE", "ZSCORE_1D"])
+                tot = query_rollup(rollups, **_company_filter(match),
+                                   start=cal.window_start(dmax, SESSIONS_30D), end=day_roll["PERIOD"].max())
+                if not tot.empty:
+                    vol_30 = float(rollup_mean(tot, "VOL_20D").iloc[0])
+                    max_dd = float(tot["MIN_DRAWDOWN"].iloc[0])
+                    zscore_mean = float(rollup_mean(tot, "ZSCORE_1J_ABS").iloc[0])
+        elif not cross_wafa.empty and "DATE" in cross_wafa.columns:
+            if cross_wafa["DATE"].notna().any():
+                sub = cross_wafa[_last_sessions(cross_wafa, cal, SESSIONS_30D)].copy()
+
+                vol_col = _pick_col(sub, VOL_COLS)
+                dd_col = _pick_col(sub, DRAWDOWN_COLS)
+                z_col = _pick_col(sub, ZSCORE_COLS)
 
                 if vol_col:
                     vol_30 = float(pd.to_numeric(sub[vol_col], errors="coerce").dropna().mean()) if len(sub) else np.nan
@@ -385,8 +498,8 @@ def get_overview_metrics():
         # ======================================================
         ml_signal = "STABLE"
         if not df_pred.empty:
-            pred_wafa = df_pred[_is_wafa(df_pred)]
-            class30_col = _pick_col(pred_wafa, ["FINAL_RISK_CLASS_30D", "FINAL_RISK_CLASS", "RISK_CLASS_30D"])
+            pred_wafa = df_pred[_is_company(df_pred, match)]
+            class30_col = _pick_col(pred_wafa, RISK_CLASS_30D_COLS)
             if not pred_wafa.empty and class30_col:
                 classes = pred_wafa[class30_col].astype(str).str.upper()
                 pct_high = (classes.eq("HIGH_RISK") | classes.eq("HIGH")).mean() * 100.0
@@ -404,7 +517,7 @@ def get_overview_metrics():
         # OUTPUT
         # ======================================================
         return {
-            "societe": WAFA_NAME,
+            "societe": societe,
 
             # Risque
             "risk_score_100": round(float(risk_score_100), 2) if pd.notna(risk_score_100) else None,
@@ -444,7 +557,7 @@ def get_overview_metrics():
     except Exception as e:
         # ZERO CRASH: on renvoie un dict cohérent
         return {
-            "societe": WAFA_NAME,
+            "societe": societe,
             "risk_score_100": None,
             "risk_change_dir": "—",
             "risk_change_pct": None,
@@ -472,13 +585,38 @@ def get_overview_metrics():
 # ======================================================
 # FastAPI Router
 # ======================================================
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
+from src.app.snapshots import store, uncached, derive
+from src.app.http_cache import not_modified, cached_json
+
+OVERVIEW_FILES = [
+    DATA_DIR / "anomaly_results_daily.xlsx",
+    DATA_DIR / "anomaly_results_weekly.xlsx",
+    DATA_DIR / "anomaly_cross_daily_weekly.xlsx",
+    DATA_DIR / "fund_risk_score.xlsx",
+    DATA_DIR / "prediction_future_risk.xlsx",
+    DATA_DIR / "performance_quotidienne_asfim_clean.xlsx",
+    ROLLUP_FILE,
+]
+store.register("overview", uncached(load_data), OVERVIEW_FILES)
 
 router = APIRouter()
 
 @router.get("/overview")
-def api_overview():
+async def api_overview(request: Request, societe: str = WAFA_NAME):
     """
-    Endpoint API pour récupérer les métriques overview.
+    Endpoint API pour récupérer les métriques overview (WAFA GESTION par défaut).
+    Lecture du snapshot courant; KPI calculés une fois par (version, société
+    normalisée). Société absente des données => 404 (rien n'est mémorisé).
+    ETag = version du dataset => 304 tant que le batch n'a pas tourné.
     """
-    return get_overview_metrics()
+    snap = await store.get("overview")
+    cached = not_modified(request, snap)
+    if cached is not None:
+        return cached
+    key = company_key(societe)
+    companies = await derive(snap, ("companies",), known_companies, snap.data)
+    if key != WAFA_NAME and key not in companies:
+        raise HTTPException(status_code=404, detail=f"Société inconnue: {societe}")
+    metrics = await derive(snap, ("overview", key), get_overview_metrics, key, snap.data)
+    return cached_json(request, snap, metrics)
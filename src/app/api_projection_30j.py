@@ -6,6 +6,9 @@ from typing import List, Tuple, Optional
 import pandas as pd
 import streamlit as st
 
+from src.app.fund_reference import company_options, fund_options, load_fund_reference
+from src.preprocessing.fund_keys import join_on_fund
+
 DATA_DIR = Path("src/scraper")
 
 RISK_FILE = DATA_DIR / "fund_risk_score.xlsx"
@@ -97,7 +100,7 @@ def load_projection_30d() -> pd.DataFrame:
 def load_merged_risk_and_pred() -> pd.DataFrame:
     """
     Merge fund_risk_score.xlsx (ALL_FUNDS) + prediction_future_risk.xlsx (PROJECTION_30D_ALL)
-    sur CODE_ISIN.
+    sur FUND_ID (si présent des deux côtés) sinon CODE_ISIN.
     """
     df_risk = load_risk_all_funds()
     df_pred = load_projection_30d()
@@ -107,8 +110,10 @@ def load_merged_risk_and_pred() -> pd.DataFrame:
     if "CODE_ISIN" not in df_risk.columns:
         raise ValueError("fund_risk_score.xlsx: colonne CODE_ISIN introuvable")
 
-    df = df_pred.merge(
-        df_risk[["CODE_ISIN", "FINAL_RISK_CLASS", "RISK_SCORE", "PCT_HIGH_RISK", "PCT_MEDIUM_HIGH", "OPCVM", "SOCIETE_DE_GESTION"]]
+    use_keys = "FUND_ID" in df_pred.columns and "FUND_ID" in df_risk.columns
+    key_cols = ["FUND_ID", "CODE_ISIN"] if use_keys else ["CODE_ISIN"]
+    risk = (
+        df_risk[[*key_cols, "FINAL_RISK_CLASS", "RISK_SCORE", "PCT_HIGH_RISK", "PCT_MEDIUM_HIGH", "OPCVM", "SOCIETE_DE_GESTION"]]
             .rename(columns={
                 "FINAL_RISK_CLASS": "CURRENT_FINAL_RISK_CLASS",
                 "RISK_SCORE": "CURRENT_RISK_SCORE",
@@ -116,12 +121,15 @@ def load_merged_risk_and_pred() -> pd.DataFrame:
                 "PCT_MEDIUM_HIGH": "CURRENT_PCT_MEDIUM_HIGH",
                 "OPCVM": "RISK_OPCVM",
                 "SOCIETE_DE_GESTION": "RISK_SOCIETE_DE_GESTION",
-            }),
-        on="CODE_ISIN",
-        how="left",
-        suffixes=("", "_RISK")
+            })
     )
 
+    if use_keys:
+        # clés entières attribuées au nettoyage => lookup dense, sans hachage des ISIN
+        df = join_on_fund(df_pred, risk)
+    else:
+        df = df_pred.merge(risk, on="CODE_ISIN", how="left", suffixes=("", "_RISK"))
+
     # Harmonize display name/company columns
     if "OPCVM" not in df.columns and "RISK_OPCVM" in df.columns:
         df["OPCVM"] = df["RISK_OPCVM"]
@@ -137,12 +145,18 @@ def load_merged_risk_and_pred() -> pd.DataFrame:
 def get_companies(df: pd.DataFrame) -> List[str]:
     if "SOCIETE_DE_GESTION" not in df.columns:
         return []
+    ref = load_fund_reference()
+    if ref is not None and "CODE_ISIN" in df.columns:
+        return company_options(ref, isins=df["CODE_ISIN"].dropna().unique())
     return sorted([x for x in df["SOCIETE_DE_GESTION"].dropna().unique().tolist() if x])
 
 
 def get_fund_options(df: pd.DataFrame) -> List[str]:
     if "CODE_ISIN" not in df.columns:
         return []
+    ref = load_fund_reference()
+    if ref is not None:
+        return fund_options(ref, isins=df["CODE_ISIN"].dropna().unique())
     if "OPCVM" in df.columns:
         tmp = df[["CODE_ISIN", "OPCVM"]].drop_duplicates()
         return [f"{r['CODE_ISIN']} — {r['OPCVM']}" for _, r in tmp.iterrows()]
@@ -181,3 +195,11 @@ def get_download_bytes(which: str) -> Tuple[bytes, str]:
         raise FileNotFoundError(f"Fichier introuvable: {path}")
 
     return path.read_bytes(), name
+
+
+# ======================================================
+# Snapshot API (projection 30j + risque courant, rechargé en tâche de fond)
+# ======================================================
+from src.app.snapshots import store, uncached
+
+store.register("projection_30d", uncached(load_merged_risk_and_pred), [RISK_FILE, PRED_FILE])
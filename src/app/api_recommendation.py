@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Tuple, List, Optional, Dict
+from typing import Tuple, List, Optional, Dict, Any
 
 # =========================
 # CONFIG
@@ -25,6 +26,16 @@ DEFAULT_SHEETS = {
     "SUMMARY": "SUMMARY_RECO",
 }
 
+# Buckets produits par recommender.py (reco_rule)
+RECO_BUCKETS = [
+    "STABLE_REINFORCE",
+    "MONITOR",
+    "REDUCE_EXPOSURE",
+    "REVIEW_STRATEGY",
+    "IMPROVING_KEEP_WATCH",
+    "WATCHLIST",
+]
+
 
 # =========================
 # HELPERS
@@ -214,8 +225,206 @@ def build_reco_kpis(df_company: pd.DataFrame) -> Dict[str, float]:
     }
 
     if reco_col:
-        vc = df_company[reco_col].astype(str).str.strip().value_counts()
+        vc = _reco_keys(df_company[reco_col]).value_counts()
         for k in ["STABLE_REINFORCE", "IMPROVING_KEEP_WATCH", "WATCHLIST"]:
             kpis[f"count_{k.lower()}"] = float(vc.get(k, 0))
 
     return kpis
+
+
+# =========================
+# PRIORITY INDEX (TOP-K PAR SOCIÉTÉ)
+# =========================
+def _sort_by_priority(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Même tri que recommender.py: PRIORITY_SCORE puis P_MEDIUM_OR_HIGH_30D (décroissant).
+    """
+    prio_col = _pick_col(df, ["PRIORITY_SCORE", "AVG_PRIORITY_SCORE"], contains=["PRIORITY"])
+    pmed_col = _pick_col(df, ["P_MEDIUM_OR_HIGH_30D", "AVG_P_MEDIUM_OR_HIGH_30D"], contains=["MEDIUM_OR_HIGH"])
+    sort_cols = [c for c in [prio_col, pmed_col] if c]
+    if not sort_cols:
+        return df.reset_index(drop=True)
+    # tri numérique (valeurs texte / vides de l'Excel => NaN, en fin de liste)
+    keys = pd.DataFrame({c: pd.to_numeric(df[c], errors="coerce").to_numpy() for c in sort_cols})
+    order = keys.sort_values(sort_cols, ascending=False, kind="mergesort", na_position="last").index
+    return df.iloc[order].reset_index(drop=True)
+
+
+def _reco_keys(s: pd.Series) -> pd.Series:
+    """Clé de bucket normalisée (strip + majuscules), comme à la lecture."""
+    return s.astype(str).str.strip().str.upper()
+
+
+def _build_index_entry(rows: pd.DataFrame, reco_col: Optional[str]) -> Dict[str, Any]:
+    """
+    rows est déjà trié par priorité. On garde, par recommandation, les positions
+    (croissantes => ordre de priorité conservé) pour paginer un bucket sans re-trier.
+    """
+    buckets: Dict[str, np.ndarray] = {}
+    if reco_col and not rows.empty:
+        codes, uniques = pd.factorize(_reco_keys(rows[reco_col]))
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        for i, reco in enumerate(uniques):
+            buckets[reco] = order[bounds[i]:bounds[i + 1]]
+
+    counts = {k: 0 for k in RECO_BUCKETS}
+    counts.update({k: int(len(v)) for k, v in buckets.items()})
+
+    return {
+        "rows": rows,
+        "total": int(len(rows)),
+        "counts": counts,
+        "buckets": buckets,
+        "kpis": build_reco_kpis(rows),
+    }
+
+
+def build_priority_index(df_merged: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Index pré-calculé des recommandations:
+    - "companies": options du selectbox (["ALL"] + sociétés triées)
+    - "by_company": société -> {rows triées par priorité, total, counts par bucket, buckets, kpis}
+    - "by_key": nom normalisé (strip + majuscules) -> clé de by_company
+
+    Un seul tri + un seul groupby sur tout le fichier; ensuite top-K / pagination
+    = simple slice sur le bloc de la société (aucun scan du DataFrame complet).
+    """
+    df_sorted = _sort_by_priority(df_merged)
+    soc_col = _pick_col(df_sorted, ["SOCIETE_DE_GESTION"], contains=["SOCIETE", "GESTION"])
+    reco_col = _pick_col(df_sorted, ["RECOMMENDATION"], contains=["RECOMMEND"])
+
+    by_company: Dict[str, Dict[str, Any]] = {"ALL": _build_index_entry(df_sorted, reco_col)}
+
+    if soc_col:
+        keys = df_sorted[soc_col].astype(str).str.strip()
+        # sort=False + tri préalable => chaque groupe reste ordonné par priorité
+        for company, positions in keys.groupby(keys, sort=False).indices.items():
+            if not company or company.upper() == "NAN":
+                continue
+            rows = df_sorted.iloc[np.sort(positions)].reset_index(drop=True)
+            by_company[company] = _build_index_entry(rows, reco_col)
+
+    companies = ["ALL"] + sorted(c for c in by_company if c != "ALL")
+    by_key: Dict[str, str] = {}
+    for company in companies:
+        by_key.setdefault(company.upper(), company)
+    return {"companies": companies, "by_company": by_company, "by_key": by_key, "reco_col": reco_col}
+
+
+@_cache(ttl=3600)
+def load_priority_index() -> Dict[str, Any]:
+    return build_priority_index(load_recommendations_merged())
+
+
+def get_company_entry(index: Dict[str, Any], company: str) -> Dict[str, Any]:
+    """Entrée d'une société: libellé exact, sinon nom normalisé (strip + majuscules)."""
+    entry = index["by_company"].get(company)
+    if entry is None:
+        key = index.get("by_key", {}).get(str(company).strip().upper())
+        entry = index["by_company"].get(key)
+    if entry is None:
+        # société inconnue => entrée vide (mêmes colonnes que ALL)
+        empty = index["by_company"]["ALL"]["rows"].iloc[0:0]
+        entry = _build_index_entry(empty, index.get("reco_col"))
+    return entry
+
+
+def get_top_k(
+    index: Dict[str, Any],
+    company: str = "ALL",
+    k: int = 15,
+    offset: int = 0,
+    recommendation: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Top-K (ou page [offset, offset+k)) des fonds d'une société, déjà triés par priorité.
+    Si recommendation est fourni, pagination à l'intérieur de ce bucket.
+    """
+    entry = get_company_entry(index, company)
+    rows = entry["rows"]
+    offset = max(int(offset), 0)
+    k = max(int(k), 0)
+
+    if recommendation is None:
+        return rows.iloc[offset:offset + k]
+
+    positions = entry["buckets"].get(recommendation.strip().upper())
+    if positions is None:
+        return rows.iloc[0:0]
+    return rows.iloc[positions[offset:offset + k]]
+
+
+def get_bucket_rows(index: Dict[str, Any], company: str, contains: str) -> pd.DataFrame:
+    """
+    Fonds des buckets dont le nom contient `contains` (ex: "WATCH"), ordre de priorité conservé.
+    """
+    entry = get_company_entry(index, company)
+    token = contains.upper()
+    parts = [pos for reco, pos in entry["buckets"].items() if token in reco.upper()]
+    if not parts:
+        return entry["rows"].iloc[0:0]
+    return entry["rows"].iloc[np.sort(np.concatenate(parts))]
+
+
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+# ======================================================
+# FastAPI Router
+# ======================================================
+from fastapi import APIRouter, HTTPException, Query, Request
+from src.app.snapshots import store, uncached
+from src.app.http_cache import not_modified, cached_json
+
+
+def _reco_files():
+    return [_find_reco_file()]
+
+
+store.register(
+    "recommendations",
+    lambda: build_priority_index(uncached(load_recommendations_merged)()),
+    _reco_files,
+)
+
+router = APIRouter()
+
+@router.get("/recommendations")
+async def api_recommendations(
+    request: Request,
+    company: str = "ALL",
+    recommendation: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Recommandations d'une société triées par PRIORITY_SCORE (pagination limit/offset),
+    servies depuis l'index pré-calculé.
+    """
+    try:
+        snap = await store.get("recommendations")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    cached = not_modified(request, snap)
+    if cached is not None:
+        return cached
+    index = snap.data
+
+    entry = get_company_entry(index, company)
+    total = entry["total"]
+    if recommendation is not None:
+        total = entry["counts"].get(recommendation.strip().upper(), 0)
+
+    page = get_top_k(index, company, k=limit, offset=offset, recommendation=recommendation)
+    return cached_json(request, snap, {
+        "societe": company,
+        "recommendation": recommendation,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "counts": entry["counts"],
+        "items": _records(page),
+    })
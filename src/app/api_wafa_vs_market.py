@@ -1,9 +1,16 @@
 from __future__ import annotations
 
+import json
+import os
+import threading
 from pathlib import Path
 from typing import Tuple, Optional, List, Dict
 import pandas as pd
 
+from src.app.columns import usecols
+from src.app.fund_reference import company_options, load_fund_reference
+from src.preprocessing.vl_panel import open_panel
+
 # =========================
 # CONFIG
 # =========================
@@ -23,6 +30,21 @@ D30_FILE_CANDIDATES = [
     "wafa_vs_marche_30j.xlsx",
 ]
 
+# Cube société vs marché hors société (src/anomaly/peer_comparison.py)
+PEER_CUBE_FILE = DATA_DIR / "peer_comparison_cube.xlsx"
+PEER_CUBE_SHEETS = {
+    "HIST": "PEER_CUBE_HIST",
+    "30D": "PEER_CUBE_30D",
+    "PERF": "PEER_CUBE_PERF",
+}
+
+# Série quotidienne société vs marché (src/anomaly/peer_timeseries.py, append-only)
+PEER_SERIES_FILE = DATA_DIR / "peer_daily_series.csv"
+
+# Bêta / corrélation / Sharpe / tracking error vs indice catégorie (src/anomaly/benchmark_analytics.py)
+BENCHMARK_FILE = DATA_DIR / "benchmark_analytics.xlsx"
+BENCHMARK_SHEET = "FUND_BENCHMARK_METRICS"
+
 
 # =========================
 # STREAMLIT CACHE DECORATOR
@@ -106,43 +128,127 @@ def _to_numeric_best_effort(s: pd.Series) -> pd.Series:
     return pd.to_numeric(s, errors="coerce")
 
 
+# =========================
+# SCHÉMA PAR FEUILLE (persisté à côté du fichier)
+# =========================
+TEXT_COLS = ["SOCIETE_DE_GESTION", "CODE_ISIN", "OPCVM", "MARKET", "BENCHMARK"]
+NON_NUMERIC_COLS = ["OPCVM", "SOCIETE_DE_GESTION", "MARKET", "BENCHMARK", "CATEGORY"]
+MEASURE_TOKENS = ["PERF", "RETURN", "OUT", "BETA", "SHARPE", "VOL", "CORR", "SCORE", "ALPHA", "NB_", "P_", "RATE", "RISK"]
+
+_schema_lock = threading.Lock()
+
+
+def _schema_path(path: Path) -> Path:
+    return path.with_name(f"{path.stem}.schema.json")
+
+
+def _file_version(path: Path) -> Dict[str, int]:
+    st_ = path.stat()
+    return {"mtime_ns": st_.st_mtime_ns, "size": st_.st_size}
+
+
+def _write_schema(path: Path, schema: dict) -> None:
+    # écriture atomique; dossier en lecture seule => inférence refaite à chaque process
+    target = _schema_path(path)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    try:
+        tmp.write_text(json.dumps(schema, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, target)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+
+
+def file_schema(path: Path) -> dict:
+    """
+    Schéma du classeur pour la version courante du fichier (mtime + taille):
+      {"version": ..., "sheets": {feuille: {"columns": [...], "date_col": ..., "types": {col: "numeric"|"raw"}}}}
+    Les en-têtes de toutes les feuilles sont lus une fois (nrows=0); les types d'une
+    feuille ne sont inférés qu'au premier chargement de cette feuille (load_sheet).
+    """
+    version = _file_version(path)
+    target = _schema_path(path)
+    with _schema_lock:
+        if target.exists():
+            try:
+                schema = json.loads(target.read_text(encoding="utf-8"))
+                if schema.get("version") == version:
+                    return schema
+            except (OSError, ValueError):
+                pass
+
+        sheets = {}
+        with pd.ExcelFile(path) as xls:
+            for name in xls.sheet_names:
+                header = _normalize_cols(pd.read_excel(xls, sheet_name=name, nrows=0))
+                sheets[name] = {
+                    "columns": list(header.columns),
+                    "date_col": _pick_col(header, ["DATE"], contains=["DATE", "DAY", "JOUR", "WEEK"]),
+                }
+        schema = {"version": version, "sheets": sheets}
+        _write_schema(path, schema)
+        return schema
+
+
+def _infer_type(s: pd.Series, name: str) -> str:
+    """Même heuristique que l'ancienne conversion à l'essai, exécutée une fois par version."""
+    if name in NON_NUMERIC_COLS:
+        return "raw"
+    if any(tok in name for tok in MEASURE_TOKENS):
+        return "numeric"
+    # tentative safe : si >60% des valeurs deviennent numeric, on garde
+    cand = _to_numeric_best_effort(s)
+    ratio = cand.notna().mean() if len(cand) else 0
+    return "numeric" if ratio >= 0.6 else "raw"
+
+
+def _sheet_types(path: Path, sheet_name: str, df: pd.DataFrame, date_col: Optional[str]) -> Dict[str, str]:
+    """Types des colonnes chargées: lus dans le schéma, inférés (et persistés) pour les colonnes inconnues."""
+    schema = file_schema(path)
+    info = schema["sheets"].setdefault(sheet_name, {"columns": list(df.columns), "date_col": date_col})
+    types = info.setdefault("types", {})
+    unknown = [c for c in df.columns if c not in types]
+    if unknown:
+        types.update({c: _infer_type(df[c], c) for c in unknown})
+        with _schema_lock:
+            if schema["version"] == _file_version(path):
+                _write_schema(path, schema)
+    return types
+
+
 @_cache(ttl=3600)
 def list_sheets(path: Path) -> List[str]:
-    xls = pd.ExcelFile(path)
-    return xls.sheet_names
+    return list(file_schema(path)["sheets"])
+
+
+def sheet_columns(path: Path) -> Dict[str, List[str]]:
+    """Feuille -> colonnes (normalisées), sans charger les données."""
+    return {name: info["columns"] for name, info in file_schema(path)["sheets"].items()}
 
 
 @_cache(ttl=3600)
-def load_sheet(path: Path, sheet_name: str) -> pd.DataFrame:
-    df = pd.read_excel(path, sheet_name=sheet_name)
+def load_sheet(path: Path, sheet_name: str, columns: Optional[tuple] = None) -> pd.DataFrame:
+    """
+    Feuille normalisée (dates, texte, mesures). columns: colonnes à lire, None => toutes.
+    Les conversions numériques suivent le schéma persisté (pas de conversion à l'essai).
+    """
+    df = pd.read_excel(path, sheet_name=sheet_name, usecols=usecols(columns))
     df = _normalize_cols(df)
 
     # auto parse dates
-    date_col = _pick_col(df, ["DATE"], contains=["DATE", "DAY", "JOUR", "WEEK"])
-    if date_col:
+    info = file_schema(path)["sheets"].get(sheet_name, {})
+    date_col = info["date_col"] if info else _pick_col(df, ["DATE"], contains=["DATE", "DAY", "JOUR", "WEEK"])
+    if date_col and date_col in df.columns:
         _to_datetime_safe(df, date_col)
 
     # normalize common text columns
-    for c in ["SOCIETE_DE_GESTION", "CODE_ISIN", "OPCVM", "MARKET", "BENCHMARK"]:
+    for c in TEXT_COLS:
         if c in df.columns:
             df[c] = df[c].astype(str).str.strip()
 
-    # numeric conversion (robuste)
-    for c in df.columns:
-        cu = str(c).upper()
-        # on évite de convertir des colonnes manifestement texte
-        if cu in ["OPCVM", "SOCIETE_DE_GESTION", "MARKET", "BENCHMARK", "CATEGORY"]:
-            continue
-
-        # si ça ressemble à une mesure
-        if any(tok in cu for tok in ["PERF", "RETURN", "OUT", "BETA", "SHARPE", "VOL", "CORR", "SCORE", "ALPHA", "NB_", "P_", "RATE", "RISK"]):
+    # numeric conversion (types inférés une fois par version du fichier)
+    for c, kind in _sheet_types(path, sheet_name, df, date_col).items():
+        if kind == "numeric" and c in df.columns:
             df[c] = _to_numeric_best_effort(df[c])
-        else:
-            # tentative safe : si >60% des valeurs deviennent numeric, on garde
-            cand = _to_numeric_best_effort(df[c])
-            ratio = cand.notna().mean() if len(cand) else 0
-            if ratio >= 0.6:
-                df[c] = cand
 
     # sort by date if possible
     if date_col and date_col in df.columns:
@@ -163,6 +269,10 @@ def list_companies(df: pd.DataFrame) -> List[str]:
     c = _pick_col(df, ["SOCIETE_DE_GESTION"], contains=["SOCIETE", "GESTION"])
     if not c:
         return ["ALL"]
+    # référentiel fonds: toutes les sociétés (aussi utilisées pour le bloc indice catégorie)
+    ref = load_fund_reference()
+    if ref is not None:
+        return ["ALL"] + company_options(ref)
     vals = df[c].dropna().astype(str).str.strip().tolist()
     uniq = sorted([v for v in set(vals) if v and v.upper() != "NAN"])
     return ["ALL"] + uniq
@@ -174,7 +284,7 @@ def filter_company(df: pd.DataFrame, company: str) -> pd.DataFrame:
     c = _pick_col(df, ["SOCIETE_DE_GESTION"], contains=["SOCIETE", "GESTION"])
     if not c:
         return df
-    return df[df[c].astype(str).str.strip() == company]
+    return df[df[c].astype(str).str.strip().str.upper() == company.strip().upper()]
 
 
 def filter_isin(df: pd.DataFrame, isin: str) -> pd.DataFrame:
@@ -212,3 +322,143 @@ def compute_basic_metrics(df: pd.DataFrame) -> Dict[str, float]:
         m["outperformance"] = m["wafa_perf"] - m["market_perf"]
 
     return m
+
+
+# =========================
+# PEER CUBE (toute société vs marché hors société)
+# =========================
+@_cache(ttl=3600)
+def load_peer_cube() -> Dict[str, pd.DataFrame]:
+    """
+    Charge le cube pré-calculé: une feuille par horizon, indexée par SOCIETE_DE_GESTION.
+    """
+    if not PEER_CUBE_FILE.exists():
+        raise FileNotFoundError(
+            f"Fichier introuvable: {PEER_CUBE_FILE}\n"
+            "=> Lance src/anomaly/peer_comparison.py"
+        )
+
+    xls = pd.ExcelFile(PEER_CUBE_FILE)
+    out: Dict[str, pd.DataFrame] = {}
+    for key, sheet in PEER_CUBE_SHEETS.items():
+        if sheet not in xls.sheet_names:
+            continue
+        df = _normalize_cols(pd.read_excel(xls, sheet_name=sheet))
+        df["SOCIETE_DE_GESTION"] = df["SOCIETE_DE_GESTION"].astype(str).str.upper().str.strip()
+        out[key] = df.set_index("SOCIETE_DE_GESTION")
+    return out
+
+
+def list_peer_companies(cube: Dict[str, pd.DataFrame]) -> List[str]:
+    if "HIST" not in cube:
+        return []
+    return cube["HIST"].index.tolist()
+
+
+def get_company_vs_market(cube: Dict[str, pd.DataFrame], company: str) -> Dict[str, Dict[str, float]]:
+    """
+    Lookup O(1) d'une société dans le cube => {horizon: {metric: value}}.
+    Horizon absent / société inconnue => dict vide pour cet horizon.
+    """
+    key = str(company).upper().strip()
+    out: Dict[str, Dict[str, float]] = {}
+    for horizon, df in cube.items():
+        out[horizon] = df.loc[key].to_dict() if key in df.index else {}
+    return out
+
+
+def company_vs_market_table(row: Dict[str, float]) -> pd.DataFrame:
+    """
+    Met en forme une ligne du cube: METRIC | COMPANY | MARKET_EX | DIFF.
+    """
+    rows = []
+    for k, v in row.items():
+        if k.startswith(("MARKET_EX_", "DIFF_", "OUTPERF_")):
+            continue
+        m = row.get(f"MARKET_EX_{k}")
+        rows.append({
+            "METRIC": k,
+            "COMPANY": v,
+            "MARKET_EX_COMPANY": m,
+            "DIFF": (v - m) if isinstance(v, (int, float)) and isinstance(m, (int, float)) else None,
+        })
+    return pd.DataFrame(rows)
+
+
+# =========================
+# SÉRIE QUOTIDIENNE SOCIÉTÉ VS MARCHÉ
+# =========================
+@_cache(ttl=3600)
+def load_peer_daily_series() -> pd.DataFrame:
+    """
+    Série (DATE x SOCIETE_DE_GESTION) déjà agrégée par le pipeline, triée par société puis date.
+    """
+    if not PEER_SERIES_FILE.exists():
+        raise FileNotFoundError(
+            f"Fichier introuvable: {PEER_SERIES_FILE}\n"
+            "=> Lance src/anomaly/peer_timeseries.py"
+        )
+    df = pd.read_csv(PEER_SERIES_FILE, parse_dates=["DATE"])
+    df["SOCIETE_DE_GESTION"] = df["SOCIETE_DE_GESTION"].astype(str).str.upper().str.strip()
+    return df.sort_values(["SOCIETE_DE_GESTION", "DATE"], kind="mergesort").reset_index(drop=True)
+
+
+def get_company_series(df: pd.DataFrame, company: str, metric: str = "RISK_POINTS") -> pd.DataFrame:
+    """
+    Série d'une société pour une métrique: colonnes COMPANY / MARKET_EX_COMPANY / SPREAD, index DATE.
+    df est trié par société => slice via searchsorted (pas de masque sur tout le fichier).
+    """
+    key = str(company).upper().strip()
+    soc = df["SOCIETE_DE_GESTION"].to_numpy()
+    lo, hi = soc.searchsorted(key, side="left"), soc.searchsorted(key, side="right")
+    sub = df.iloc[lo:hi]
+
+    cols = {f"MEAN_{metric}": "COMPANY", f"MARKET_EX_MEAN_{metric}": "MARKET_EX_COMPANY", f"SPREAD_{metric}": "SPREAD"}
+    cols = {k: v for k, v in cols.items() if k in sub.columns}
+    return sub.set_index("DATE")[list(cols)].rename(columns=cols)
+
+
+# =========================
+# BENCHMARK (INDICE CATÉGORIE)
+# =========================
+@_cache(ttl=3600)
+def load_benchmark_metrics() -> pd.DataFrame:
+    """
+    Dernières valeurs par fonds: BETA / CORRELATION / SHARPE_RATIO / TRACKING_ERROR
+    (fenêtre par défaut) + colonnes *_30D / *_90D / *_250D.
+    """
+    if not BENCHMARK_FILE.exists():
+        raise FileNotFoundError(
+            f"Fichier introuvable: {BENCHMARK_FILE}\n"
+            "=> Lance src/anomaly/benchmark_analytics.py"
+        )
+    df = _normalize_cols(pd.read_excel(BENCHMARK_FILE, sheet_name=BENCHMARK_SHEET))
+    for c in ["SOCIETE_DE_GESTION", "CODE_ISIN", "OPCVM", "CATEGORY"]:
+        if c in df.columns:
+            df[c] = df[c].astype(str).str.strip()
+    if "SOCIETE_DE_GESTION" in df.columns:
+        df["SOCIETE_DE_GESTION"] = df["SOCIETE_DE_GESTION"].str.upper()
+    return df
+
+
+# =========================
+# PANEL VL (MEMORY-MAPPÉ)
+# =========================
+# pas de st.cache_data: le panel est un memmap partagé (open_panel le garde
+# ouvert par version), les calculs lisent des tranches de colonnes
+def fund_performance(isins: Optional[List[str]] = None, start=None, end=None) -> pd.DataFrame:
+    """Performance / volatilité annualisée / max drawdown par fonds (panel VL)."""
+    panel = open_panel()
+    if isins is not None:
+        isins = [i for i in (str(x).strip().upper() for x in isins) if i in panel.isins]
+    return panel.performance(isins, start, end)
+
+
+def panel_version() -> str:
+    return open_panel().version
+
+
+def fund_cumulative(isin: str, start=None, end=None) -> pd.Series:
+    """Performance cumulée d'un fonds (panel VL), KeyError si absent du panel."""
+    return open_panel().cumulative(isin, start, end)
+
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import Callable, Iterable, Optional
+
+
+# ======================================================
+# Projection de colonnes à la lecture (usecols)
+# ======================================================
+def norm_col(name) -> str:
+    """Nom de colonne normalisé comme dans les loaders (MAJUSCULES, sans espaces aux bords)."""
+    return str(name).upper().strip()
+
+
+def usecols(columns: Optional[Iterable[str]]) -> Optional[Callable[[str], bool]]:
+    """
+    Argument `usecols` pour pd.read_excel / pd.read_csv: ne garde que les colonnes
+    dont le nom normalisé figure dans `columns` (None => toutes les colonnes).
+    Le filtre est appliqué par le lecteur => les colonnes non demandées ne sont ni
+    converties ni stockées. Une colonne demandée mais absente est simplement ignorée
+    (les fichiers n'ont pas tous les mêmes variantes de noms).
+    """
+    if columns is None:
+        return None
+    wanted = frozenset(norm_col(c) for c in columns)
+    return lambda name: norm_col(name) in wanted
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+CACHE_SIZE = 256  # séries sous-échantillonnées gardées en mémoire (LRU)
+
+
+# ======================================================
+# Algorithmes (sur tableaux NumPy, retournent des positions)
+# ======================================================
+def _as_float(x) -> np.ndarray:
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: garde dans chaque bucket le point qui forme le plus
+    grand triangle avec le point retenu précédent et la moyenne du bucket suivant
+    => pics et creux conservés. Une passe par bucket, calcul vectorisé dans le bucket.
+    x, y sans NaN; premier et dernier points toujours gardés.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = _as_float(x), _as_float(y)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)  # n_out - 2 buckets internes
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y, n_out: int) -> np.ndarray:
+    """
+    Min/max par bucket (entièrement vectorisé): ~n_out/2 buckets, argmin + argmax de chacun.
+    """
+    y = _as_float(y)
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    n_buckets = n_out // 2
+    size = int(np.ceil(n / n_buckets))
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(n_buckets, size)
+    base = np.arange(n_buckets) * size
+
+    ok = ~np.all(np.isnan(blocks), axis=1)
+    lo = base[ok] + np.nanargmin(blocks[ok], axis=1)
+    hi = base[ok] + np.nanargmax(blocks[ok], axis=1)
+    return np.unique(np.r_[0, lo, hi, n - 1])
+
+
+def downsample_indices(x, y, max_points: int, keep=None, method: str = "lttb") -> np.ndarray:
+    """
+    Positions à afficher pour la série (x, y): au plus ~max_points points choisis
+    par LTTB (ou min/max), plus toutes les positions keep=True (anomalies).
+    Les NaN de y sont ignorés.
+    """
+    y = _as_float(y)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= max_points:
+        sel = valid
+    elif method == "minmax":
+        sel = valid[minmax_indices(y[valid], max_points)]
+    else:
+        sel = valid[lttb_indices(np.asarray(x)[valid], y[valid], max_points)]
+
+    if keep is not None:
+        sel = np.union1d(sel, np.flatnonzero(np.asarray(keep, dtype=bool)))
+    return sel
+
+
+def multi_indices(x, ys: Sequence, max_points: int, keep=None, method: str = "lttb") -> np.ndarray:
+    """Union des points retenus pour plusieurs séries partageant le même axe x (budget réparti)."""
+    if not len(ys):
+        return np.array([], dtype=np.int64)
+    budget = max(max_points // len(ys), 3)
+    parts = [downsample_indices(x, y, budget, keep=keep, method=method) for y in ys]
+    return np.unique(np.concatenate(parts))
+
+
+def downsample_frame(
+    df: pd.DataFrame,
+    x_col: str,
+    y_cols: List[str],
+    max_points: int,
+    keep_col: Optional[str] = None,
+    method: str = "lttb",
+) -> pd.DataFrame:
+    """DataFrame trié sur x_col -> lignes retenues (extrêmes + anomalies conservés)."""
+    if len(df) <= max_points:
+        return df
+    keep = df[keep_col].fillna(0).to_numpy(dtype=bool) if keep_col and keep_col in df.columns else None
+    pos = multi_indices(df[x_col].to_numpy(), [df[c].to_numpy() for c in y_cols], max_points, keep, method)
+    return df.iloc[pos]
+
+
+# ======================================================
+# Cache par (série, résolution)
+# ======================================================
+_CACHE: "OrderedDict[Hashable, Any]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def memo(key: Hashable, compute: Callable[[], Any]) -> Any:
+    """
+    Résultat mis en cache sous key (ex: (version fichier, filtres, colonnes, max_points)).
+    LRU borné à CACHE_SIZE entrées; partagé par les reruns Streamlit du process.
+    """
+    with _LOCK:
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            return _CACHE[key]
+    value = compute()
+    with _LOCK:
+        _CACHE[key] = value
+        if len(_CACHE) > CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return value
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+DATA_DIR = Path("src/scraper")
+REFERENCE_FILE = DATA_DIR / "fund_reference.csv"   # src/preprocessing/fund_reference.py
+
+
+# ======================================================
+# Référentiel fonds (dimension), chargé une fois par version du fichier
+# ======================================================
+def _version(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+@lru_cache(maxsize=2)
+def _load(version: Tuple[int, int]) -> Dict[str, Any]:
+    df = pd.read_csv(REFERENCE_FILE, dtype=str, keep_default_na=False, na_values=[""])
+    df = df.sort_values("CODE_ISIN").reset_index(drop=True)
+    if "FUND_ID" in df.columns:
+        df["FUND_ID"] = pd.to_numeric(df["FUND_ID"], errors="coerce").astype("Int32")
+    for flag in ["IN_DAILY", "IN_WEEKLY"]:
+        df[flag] = df[flag].eq("True") if flag in df.columns else True
+    names = df["OPCVM"].fillna("")
+    isins = df["CODE_ISIN"].tolist()
+
+    by_company: Dict[str, List[str]] = {}
+    company_of: Dict[str, str] = {}
+    for isin, company in zip(isins, df["SOCIETE_DE_GESTION"].fillna("")):
+        company_of[isin] = company
+        if company:
+            by_company.setdefault(company, []).append(isin)
+
+    return {
+        "version": version,
+        "df": df,
+        "isins": isins,
+        "names": dict(zip(isins, names)),
+        "labels": {i: f"{i} — {n}" if n else i for i, n in zip(isins, names)},
+        "company_of": company_of,
+        "by_company": by_company,
+        "companies": sorted(by_company),
+        "sources": {
+            "DAILY": frozenset(df.loc[df["IN_DAILY"], "CODE_ISIN"]),
+            "WEEKLY": frozenset(df.loc[df["IN_WEEKLY"], "CODE_ISIN"]),
+        },
+        "options": {},   # listes déroulantes déjà calculées (même durée de vie que la version)
+    }
+
+
+def load_fund_reference() -> Optional[Dict[str, Any]]:
+    """
+    Référentiel (ISIN, nom, société, catégorie, périodicité) + tables de lookup.
+    Rechargé uniquement quand le fichier change (mtime / taille); None s'il n'a
+    pas encore été construit (les appelants retombent alors sur leurs données).
+    """
+    if not REFERENCE_FILE.exists():
+        return None
+    return _load(_version(REFERENCE_FILE))
+
+
+def _memo(ref: Dict[str, Any], key, compute):
+    """Résultat gardé dans le référentiel => recalculé seulement à la version suivante."""
+    if key is None:
+        return compute()
+    options = ref["options"]
+    if key not in options:
+        options[key] = compute()
+    return options[key]
+
+
+def company_options(
+    ref: Dict[str, Any],
+    isins: Optional[Iterable[str]] = None,
+    source: Optional[str] = None,
+) -> List[str]:
+    """
+    Sociétés (triées) ayant au moins un fonds publié dans `source` ("DAILY" / "WEEKLY")
+    et/ou parmi `isins`.
+    """
+    def compute():
+        keep = ref["isins"] if isins is None else isins
+        if source:
+            keep = [i for i in keep if i in ref["sources"][source]]
+        company_of = ref["company_of"]
+        return sorted({company_of[i] for i in keep if company_of.get(i)})
+
+    if isins is None and source is None:
+        return ref["companies"]
+    return _memo(ref, ("companies", source) if isins is None else None, compute)
+
+
+def fund_isins(
+    ref: Dict[str, Any],
+    company: Optional[str] = None,
+    isins: Optional[Iterable[str]] = None,
+    source: Optional[str] = None,
+) -> List[str]:
+    """ISIN (triés) d'une société (ou de tous), limités à `isins` / à la source si fournis."""
+    out = ref["by_company"].get(company, []) if company and company != "ALL" else ref["isins"]
+    if source:
+        out = [i for i in out if i in ref["sources"][source]]
+    if isins is not None:
+        keep = set(isins)
+        out = [i for i in out if i in keep]
+    return out
+
+
+def fund_options(
+    ref: Dict[str, Any],
+    company: Optional[str] = None,
+    isins: Optional[Iterable[str]] = None,
+    source: Optional[str] = None,
+) -> List[str]:
+    """Libellés « ISIN — Nom » pour les listes déroulantes."""
+    def compute():
+        labels = ref["labels"]
+        return [labels[i] for i in fund_isins(ref, company, isins, source)]
+
+    return _memo(ref, ("funds", company, source) if isins is None else None, compute)
+
+
+def fund_label(ref: Optional[Dict[str, Any]], isin: str) -> str:
+    """« ISIN — Nom » (l'ISIN seul si inconnu / référentiel absent)."""
+    if ref is None:
+        return isin
+    return ref["labels"].get(isin, isin)
+
+
+def fund_identity(ref: Optional[Dict[str, Any]], isin: str) -> Dict[str, Any]:
+    """Attributs du fonds (dict vide si inconnu)."""
+    if ref is None:
+        return {}
+    df = ref["df"]
+    pos = df["CODE_ISIN"].searchsorted(isin)
+    if pos >= len(df) or df["CODE_ISIN"].iat[pos] != isin:
+        return {}
+    row = df.iloc[pos]
+    return {k: (None if pd.isna(v) else v.item() if hasattr(v, "item") else v) for k, v in row.items()}
+
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.app.snapshots import Snapshot
+
+# le client revalide à chaque fois (304 quasi gratuit tant que le batch n'a pas tourné)
+CACHE_CONTROL = "no-cache"
+
+
+# ======================================================
+# ETag / Last-Modified dérivés de la version du snapshot
+# ======================================================
+def snapshot_etag(snap: Snapshot, request: Request) -> str:
+    """
+    ETag faible = hash(version du dataset + chemin + paramètres de requête).
+    Faible: la même représentation peut être servie brute ou compressée (GZip,
+    proxy), octets différents pour un même ETag.
+    """
+    key = f"{snap.name}|{snap.version}|{request.url.path}|{sorted(request.query_params.multi_items())}"
+    return 'W/"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+
+def _opaque(tag: str) -> str:
+    """Comparaison faible (If-None-Match, RFC 9110): préfixe W/ ignoré."""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _validators(snap: Snapshot, etag: str) -> dict:
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(snap.modified_at, usegmt=True),
+        "Cache-Control": CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+
+
+def not_modified(request: Request, snap: Snapshot) -> Optional[Response]:
+    """
+    304 si le client a déjà cette représentation (If-None-Match prioritaire sur
+    If-Modified-Since, RFC 9110). À appeler AVANT de construire la réponse.
+    """
+    etag = snapshot_etag(snap, request)
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = {_opaque(t) for t in inm.split(",")}
+        if _opaque(etag) in tags or "*" in tags:
+            return Response(status_code=304, headers=_validators(snap, etag))
+        return None
+
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            if int(snap.modified_at) <= parsedate_to_datetime(ims).timestamp():
+                return Response(status_code=304, headers=_validators(snap, etag))
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def cached_json(request: Request, snap: Snapshot, payload: Any) -> JSONResponse:
+    """JSONResponse avec ETag / Last-Modified / Cache-Control."""
+    etag = snapshot_etag(snap, request)
+    return JSONResponse(content=jsonable_encoder(payload), headers=_validators(snap, etag))
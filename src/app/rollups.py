@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = Path("src/scraper")
+ROLLUP_FILE = DATA_DIR / "rollups.xlsx"
+ROLLUP_SHEETS = {"DAY": "ROLLUP_DAY", "WEEK": "ROLLUP_WEEK", "MONTH": "ROLLUP_MONTH"}
+DIMENSIONS = ["SOCIETE_DE_GESTION", "CATEGORY", "RISK_LEVEL"]
+
+
+def _cache(ttl: int = 3600):
+    """
+    Décorateur cache_data si streamlit est dispo, sinon no-op.
+    """
+    try:
+        import streamlit as st
+        return st.cache_data(ttl=ttl)
+    except Exception:
+        def no_op(func):
+            return func
+        return no_op
+
+
+# ======================================================
+# Chargement
+# ======================================================
+@_cache(ttl=3600)
+def load_rollups() -> Dict[str, pd.DataFrame]:
+    """Rollups jour / semaine / mois (src/anomaly/rollups.py); {} si non construits."""
+    if not ROLLUP_FILE.exists():
+        return {}
+    sheets = pd.read_excel(ROLLUP_FILE, sheet_name=None)
+    out = {}
+    for grain, sheet in ROLLUP_SHEETS.items():
+        if sheet not in sheets:
+            continue
+        df = sheets[sheet]
+        df.columns = df.columns.astype(str).str.upper().str.strip()
+        df["PERIOD"] = pd.to_datetime(df["PERIOD"], errors="coerce")
+        df["SOCIETE_DE_GESTION"] = df["SOCIETE_DE_GESTION"].astype(str).str.upper().str.strip()
+        out[grain] = df.sort_values("PERIOD").reset_index(drop=True)
+    return out
+
+
+# ======================================================
+# Requêtes
+# ======================================================
+def smallest_grain(rollups: Dict[str, pd.DataFrame], start=None, end=None, need_daily: bool = False) -> str:
+    """
+    Rollup le plus petit qui répond exactement à [start, end]: MONTH si la période
+    est faite de mois entiers, WEEK si semaines entières (lundi -> dimanche), sinon DAY.
+    """
+    if not need_daily and start is not None and end is not None:
+        s, e = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+        if "MONTH" in rollups and s.day == 1 and (e + pd.Timedelta(days=1)).day == 1:
+            return "MONTH"
+        if "WEEK" in rollups and s.weekday() == 0 and e.weekday() == 6:
+            return "WEEK"
+    return "DAY"
+
+
+def _full_periods(s: pd.Timestamp, e: pd.Timestamp, grain: str):
+    """[premier, dernier jour] des mois / semaines entiers contenus dans [s, e], None si aucun."""
+    if grain == "MONTH":
+        first = s if s.day == 1 else s + pd.offsets.MonthBegin(1)
+        last = e if (e + pd.Timedelta(days=1)).day == 1 else e - pd.Timedelta(days=e.day)
+    else:
+        first = s + pd.Timedelta(days=(7 - s.weekday()) % 7)
+        last = e - pd.Timedelta(days=(e.weekday() + 1) % 7)
+    return (first, last) if first <= last else None
+
+
+def cover_range(rollups: Dict[str, pd.DataFrame], start, end) -> List[tuple]:
+    """
+    Découpage de [start, end] (jours inclus) sur les plus gros grains disponibles:
+    mois entiers (MONTH), puis semaines entières des bords (WEEK), reste en jours (DAY).
+    Liste de (grain, premier jour, dernier jour).
+    """
+    def split(s, e, grains):
+        if s > e:
+            return []
+        if not grains:
+            return [("DAY", s, e)]
+        grain, rest = grains[0], grains[1:]
+        full = _full_periods(s, e, grain) if grain in rollups else None
+        if full is None:
+            return split(s, e, rest)
+        first, last = full
+        return split(s, first - pd.Timedelta(days=1), rest) + [(grain, first, last)] \
+            + split(last + pd.Timedelta(days=1), e, rest)
+
+    s, e = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    return split(s, e, ["MONTH", "WEEK"])
+
+
+def query_rollup(
+    rollups: Dict[str, pd.DataFrame],
+    grain: Optional[str] = None,
+    company: Optional[str] = None,
+    match: Optional[str] = None,
+    start=None,
+    end=None,
+    by: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Agrège le rollup (filtre société exact ou motif `match`, période) sur `by`
+    (ex: ["PERIOD"], ["CATEGORY"], [] = total). Sommes / effectifs sommés, min / max.
+    Sans `grain`: période [start, end] lue sur les plus petits rollups qui la
+    couvrent (cover_range: mois / semaines entiers + jours des bords); un seul
+    grain (smallest_grain) si `by` contient PERIOD ou si la période est ouverte.
+    """
+    by = by or []
+    if grain is None and start is not None and end is not None and "PERIOD" not in by \
+            and rollups.get("DAY") is not None:
+        parts = []
+        for g, s, e in cover_range(rollups, start, end):
+            df = rollups[g]
+            parts.append(df[(df["PERIOD"] >= s) & (df["PERIOD"] <= e)])
+        df = pd.concat(parts, ignore_index=True)
+        start = end = None
+    else:
+        grain = grain or smallest_grain(rollups, start, end, need_daily="PERIOD" in by)
+        df = rollups.get(grain, pd.DataFrame())
+    if df.empty:
+        return df
+
+    mask = np.ones(len(df), dtype=bool)
+    soc = df["SOCIETE_DE_GESTION"]
+    if company:
+        mask &= (soc == company.strip().upper()).to_numpy()
+    if match:
+        mask &= soc.str.contains(match.strip().upper(), na=False, regex=False).to_numpy()
+    if start is not None:
+        mask &= (df["PERIOD"] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (df["PERIOD"] <= pd.Timestamp(end)).to_numpy()
+    sub = df[mask]
+
+    values = [c for c in sub.columns if c not in ["PERIOD"] + DIMENSIONS]
+    mins = [c for c in values if c.startswith("MIN_")]
+    maxs = [c for c in values if c.startswith("MAX_")]
+    sums = [c for c in values if c not in mins + maxs]
+
+    if not by:
+        row = pd.concat([
+            sub[sums].sum(min_count=1), sub[mins].min(), sub[maxs].max(),
+        ])
+        return row.to_frame().T[values]
+    g = sub.groupby(by, sort=True)
+    return pd.concat([g[sums].sum(min_count=1), g[mins].min(), g[maxs].max()], axis=1)[values].reset_index()
+
+
+def rollup_mean(agg: pd.DataFrame, metric: str) -> pd.Series:
+    """Moyenne dérivée = SUM_m / N_m (NaN si aucun point)."""
+    if f"SUM_{metric}" not in agg.columns:
+        return pd.Series(np.nan, index=agg.index)
+    n = agg[f"N_{metric}"].replace(0, np.nan)
+    return agg[f"SUM_{metric}"] / n
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = 60  # intervalle de vérification des fichiers (mtime / taille)
+MAX_DERIVED = 128     # résultats dérivés gardés par snapshot (LRU)
+
+Files = Union[Iterable[Path], Callable[[], Iterable[Path]]]
+
+
+# ======================================================
+# Snapshot immuable d'un dataset
+# ======================================================
+@dataclass(frozen=True)
+class Snapshot:
+    name: str
+    version: str
+    loaded_at: float
+    modified_at: float  # mtime le plus récent des fichiers sources (Last-Modified)
+    data: Any
+    # résultats dérivés (ex: overview par société), calculés une fois par version
+    derived: Dict[Any, Any] = field(default_factory=dict, compare=False, repr=False)
+
+
+def uncached(func: Callable) -> Callable:
+    """
+    Fonction d'origine derrière st.cache_data (le store gère lui-même la fraîcheur,
+    inutile de payer la copie/pickle du cache Streamlit à chaque rechargement).
+    """
+    return getattr(func, "__wrapped__", func)
+
+
+def files_version(paths: Iterable[Path]) -> str:
+    """Version d'un ensemble de fichiers = hash (chemin, mtime, taille); fichier absent => 'missing'."""
+    h = hashlib.sha1()
+    for p in sorted(Path(x) for x in paths):
+        try:
+            st = p.stat()
+            h.update(f"{p}|{st.st_mtime_ns}|{st.st_size};".encode())
+        except FileNotFoundError:
+            h.update(f"{p}|missing;".encode())
+    return h.hexdigest()[:16]
+
+
+# ======================================================
+# Store: chargement hors event loop + swap atomique
+# ======================================================
+class SnapshotStore:
+    """
+    Les loaders (Excel / pandas) tournent dans un thread (asyncio.to_thread);
+    le nouveau Snapshot remplace l'ancien par une simple affectation de dict.
+    Les handlers ne font que lire le snapshot courant: leur latence ne dépend
+    plus du temps de rechargement.
+    """
+
+    def __init__(self, refresh_seconds: int = REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._files: Dict[str, Files] = {}
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, loader: Callable[[], Any], files: Files) -> None:
+        self._loaders[name] = loader
+        self._files[name] = files
+
+    @property
+    def names(self):
+        return list(self._loaders)
+
+    def _paths(self, name: str):
+        files = self._files[name]
+        try:
+            return list(files() if callable(files) else files)
+        except FileNotFoundError:
+            return []
+
+    def version(self, name: str) -> str:
+        return files_version(self._paths(name))
+
+    def peek(self, name: str) -> Optional[Snapshot]:
+        return self._snapshots.get(name)
+
+    async def refresh(self, name: str, force: bool = False) -> Snapshot:
+        """Recharge le dataset si ses fichiers ont changé (ou si force)."""
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            current = self._snapshots.get(name)
+            version = self.version(name)
+            if current is not None and current.version == version and not force:
+                return current
+            data = await asyncio.to_thread(self._loaders[name])
+            mtimes = [Path(p).stat().st_mtime for p in self._paths(name) if Path(p).exists()]
+            snap = Snapshot(
+                name=name, version=version, loaded_at=time.time(),
+                modified_at=max(mtimes, default=time.time()), data=data,
+            )
+            self._snapshots[name] = snap  # swap atomique
+            return snap
+
+    async def get(self, name: str) -> Snapshot:
+        """Snapshot courant; premier accès => chargement (les suivants lisent sans attendre)."""
+        snap = self._snapshots.get(name)
+        if snap is not None:
+            return snap
+        return await self.refresh(name)
+
+    async def refresh_all(self) -> None:
+        for name in self.names:
+            try:
+                await self.refresh(name)
+            except Exception as e:
+                # l'ancien snapshot reste servi
+                logger.warning("Snapshot %s non rechargé: %s", name, e)
+
+    async def _loop(self) -> None:
+        while True:
+            await self.refresh_all()
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+async def derive(snap: Snapshot, key: Any, func: Callable, *args, **kwargs) -> Any:
+    """
+    Résultat dérivé d'un snapshot (calculé dans un thread, une seule fois par version).
+    `key` doit être normalisé par l'appelant; au plus MAX_DERIVED entrées (LRU).
+    """
+    if key in snap.derived:
+        value = snap.derived.pop(key)
+    else:
+        value = await asyncio.to_thread(func, *args, **kwargs)
+    snap.derived[key] = value  # fin du dict = plus récent
+    while len(snap.derived) > MAX_DERIVED:
+        snap.derived.pop(next(iter(snap.derived)))
+    return value
+
+
+store = SnapshotStore()
@@ -0,0 +1,423 @@
+"""
+Capture des changements (republications ASFIM) et recalcul incrémental.
+
+Trois niveaux:
+- fichiers sources : SourceManifest (manifest.json du dossier de téléchargement)
+  garde le sha256 de chaque fichier; un fichier republié avec un contenu
+  différent est détecté, l'ancienne version archivée dans history/.
+- lignes : row_snapshot() / diff_snapshots() comparent le dataset clean au run
+  précédent par (fonds, date) => ADDED / MODIFIED / REMOVED, journalisés dans
+  src/scraper/changes_<daily|weekly>.csv (append_changes).
+- étapes : plan() compare le hash de chaque ligne (fonds, date) en entrée de
+  l'étape à celui du dernier run réussi (src/scraper/.incremental/<stage>.*);
+  une nouvelle séance ne recalcule que la queue du fonds, une séance republiée
+  le fonds (ou la ligne), le reste est repris du résultat précédent (<stage>.pkl,
+  pleine précision: l'aller-retour Excel arrondit les float).
+  Reconstruction complète si pas d'état, script modifié, sortie absente ou
+  modifiée hors pipeline, trop de fonds republiés, ou PIPELINE_FULL_REBUILD=1.
+
+Usage (scripts du pipeline, après sys.path.append de la racine):
+    from src.pipeline.change_capture import plan
+
+    p = plan("features_daily", df, key="FUND_ID", outputs=[OUTPUT_FILE], script=__file__)
+    part = p.select(df, context=20)          # lignes à recalculer (+ amorce des fenêtres)
+    ...
+    out = p.merge(p.previous(), out_part) if not p.full else out_part
+    ...export...
+    p.commit(out)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.pipeline.code_deps import code_hash
+from src.preprocessing.asof_join import asof_join
+
+ROOT = Path(__file__).resolve().parents[2]
+STATE_DIR = ROOT / "src" / "scraper" / ".incremental"
+
+FULL_REBUILD = os.environ.get("PIPELINE_FULL_REBUILD", "0") == "1"
+MAX_CHANGED_SHARE = 0.5      # part de fonds republiés au-delà de laquelle on reconstruit tout
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _write_json(path: Path, data) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False))
+    tmp.replace(path)
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+# ======================================================
+# Fichiers sources (scrapers)
+# ======================================================
+class SourceManifest:
+    """sha256 / dates de chaque fichier téléchargé (download_folder/manifest.json)."""
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.path = self.folder / "manifest.json"
+        self.entries: Dict[str, dict] = {}
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def _entry(self, name: str) -> Optional[dict]:
+        """Entrée du fichier; un fichier présent mais jamais vu (avant le manifest) sert de référence."""
+        entry = self.entries.get(name)
+        if entry is None and (self.folder / name).exists():
+            entry = {"sha256": content_hash((self.folder / name).read_bytes()), "first_seen": _now(),
+                     "last_changed": _now(), "versions": 1}
+            self.entries[name] = entry
+        return entry
+
+    def record(self, name: str, content: bytes) -> str:
+        """
+        Écrit le fichier si son contenu est nouveau et retourne "new", "unchanged"
+        ou "restated" (version précédente archivée dans history/).
+        """
+        digest = content_hash(content)
+        entry = self._entry(name)
+        if entry is not None and entry["sha256"] == digest:
+            return "unchanged"
+
+        path = self.folder / name
+        status = "new"
+        if entry is not None:
+            status = "restated"
+            if path.exists():
+                history = self.folder / "history"
+                history.mkdir(exist_ok=True)
+                shutil.copy2(path, history / f"{path.stem}.{entry['sha256'][:12]}{path.suffix}")
+
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(content)
+        tmp.replace(path)
+        self.entries[name] = {
+            "sha256": digest,
+            "first_seen": entry["first_seen"] if entry else _now(),
+            "last_changed": _now(),
+            "versions": entry.get("versions", 1) + 1 if entry else 1,
+        }
+        return status
+
+    def by_publication(self, names: Sequence[str]) -> List[str]:
+        """
+        Noms triés par date de dernier changement (stable): à doublon (fonds, date)
+        entre deux fichiers, la version la plus récente arrive en dernier.
+        """
+        def last(name):
+            entry = self.entries.get(os.path.basename(name))
+            return entry["last_changed"] if entry else ""
+        return sorted(names, key=last)
+
+    def save(self) -> None:
+        _write_json(self.path, self.entries)
+
+
+# ======================================================
+# Lignes (clean daily / weekly)
+# ======================================================
+HASH_COLUMN = "ROW_HASH"
+
+
+def row_hashes(df: pd.DataFrame, columns: Optional[Sequence[str]] = None) -> np.ndarray:
+    """Hash uint64 de chaque ligne (valeurs de `columns`, index ignoré)."""
+    cols = list(columns) if columns is not None else list(df.columns)
+    return pd.util.hash_pandas_object(df[cols], index=False).to_numpy(dtype=np.uint64)
+
+
+def row_snapshot(df: pd.DataFrame, keys: Sequence[str], exclude: Iterable[str] = (),
+                 values: Sequence[str] = ()) -> pd.DataFrame:
+    """
+    Empreinte du dataset: clés + `values` (gardées pour le journal) + ROW_HASH
+    calculé sur toutes les colonnes hors `exclude` (colonnes dérivées).
+    """
+    skip = set(exclude)
+    hashed = [c for c in df.columns if c not in skip]
+    snap = df[list(keys) + [c for c in values if c in df.columns]].reset_index(drop=True)
+    snap[HASH_COLUMN] = row_hashes(df, hashed)
+    return snap
+
+
+def save_snapshot(snap: pd.DataFrame, path) -> None:
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp.npz")
+    arrays = {c: snap[c].to_numpy() for c in snap.columns}
+    arrays = {c: v.astype(str) if v.dtype == object else v for c, v in arrays.items()}   # sans pickle
+    np.savez_compressed(tmp, **arrays)
+    tmp.replace(path)
+
+
+def load_snapshot(path) -> Optional[pd.DataFrame]:
+    path = Path(path)
+    if not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as z:
+        return pd.DataFrame({c: z[c] for c in z.files})
+
+
+def diff_snapshots(old: Optional[pd.DataFrame], new: pd.DataFrame, keys: Sequence[str]) -> pd.DataFrame:
+    """
+    Lignes ajoutées / modifiées / supprimées entre deux empreintes (CHANGE), avec
+    les colonnes de valeurs avant (_OLD) et après (_NEW).
+    """
+    keys = list(keys)
+    values = [c for c in new.columns if c not in keys and c != HASH_COLUMN]
+    if old is None:
+        return pd.DataFrame(columns=keys + ["CHANGE"] + [f"{c}_{s}" for c in values for s in ("OLD", "NEW")])
+
+    m = old.merge(new, on=keys, how="outer", suffixes=("_OLD", "_NEW"), indicator=True)
+    change = np.select(
+        [m["_merge"] == "right_only", m["_merge"] == "left_only", m[f"{HASH_COLUMN}_OLD"] != m[f"{HASH_COLUMN}_NEW"]],
+        ["ADDED", "REMOVED", "MODIFIED"],
+        default="",
+    )
+    m["CHANGE"] = change
+    cols = keys + ["CHANGE"] + [f"{c}_{s}" for c in values for s in ("OLD", "NEW") if f"{c}_{s}" in m.columns]
+    return m.loc[m["CHANGE"] != "", cols].reset_index(drop=True)
+
+
+def append_changes(changes: pd.DataFrame, path) -> None:
+    """Journal append-only des changements (une ligne par (fonds, date) changé, horodatée)."""
+    if changes.empty:
+        return
+    path = Path(path)
+    out = changes.copy()
+    out.insert(0, "RUN_AT", _now())
+    out.to_csv(path, mode="a", header=not path.exists(), index=False)
+
+
+def summarize(changes: pd.DataFrame) -> str:
+    counts = changes["CHANGE"].value_counts() if len(changes) else pd.Series(dtype=int)
+    return ", ".join(f"{counts.get(c, 0)} {label}" for c, label in
+                     [("ADDED", "ajoutées"), ("MODIFIED", "modifiées"), ("REMOVED", "supprimées")])
+
+
+# ======================================================
+# Étapes incrémentales
+# ======================================================
+def _file_stamp(path) -> Optional[List[int]]:
+    try:
+        st = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _script_hash(script) -> str:
+    # script + modules src.* importés: un changement de logique partagée invalide l'état
+    return code_hash(script) if script else ""
+
+
+def _pairs(df: pd.DataFrame, key: str, on: str) -> pd.MultiIndex:
+    return pd.MultiIndex.from_frame(df[[key, on]])
+
+
+@dataclass
+class Plan:
+    stage: str
+    key: str
+    on: str
+    rows_state: pd.DataFrame                  # (clé, date, ROW_HASH) des lignes d'entrée (run courant)
+    outputs: List[str]
+    code: str
+    full: bool = True
+    reason: str = ""
+    changed: np.ndarray = field(default_factory=lambda: np.array([]))   # fonds recalculés en entier
+    tail: pd.Series = field(default_factory=lambda: pd.Series(dtype=object))   # fonds -> 1re séance ajoutée
+    restated: pd.DataFrame = field(default_factory=pd.DataFrame)        # (clé, date) republiées (row_level)
+    removed: np.ndarray = field(default_factory=lambda: np.array([]))
+    n_restated: int = 0                       # fonds dont des séances existantes ont changé
+
+    @property
+    def funds(self) -> pd.Index:
+        return pd.Index(self.rows_state[self.key].unique())
+
+    def rows(self, df: pd.DataFrame, context: int = 0) -> np.ndarray:
+        """
+        Masque des lignes à recalculer: fonds de `changed`, séances ajoutées
+        (queue) des fonds de `tail`, lignes republiées; `context` séances
+        précédant la queue en plus (amorce des fenêtres glissantes).
+        """
+        if self.full:
+            return np.ones(len(df), dtype=bool)
+        m = df[self.key].isin(self.changed).to_numpy()
+        start = df[self.key].map(self.tail)
+        m |= (df[self.on] >= start).to_numpy()
+        if len(self.restated):
+            m |= _pairs(df, self.key, self.on).isin(_pairs(self.restated, self.key, self.on))
+        if context:
+            before = df[self.on].where(df[self.on] < start)
+            rank = before.groupby(df[self.key]).rank(method="first", ascending=False)
+            m |= (rank <= context).to_numpy()
+        return m
+
+    def touched(self, df: pd.DataFrame) -> np.ndarray:
+        """Masque des lignes des fonds recalculés, complétés ou republiés (agrégats par fonds)."""
+        if self.full:
+            return np.ones(len(df), dtype=bool)
+        funds = self.tail.index.union(pd.Index(self.changed))
+        if len(self.restated):
+            funds = funds.union(pd.Index(self.restated[self.key].unique()))
+        return df[self.key].isin(funds).to_numpy()
+
+    def select(self, df: pd.DataFrame, context: int = 0) -> pd.DataFrame:
+        return df if self.full else df[self.rows(df, context)]
+
+    def merge(self, previous: pd.DataFrame, fresh: pd.DataFrame) -> pd.DataFrame:
+        """
+        Sortie précédente (hors lignes recalculées) + lignes recalculées, triées
+        par fonds (ordre stable => même ordre qu'un calcul complet groupé par clé).
+        Sortie par séance (colonne `on`): les lignes de contexte de `fresh` sont
+        écartées. Sortie agrégée par fonds: `fresh` remplace les fonds de
+        `changed` et de `tail` (agrégats complétés par l'étape).
+        """
+        keep = previous[self.key].isin(self.funds) & ~previous[self.key].isin(self.changed)
+        if self.on in previous.columns:
+            keep &= ~(previous[self.on] >= previous[self.key].map(self.tail))
+            if len(self.restated):
+                keep &= ~_pairs(previous, self.key, self.on).isin(_pairs(self.restated, self.key, self.on))
+            fresh = fresh[~(fresh[self.on] < fresh[self.key].map(self.tail))]
+        else:
+            keep &= ~previous[self.key].isin(self.tail.index)
+        out = pd.concat([previous[keep], fresh], ignore_index=True)
+        return out.sort_values(self.key, kind="stable").reset_index(drop=True)
+
+    def carry(self, df: pd.DataFrame, previous: pd.DataFrame, columns: Sequence[str]) -> pd.DataFrame:
+        """
+        Colonnes `columns` reprises de la sortie précédente pour les lignes non
+        recalculées (même fonds, même `on`), NaN pour les lignes à recalculer.
+        """
+        keep = previous[~self.rows(previous)]
+        out, _ = asof_join(df.drop(columns=[c for c in columns if c in df.columns]), keep,
+                           on=self.on, by=self.key, columns=list(columns), tolerance=0)
+        out.index = df.index
+        return out
+
+    def previous(self) -> pd.DataFrame:
+        """Résultat du dernier run réussi (enregistré par commit)."""
+        return pd.read_pickle(STATE_DIR / f"{self.stage}.pkl")
+
+    def rebuild(self, reason: str) -> None:
+        """Force la reconstruction complète (ex: modèle à re-fitter sur tout l'historique)."""
+        self.full, self.reason = True, reason
+        self.changed = np.asarray(self.funds)
+        self.tail = pd.Series(dtype=object)
+        self.restated = pd.DataFrame()
+
+    def describe(self) -> str:
+        if self.full:
+            return f"reconstruction complète ({self.reason})"
+        return (f"incrémental : {self.n_restated} fonds republiés, {len(self.changed)} recalculés en entier, "
+                f"{len(self.tail)} complétés (nouvelles séances), {len(self.removed)} retirés")
+
+    def commit(self, result: pd.DataFrame) -> None:
+        """Enregistre résultat + état après un export réussi (base du diff du prochain run)."""
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = STATE_DIR / f"{self.stage}.pkl.tmp"
+        result.to_pickle(tmp, compression=None)
+        tmp.replace(STATE_DIR / f"{self.stage}.pkl")
+        save_snapshot(self.rows_state, STATE_DIR / f"{self.stage}.rows.npz")
+        _write_json(STATE_DIR / f"{self.stage}.json", {
+            "key": self.key,
+            "on": self.on,
+            "code": self.code,
+            "updated_at": _now(),
+            "outputs": {str(p): _file_stamp(p) for p in self.outputs},
+        })
+
+
+def _load_stage_state(stage: str) -> Optional[dict]:
+    path = STATE_DIR / f"{stage}.json"
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def plan(stage: str, df: pd.DataFrame, key: str, outputs: Sequence, script=None,
+         columns: Optional[Sequence[str]] = None, on: str = "DATE", row_level: bool = False,
+         max_share: float = MAX_CHANGED_SHARE) -> Plan:
+    """
+    Lignes à recalculer pour `stage`: diff par (fonds, `on`) des hash de lignes
+    (colonnes `columns` de df, toutes par défaut) avec le dernier run réussi.
+
+    - séance postérieure à la dernière connue du fonds => ajout: seule la queue
+      du fonds est recalculée (Plan.tail);
+    - séance existante modifiée, supprimée ou insérée avant la dernière =>
+      republication: fonds recalculé en entier, ou seulement ces lignes si
+      `row_level` (étapes ligne à ligne);
+    - nouveau fonds => recalculé en entier.
+    Le seuil `max_share` ne porte que sur les fonds republiés ou retirés: une
+    nouvelle séance pour tous les fonds reste incrémentale.
+    """
+    outputs = [str(Path(p).resolve()) for p in outputs]
+    snap = df[[key, on]].reset_index(drop=True)
+    snap[HASH_COLUMN] = row_hashes(df, columns)
+    p = Plan(stage, key, on, snap, outputs, _script_hash(script))
+    state = _load_stage_state(stage)
+    prev = load_snapshot(STATE_DIR / f"{stage}.rows.npz") if state is not None else None
+
+    if FULL_REBUILD:
+        p.reason = "PIPELINE_FULL_REBUILD=1"
+    elif state is None or prev is None:
+        p.reason = "pas d'état précédent"
+    elif not (STATE_DIR / f"{stage}.pkl").exists():
+        p.reason = "résultat précédent absent"
+    elif state.get("key") != key or state.get("on") != on or state.get("code") != p.code:
+        p.reason = "clé ou script modifié"
+    elif any(_file_stamp(o) is None for o in outputs):
+        p.reason = "sortie absente"
+    elif any(state.get("outputs", {}).get(o) != _file_stamp(o) for o in outputs):
+        p.reason = "sortie modifiée hors pipeline"
+    else:
+        prev[on] = prev[on].astype(snap[on].dtype)
+        m = prev.merge(snap, on=[key, on], how="outer", suffixes=("_OLD", "_NEW"), indicator=True)
+        last = m[key].map(prev.groupby(key)[on].max())
+        added = (m["_merge"] == "right_only").to_numpy()
+        gone = (m["_merge"] == "left_only").to_numpy()
+        new_fund = added & last.isna().to_numpy()
+        appended = added & (m[on] > last).to_numpy()
+        modified = ((m["_merge"] == "both") & (m[f"{HASH_COLUMN}_OLD"] != m[f"{HASH_COLUMN}_NEW"])).to_numpy()
+        restated = modified | gone | (added & ~appended & ~new_fund)
+
+        p.removed = np.asarray(pd.Index(prev[key].unique()).difference(p.funds))
+        restated_funds = pd.Index(m.loc[restated, key].unique()).difference(p.removed)
+        p.n_restated = len(restated_funds)
+        share = (p.n_restated + len(p.removed)) / max(len(p.funds), 1)
+        if share > max_share:
+            p.reason = f"{share:.0%} des fonds republiés"
+        else:
+            p.full = False
+            full_funds = pd.Index(m.loc[new_fund, key].unique())
+            if row_level:
+                p.restated = m.loc[restated & ~gone, [key, on]].reset_index(drop=True)
+            else:
+                full_funds = full_funds.union(restated_funds)
+            p.changed = np.asarray(full_funds)
+            tail = m.loc[appended, [key, on]].groupby(key)[on].min()
+            p.tail = tail[~tail.index.isin(full_funds)]
+    if p.full:
+        p.changed = np.asarray(p.funds)
+    return p
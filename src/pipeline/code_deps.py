@@ -0,0 +1,73 @@
+"""
+Dépendances de code d'un script du pipeline: modules src.* importés (analyse
+statique ast, transitive), pour que le hash d'une étape change quand une règle
+DQ, la jointure as-of, etc. changent, et pas seulement le script lui-même.
+
+    from src.pipeline.code_deps import code_hash
+    code_hash(SRC / "anomaly/cross_anomalies.py")   # script + modules src.* importés
+"""
+from __future__ import annotations
+
+import ast
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+PACKAGE = "src"
+
+
+def _module_file(module: str) -> Optional[Path]:
+    """Fichier d'un module src.a.b (module ou package), None si hors repo."""
+    parts = module.split(".")
+    if parts[0] != PACKAGE:
+        return None
+    base = ROOT.joinpath(*parts)
+    for path in (base.with_suffix(".py"), base / "__init__.py"):
+        if path.is_file():
+            return path
+    return None
+
+
+@lru_cache(maxsize=None)
+def _direct_imports(path: Path, mtime_ns: int) -> Tuple[Path, ...]:
+    try:
+        tree = ast.parse(path.read_bytes(), filename=str(path))
+    except (OSError, SyntaxError, ValueError):
+        return ()
+    found = []
+    for node in ast.walk(tree):   # y compris les imports dans les fonctions / __main__
+        if isinstance(node, ast.Import):
+            found += [_module_file(a.name) for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            found.append(_module_file(node.module))
+            # from src.pipeline import tracing => sous-module
+            found += [_module_file(f"{node.module}.{a.name}") for a in node.names]
+    return tuple(sorted({p for p in found if p is not None and p != path}))
+
+
+def code_deps(script) -> List[Path]:
+    """Modules src.* importés par `script`, transitivement (script exclu), triés."""
+    script = Path(script).resolve()
+    seen, todo = set(), [script]
+    while todo:
+        path = todo.pop()
+        for dep in _direct_imports(path, path.stat().st_mtime_ns):
+            if dep not in seen and dep != script:
+                seen.add(dep)
+                todo.append(dep)
+    return sorted(seen)
+
+
+def code_hash(script) -> str:
+    """sha1 du script et de ses dépendances src.* (chemins relatifs + contenu)."""
+    script = Path(script).resolve()
+    h = hashlib.sha1()
+    for path in [script, *code_deps(script)]:
+        try:
+            rel = path.relative_to(ROOT).as_posix()
+        except ValueError:
+            rel = path.name
+        h.update(rel.encode() + b"\0" + path.read_bytes() + b"\0")
+    return h.hexdigest()
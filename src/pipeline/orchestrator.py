@@ -0,0 +1,358 @@
+"""
+Orchestrateur du batch: étapes déclarées (script, entrées, sorties), dépendances
+déduites des fichiers, étapes à jour sautées (hash des entrées), branches
+indépendantes en parallèle, temps / mémoire de chaque étape enregistrés.
+
+Usage (depuis la racine du repo):
+    python -m src.pipeline.orchestrator                 # tout ce qui n'est pas à jour
+    python -m src.pipeline.orchestrator --list
+    python -m src.pipeline.orchestrator --only cross_anomalies --force
+    python -m src.pipeline.orchestrator --from fund_risk_scoring --jobs 4
+    python -m src.pipeline.orchestrator --with-scrapers  # inclut le scraping (selenium)
+    python -m src.pipeline.orchestrator --profile cprofile   # dump par étape (tracing.py)
+    python -m src.pipeline.orchestrator --from features_daily --force --full-rebuild
+                                                        # ignore l'état incrémental (change_capture.py)
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from src.pipeline.code_deps import code_hash
+from src.pipeline.tracing import wait_child
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "src"
+DATA_DIR = SRC / "scraper"
+STATE_FILE = DATA_DIR / ".pipeline_state.json"
+RUNS_FILE = DATA_DIR / "pipeline_runs.jsonl"   # une ligne JSON par étape exécutée
+LOG_DIR = DATA_DIR / "pipeline_logs"
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str                      # relatif à src/
+    inputs: List[str]                # relatifs à src/scraper
+    outputs: List[str]
+    optional: bool = False           # scrapers: uniquement avec --with-scrapers
+    deps: Set[str] = field(default_factory=set)
+
+
+# ======================================================
+# DAG (ordre de déclaration = ordre topologique)
+# ======================================================
+STAGES: List[Stage] = [
+    Stage("scrape_daily", "scraper/scraper_asfim_daily.py", [], ["performance_quotidienne_asfim.xlsx"], optional=True),
+    Stage("scrape_weekly", "scraper/weekly_scraper.py", [], ["performance_hebdomadaire_asfim.xlsx"], optional=True),
+
+    Stage("clean_daily", "preprocessing/clean_daily.py",
+          ["performance_quotidienne_asfim.xlsx"], ["performance_quotidienne_asfim_clean.xlsx", "trading_calendar.csv"]),
+    # WEEK_DATE alignée sur le calendrier de clean_daily; contrôle DQ VL hebdo vs daily
+    Stage("clean_weekly", "preprocessing/clean_weekly.py",
+          ["performance_hebdomadaire_asfim.xlsx", "trading_calendar.csv", "performance_quotidienne_asfim_clean.xlsx"],
+          ["performance_hebdomadaire_asfim_clean.xlsx"]),
+    Stage("fusion_asfim", "preprocessing/fusion_asfim.py",
+          ["performance_quotidienne_asfim.xlsx", "performance_hebdomadaire_asfim.xlsx"], ["dataset_fusion_asfim.xlsx"]),
+    Stage("fund_reference", "preprocessing/fund_reference.py",
+          ["performance_quotidienne_asfim_clean.xlsx", "performance_hebdomadaire_asfim_clean.xlsx"],
+          ["fund_reference.csv"]),
+    Stage("check_cleandaily", "preprocessing/check_cleandaily.py",
+          ["performance_quotidienne_asfim_clean.xlsx"], ["sanity_report_daily.xlsx"]),
+    Stage("vl_panel", "preprocessing/vl_panel.py",
+          ["performance_quotidienne_asfim_clean.xlsx"], ["vl_panel/CURRENT"]),
+
+    Stage("features_daily", "anomaly/features_anomaly_daily.py",
+          ["performance_quotidienne_asfim_clean.xlsx"], ["features_anomaly_daily.xlsx"]),
+    Stage("features_weekly", "anomaly/features_engineering_weekly.py",
+          ["performance_hebdomadaire_asfim_clean.xlsx"], ["features_anomaly_weekly.xlsx"]),
+    Stage("anomaly_daily", "anomaly/anomaly_model.py",
+          ["features_anomaly_daily.xlsx"], ["anomaly_results_daily.xlsx", "anomaly_model_daily.joblib"]),
+    Stage("anomaly_weekly", "anomaly/anomaly_model_weekly.py",
+          ["features_anomaly_weekly.xlsx"], ["anomaly_results_weekly.xlsx"]),
+    Stage("cross_anomalies", "anomaly/cross_anomalies.py",
+          ["anomaly_results_daily.xlsx", "anomaly_results_weekly.xlsx"], ["anomaly_cross_daily_weekly.xlsx"]),
+    Stage("fund_risk_scoring", "anomaly/fund_risk_scoring.py",
+          ["anomaly_cross_daily_weekly.xlsx"], ["fund_risk_score.xlsx"]),
+    Stage("rollups", "anomaly/rollups.py",
+          ["anomaly_cross_daily_weekly.xlsx"], ["rollups.xlsx"]),
+    Stage("peer_timeseries", "anomaly/peer_timeseries.py",
+          ["anomaly_cross_daily_weekly.xlsx"], ["peer_daily_series.csv"]),
+    Stage("benchmark_analytics", "anomaly/benchmark_analytics.py",
+          ["performance_quotidienne_asfim_clean.xlsx", "vl_panel/CURRENT"], ["benchmark_analytics.xlsx"]),
+
+    Stage("predict_model", "prediction/predict_model.py",
+          ["anomaly_cross_daily_weekly.xlsx"], ["prediction_future_risk.xlsx"]),
+    # réécrit prediction_future_risk.xlsx (ajoute les feuilles PROJECTION_30D_*)
+    Stage("projection_30jrs", "prediction/projection_30jrs.py",
+          ["prediction_future_risk.xlsx"], ["prediction_future_risk.xlsx"]),
+
+    Stage("wafa_vs_marche", "anomaly/wafa_vs_marche.py",
+          ["fund_risk_score.xlsx"], ["wafa_vs_market_comparaison.xlsx"]),
+    Stage("wafa_vs_marche_30jrs", "prediction/wafa_vs_marche_30jrs.py",
+          ["prediction_future_risk.xlsx"], ["wafa_vs_market_30d.xlsx"]),
+    Stage("peer_comparison", "anomaly/peer_comparison.py",
+          ["fund_risk_score.xlsx", "prediction_future_risk.xlsx", "performance_quotidienne_asfim_clean.xlsx"],
+          ["peer_comparison_cube.xlsx"]),
+    Stage("recommender", "recommendation/recommender.py",
+          ["fund_risk_score.xlsx", "prediction_future_risk.xlsx"], ["recommendations.xlsx"]),
+    # append-only: un snapshot (delta) par séance, date de valeur = dernière séance du calendrier
+    Stage("risk_history", "recommendation/risk_history.py",
+          ["fund_risk_score.xlsx", "prediction_future_risk.xlsx", "recommendations.xlsx", "trading_calendar.csv"],
+          ["risk_history/manifest.json"]),
+]
+
+
+def resolve_deps(stages: List[Stage]) -> Dict[str, Stage]:
+    """
+    Dépendance = dernier stage déclaré AVANT le consommateur qui écrit le fichier
+    (gère les fichiers réécrits en place, ex: projection_30jrs).
+    """
+    last_writer: Dict[str, str] = {}
+    for st in stages:
+        st.deps = {last_writer[f] for f in st.inputs if f in last_writer and last_writer[f] != st.name}
+        for f in st.outputs:
+            last_writer[f] = st.name
+    return {st.name: st for st in stages}
+
+
+# ======================================================
+# Hash des fichiers (mémo par mtime / taille)
+# ======================================================
+class FileHasher:
+    def __init__(self, memo: Optional[dict] = None):
+        self.memo = memo or {}
+        self.lock = threading.Lock()
+
+    def __call__(self, rel: str) -> Optional[str]:
+        p = DATA_DIR / rel
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            return None
+        key = f"{st.st_mtime_ns}:{st.st_size}"
+        with self.lock:
+            cached = self.memo.get(rel)
+            if cached and cached[0] == key:
+                return cached[1]
+        h = hashlib.sha1()
+        with open(p, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self.lock:
+            self.memo[rel] = [key, digest]
+        return digest
+
+
+def _inputs_hash(stage: Stage, hasher: FileHasher) -> str:
+    # les fichiers réécrits par l'étape elle-même ne comptent pas (sinon jamais "à jour")
+    own = set(stage.outputs)
+    parts = [f"{f}={hasher(f)}" for f in sorted(stage.inputs) if f not in own]
+    # script + modules src.* qu'il importe (règles DQ, jointure as-of, clés...)
+    parts.append(f"code={code_hash(SRC / stage.script)}")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def _outputs_hash(stage: Stage, hasher: FileHasher) -> Optional[str]:
+    hashes = [hasher(f) for f in sorted(stage.outputs)]
+    if any(h is None for h in hashes):
+        return None
+    return hashlib.sha1("|".join(hashes).encode()).hexdigest()
+
+
+def load_state() -> dict:
+    if STATE_FILE.exists():
+        try:
+            return json.loads(STATE_FILE.read_text())
+        except (OSError, ValueError):
+            pass
+    return {"stages": {}, "hashes": {}}
+
+
+def save_state(state: dict) -> None:
+    tmp = STATE_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2))
+    tmp.replace(STATE_FILE)
+
+
+# ======================================================
+# Exécution d'une étape (subprocess, cwd = dossier du script)
+# ======================================================
+def run_stage(stage: Stage, profile: Optional[str] = None, full_rebuild: bool = False) -> dict:
+    script = SRC / stage.script
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log_path = LOG_DIR / f"{stage.name}.log"
+
+    t0 = time.time()
+    with open(log_path, "w", encoding="utf-8") as log:
+        env = {**os.environ, "PYTHONIOENCODING": "utf-8", "PIPELINE_STAGE": stage.name}
+        if profile:
+            env["PIPELINE_PROFILE"] = profile   # voir src/pipeline/tracing.py
+        if full_rebuild:
+            env["PIPELINE_FULL_REBUILD"] = "1"  # voir src/pipeline/change_capture.py
+        proc = subprocess.Popen(
+            [sys.executable, script.name], cwd=script.parent, stdout=log, stderr=subprocess.STDOUT, env=env,
+        )
+        # CPU / pic mémoire du process enfant (None si non mesurables sur la plateforme)
+        usage = wait_child(proc)
+
+    return {
+        "stage": stage.name,
+        "status": "ok" if proc.returncode == 0 else "failed",
+        "returncode": proc.returncode,
+        "wall_s": round(time.time() - t0, 3),
+        **usage,
+        "log": str(log_path.relative_to(ROOT)),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(t0)),
+    }
+
+
+def select_stages(stages: Dict[str, Stage], only=None, start_from=None, with_scrapers=False) -> List[str]:
+    names = [n for n, st in stages.items() if with_scrapers or not st.optional]
+    if start_from:
+        # l'étape + tout ce qui en dépend (transitivement)
+        keep = {start_from}
+        for n in names:
+            if stages[n].deps & keep:
+                keep.add(n)
+        names = [n for n in names if n in keep]
+    if only:
+        names = [n for n in names if n in set(only)]
+    return names
+
+
+def run_pipeline(only=None, start_from=None, force=False, jobs=2, with_scrapers=False, dry_run=False,
+                 profile=None, full_rebuild=False) -> List[dict]:
+    stages = resolve_deps(STAGES)
+    selected = select_stages(stages, only, start_from, with_scrapers)
+    state = load_state()
+    hasher = FileHasher(state.get("hashes"))
+
+    done: Set[str] = set()          # terminées (exécutées ou à jour)
+    ran: Set[str] = set()           # exécutées pendant ce run
+    failed: Set[str] = set()
+    results: List[dict] = []
+    pending = list(selected)
+
+    def is_up_to_date(st: Stage) -> bool:
+        if force or st.deps & ran:
+            return False
+        prev = state["stages"].get(st.name)
+        if not prev:
+            return False
+        return prev.get("inputs") == _inputs_hash(st, hasher) and prev.get("outputs") == _outputs_hash(st, hasher)
+
+    def ready(n: str) -> bool:
+        # dépendances hors sélection: considérées satisfaites
+        return all(d in done or d not in selected for d in stages[n].deps)
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        running = {}
+        while pending or running:
+            for n in list(pending):
+                st = stages[n]
+                if st.deps & failed:
+                    pending.remove(n)
+                    failed.add(n)
+                    results.append({"stage": n, "status": "blocked"})
+                    print(f"⛔ {n} : bloquée (dépendance en échec)")
+                    continue
+                if not ready(n):
+                    continue
+                pending.remove(n)
+                if is_up_to_date(st):
+                    done.add(n)
+                    results.append({"stage": n, "status": "up_to_date"})
+                    print(f"✔ {n} : à jour")
+                    continue
+                if dry_run:
+                    done.add(n)
+                    ran.add(n)
+                    results.append({"stage": n, "status": "would_run"})
+                    print(f"▶ {n} : serait exécutée")
+                    continue
+                print(f"▶ {n} ...")
+                running[pool.submit(run_stage, st, profile, full_rebuild)] = (n, _inputs_hash(st, hasher))
+
+            if not running:
+                continue
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in finished:
+                n, in_hash = running.pop(fut)
+                res = fut.result()
+                results.append(res)
+                with open(RUNS_FILE, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(res) + "\n")
+                if res["status"] == "ok":
+                    done.add(n)
+                    ran.add(n)
+                    state["stages"][n] = {
+                        "inputs": in_hash,
+                        "outputs": _outputs_hash(stages[n], hasher),
+                        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    }
+                    # fichier réécrit en place: les producteurs précédents restent à jour
+                    for other, prev in state["stages"].items():
+                        if other != n and other in stages and set(stages[other].outputs) & set(stages[n].outputs):
+                            prev["outputs"] = _outputs_hash(stages[other], hasher)
+                    state["hashes"] = hasher.memo
+                    save_state(state)
+                    mem = f", pic mémoire {res['max_rss_mb']} Mo" if res.get("max_rss_mb") is not None else ""
+                    print(f"✔ {n} : {res['wall_s']}s{mem}")
+                else:
+                    failed.add(n)
+                    print(f"❌ {n} : échec (code {res['returncode']}) → {res['log']}")
+    return results
+
+
+def print_summary(results: List[dict]) -> None:
+    print("\n📊 Résumé pipeline")
+    for r in results:
+        extra = f"{r['wall_s']:>8.2f}s" if "wall_s" in r else ""
+        if r.get("max_rss_mb") is not None:
+            extra += f"  {r['max_rss_mb']:>8.1f} Mo"
+        print(f"  {r['stage']:<22} {r['status']:<11} {extra}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Orchestrateur du pipeline OPCVM")
+    parser.add_argument("--only", nargs="+", help="exécuter seulement ces étapes")
+    parser.add_argument("--from", dest="start_from", help="cette étape et tout ce qui en dépend")
+    parser.add_argument("--force", action="store_true", help="ignorer le cache (hash des entrées)")
+    parser.add_argument("--jobs", type=int, default=2, help="étapes indépendantes en parallèle")
+    parser.add_argument("--with-scrapers", action="store_true", help="inclure le scraping ASFIM")
+    parser.add_argument("--dry-run", action="store_true", help="afficher ce qui serait exécuté")
+    parser.add_argument("--list", action="store_true", help="lister les étapes et leurs dépendances")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"], help="profil par étape (src/scraper/traces)")
+    parser.add_argument("--full-rebuild", action="store_true", help="recalcul complet des étapes incrémentales")
+    args = parser.parse_args(argv)
+
+    stages = resolve_deps(STAGES)
+    if args.list:
+        for st in stages.values():
+            deps = ", ".join(sorted(st.deps)) or "-"
+            print(f"{st.name:<22} <- {deps}{'  (optionnelle)' if st.optional else ''}")
+        return 0
+    for n in (args.only or []) + ([args.start_from] if args.start_from else []):
+        if n not in stages:
+            parser.error(f"étape inconnue: {n}")
+
+    results = run_pipeline(args.only, args.start_from, args.force, args.jobs, args.with_scrapers, args.dry_run,
+                           args.profile, args.full_rebuild)
+    print_summary(results)
+    return 1 if any(r["status"] in ("failed", "blocked") for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
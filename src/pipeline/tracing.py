@@ -0,0 +1,344 @@
+"""
+Instrumentation légère des scripts du pipeline.
+
+    from src.pipeline.tracing import span, step
+
+    with span("load", file=INPUT_FILE) as s:
+        df = pd.read_excel(INPUT_FILE)
+        s.rows = len(df)
+
+    step("clean", rows=len(df))                   # étape séquentielle (ferme la précédente)
+    ...
+    step("export", rows=len(df))                  # la dernière étape est fermée à la sortie
+
+Chaque span mesure temps réel, CPU, RSS début / fin et pic mémoire du process.
+À la fin du script, la trace (JSON, une ligne par exécution) est ajoutée à
+src/scraper/traces/<stage>.jsonl.
+
+Variables d'environnement:
+    PIPELINE_TRACE=0                 désactive la trace
+    PIPELINE_PROFILE=cprofile        dump cProfile  -> traces/<stage>.prof
+    PIPELINE_PROFILE=pyinstrument    rapport HTML   -> traces/<stage>.html (si installé)
+
+Rapport de régressions (dernière exécution vs médiane des précédentes):
+    python -m src.pipeline.tracing [--threshold 1.3] [--history 7]
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[2]
+TRACE_DIR = ROOT / "src" / "scraper" / "traces"
+
+ENABLED = os.environ.get("PIPELINE_TRACE", "1") != "0"
+PROFILE = os.environ.get("PIPELINE_PROFILE", "").lower()
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / 1024 ** 2 if hasattr(os, "sysconf") else 0.0
+
+
+def _rss_mb() -> float:
+    """RSS courant (Linux: /proc/self/statm), sinon pic."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_MB
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_mb()
+
+
+def _maxrss_mb(ru_maxrss: int) -> float:
+    return ru_maxrss / 1024 ** 2 if sys.platform == "darwin" else ru_maxrss / 1024   # octets sur macOS, Ko sur Linux
+
+
+def _psutil():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil
+
+
+def _peak_rss_mb() -> float:
+    """Pic RSS du process: resource (POSIX), sinon psutil (Windows: peak_wset) si installé, sinon 0."""
+    try:
+        import resource   # POSIX uniquement: importé ici pour que la trace ne casse jamais une étape
+        return _maxrss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    except ImportError:
+        pass
+    except OSError:
+        return 0.0
+    psutil = _psutil()
+    if psutil is None:
+        return 0.0
+    try:
+        mem = psutil.Process().memory_info()
+    except psutil.Error:
+        return 0.0
+    return getattr(mem, "peak_wset", mem.rss) / 1024 ** 2
+
+
+def wait_child(proc: subprocess.Popen, poll_s: float = 0.2) -> Dict[str, Optional[float]]:
+    """
+    Attend la fin de `proc` (returncode renseigné) et retourne cpu_s / max_rss_mb
+    du process enfant: os.wait4 (POSIX), sinon échantillonnage psutil si installé,
+    sinon None (mesures absentes, exécution inchangée).
+    """
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        return {"cpu_s": round(usage.ru_utime + usage.ru_stime, 3), "max_rss_mb": round(_maxrss_mb(usage.ru_maxrss), 1)}
+
+    psutil = _psutil()
+    try:
+        child = psutil.Process(proc.pid) if psutil is not None else None
+    except psutil.Error:
+        child = None
+    cpu = peak = None
+    while True:
+        if child is not None:
+            try:
+                t, mem = child.cpu_times(), child.memory_info()
+                cpu = t.user + t.system
+                peak = max(peak or 0.0, getattr(mem, "peak_wset", mem.rss) / 1024 ** 2)
+            except psutil.Error:
+                child = None
+        try:
+            proc.wait(timeout=poll_s)
+            break
+        except subprocess.TimeoutExpired:
+            continue
+    return {"cpu_s": None if cpu is None else round(cpu, 3), "max_rss_mb": None if peak is None else round(peak, 1)}
+
+
+def _stage_name() -> str:
+    # fixé par l'orchestrateur, sinon nom du script lancé
+    return os.environ.get("PIPELINE_STAGE") or Path(sys.argv[0] or "interactive").stem
+
+
+# ======================================================
+# Spans
+# ======================================================
+class Span:
+    __slots__ = ("name", "parent", "attrs", "rows", "_t0", "_c0", "_rss0", "_peak0", "record")
+
+    def __init__(self, name: str, parent: Optional[str], attrs: Dict[str, Any]):
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.rows: Optional[int] = None
+        self.record: Optional[Dict[str, Any]] = None
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+        self._rss0 = _rss_mb()
+        self._peak0 = _peak_rss_mb()
+
+    def close(self, origin: float) -> Dict[str, Any]:
+        peak = _peak_rss_mb()
+        self.record = {
+            "name": self.name,
+            "parent": self.parent,
+            "start_s": round(self._t0 - origin, 4),
+            "wall_s": round(time.perf_counter() - self._t0, 4),
+            "cpu_s": round(time.process_time() - self._c0, 4),
+            "rss_start_mb": round(self._rss0, 1),
+            "rss_end_mb": round(_rss_mb(), 1),
+            "peak_rss_mb": round(peak, 1),
+            # > 0 => le pic mémoire du process a été atteint pendant ce span
+            "peak_growth_mb": round(peak - self._peak0, 1),
+            "rows": None if self.rows is None else int(self.rows),
+            **self.attrs,
+        }
+        return self.record
+
+
+class Tracer:
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.origin = time.perf_counter()
+        self.cpu0 = time.process_time()
+        self.spans: List[Dict[str, Any]] = []
+        self.stack: List[Span] = []
+        self.current_step: Optional[Span] = None
+        self.profiler = None
+        self.status = "ok"
+
+    # --- spans imbriqués -------------------------------------------------
+    def _parent(self) -> Optional[str]:
+        if self.stack:
+            return self.stack[-1].name
+        return self.current_step.name if self.current_step else None
+
+    @contextmanager
+    def span(self, name: str, rows: Optional[int] = None, **attrs):
+        s = Span(name, self._parent(), attrs)
+        s.rows = rows
+        self.stack.append(s)
+        try:
+            yield s
+        finally:
+            self.stack.pop()
+            self.spans.append(s.close(self.origin))
+
+    # --- étapes séquentielles (scripts "à plat") -------------------------
+    def step(self, name: str, rows: Optional[int] = None, **attrs) -> Span:
+        self.end_step()
+        self.current_step = Span(name, None, attrs)
+        self.current_step.rows = rows
+        return self.current_step
+
+    def end_step(self) -> None:
+        if self.current_step is not None:
+            self.spans.append(self.current_step.close(self.origin))
+            self.current_step = None
+
+    # --- profilage optionnel ---------------------------------------------
+    def start_profiler(self) -> None:
+        if PROFILE == "cprofile":
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif PROFILE == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("⚠️ pyinstrument non installé: profilage désactivé")
+                return
+            self.profiler = Profiler()
+            self.profiler.start()
+
+    def _dump_profile(self) -> Optional[str]:
+        if self.profiler is None:
+            return None
+        if PROFILE == "cprofile":
+            self.profiler.disable()
+            path = TRACE_DIR / f"{self.stage}.prof"
+            self.profiler.dump_stats(path)
+        else:
+            self.profiler.stop()
+            path = TRACE_DIR / f"{self.stage}.html"
+            path.write_text(self.profiler.output_html(), encoding="utf-8")
+        return str(path.relative_to(ROOT))
+
+    # --- export ----------------------------------------------------------
+    def finish(self) -> Optional[Path]:
+        self.end_step()
+        TRACE_DIR.mkdir(parents=True, exist_ok=True)
+        trace = {
+            "stage": self.stage,
+            "script": sys.argv[0],
+            "started_at": self.started_at,
+            "status": self.status,
+            "wall_s": round(time.perf_counter() - self.origin, 4),
+            "cpu_s": round(time.process_time() - self.cpu0, 4),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "profile": self._dump_profile(),
+            "spans": sorted(self.spans, key=lambda s: s["start_s"]),
+        }
+        path = TRACE_DIR / f"{self.stage}.jsonl"
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(trace, default=str) + "\n")
+        return path
+
+
+_TRACER: Optional[Tracer] = None
+
+
+def _finish_safely() -> None:
+    # la trace est accessoire: une erreur d'écriture ne doit pas faire échouer l'étape
+    try:
+        _TRACER.finish()
+    except Exception as e:
+        print(f"⚠️ Trace non écrite: {e}")
+
+
+def tracer() -> Tracer:
+    """Tracer du process (créé au premier appel, trace écrite à la sortie)."""
+    global _TRACER
+    if _TRACER is None:
+        _TRACER = Tracer(_stage_name())
+        _TRACER.start_profiler()
+        if ENABLED:
+            previous_hook = sys.excepthook
+
+            def _hook(*exc):
+                _TRACER.status = "failed"
+                previous_hook(*exc)
+
+            sys.excepthook = _hook
+            atexit.register(_finish_safely)
+    return _TRACER
+
+
+def span(name: str, rows: Optional[int] = None, **attrs):
+    """Context manager: mesure le bloc (attrs libres: file=..., model=...)."""
+    return tracer().span(name, rows, **attrs)
+
+
+def step(name: str, rows: Optional[int] = None, **attrs) -> Span:
+    """Démarre une étape séquentielle (la précédente est fermée); rows = lignes en entrée."""
+    return tracer().step(name, rows, **attrs)
+
+
+# ======================================================
+# Rapport de régressions
+# ======================================================
+def load_traces(stage: str) -> List[Dict[str, Any]]:
+    path = TRACE_DIR / f"{stage}.jsonl"
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _span_totals(trace: Dict[str, Any]) -> Dict[str, float]:
+    totals: Dict[str, float] = {"<total>": trace["wall_s"]}
+    for s in trace["spans"]:
+        totals[s["name"]] = totals.get(s["name"], 0.0) + s["wall_s"]
+    return totals
+
+
+def regressions(stage: str, threshold: float = 1.3, history: int = 7, min_wall_s: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    Spans de la dernière exécution OK plus lents que threshold x la médiane des
+    `history` exécutions OK précédentes (spans < min_wall_s ignorés: bruit).
+    """
+    runs = [t for t in load_traces(stage) if t.get("status") == "ok"]
+    if len(runs) < 2:
+        return []
+    last, previous = _span_totals(runs[-1]), [_span_totals(t) for t in runs[-1 - history:-1]]
+    out = []
+    for name, wall in last.items():
+        ref = [p[name] for p in previous if name in p]
+        if not ref:
+            continue
+        median = statistics.median(ref)
+        if wall >= min_wall_s and median > 0 and wall / median >= threshold:
+            out.append({"stage": stage, "span": name, "wall_s": wall, "median_s": round(median, 4),
+                        "ratio": round(wall / median, 2)})
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Régressions de temps par étape / span")
+    parser.add_argument("--threshold", type=float, default=1.3)
+    parser.add_argument("--history", type=int, default=7)
+    args = parser.parse_args()
+
+    found = []
+    for path in sorted(TRACE_DIR.glob("*.jsonl")):
+        found += regressions(path.stem, args.threshold, args.history)
+    if not found:
+        print("✅ Aucune régression détectée")
+    for r in found:
+        print(f"⚠️ {r['stage']:<22} {r['span']:<28} {r['wall_s']:>8.2f}s vs médiane {r['median_s']:.2f}s (x{r['ratio']})")
+    sys.exit(1 if found else 0)
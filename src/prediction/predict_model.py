@@ -2,6 +2,11 @@ import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, confusion_matrix
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.tracing import span, step
 
 # ======================================================
 # CONFIG
@@ -14,7 +19,9 @@ SPLIT_DATE = "2024-12-31"
 # 1) Chargement des données
 # ======================================================
 print("📥 Chargement dataset pour prédiction future...")
-df = pd.read_excel(INPUT_FILE)
+with span("load", file=INPUT_FILE) as s:
+    df = pd.read_excel(INPUT_FILE)
+    s.rows = len(df)
 
 df.columns = df.columns.str.upper().str.strip()
 
@@ -24,6 +31,7 @@ df = df.dropna(subset=["DATE"])
 # ======================================================
 # 2) Encodage du RISK_LEVEL
 # ======================================================
+step("feature", rows=len(df))
 RISK_MAP = {
     "NORMAL": 0,
     "LOW_RISK": 1,
@@ -37,9 +45,10 @@ df["RISK_LEVEL_NUM"] = df["RISK_LEVEL"].map(RISK_MAP)
 # 3) Création de la TARGET FUTURE (t+1)
 # ======================================================
 df = df.sort_values(["CODE_ISIN", "DATE"])
+KEY = "FUND_ID" if "FUND_ID" in df.columns else "CODE_ISIN"
 
 df["TARGET_RISK_T_PLUS_1"] = (
-    df.groupby("CODE_ISIN")["RISK_LEVEL_NUM"]
+    df.groupby(KEY)["RISK_LEVEL_NUM"]
       .shift(-1)
 )
 
@@ -84,6 +93,7 @@ print(f"✔ Test size  : {len(X_test)}")
 # ======================================================
 # 6) Modèle Random Forest
 # ======================================================
+step("fit", rows=len(X_train))
 model = RandomForestClassifier(
     n_estimators=300,
     max_depth=8,
@@ -97,6 +107,7 @@ model.fit(X_train, y_train)
 # ======================================================
 # 7) Évaluation
 # ======================================================
+step("score", rows=len(X_test))
 y_pred = model.predict(X_test)
 
 print("\n📊 Classification Report")
@@ -119,6 +130,7 @@ print(feat_importance)
 # ======================================================
 # 9) Export des prédictions (ALL + WAFA)
 # ======================================================
+step("export", rows=len(X_test))
 df_test = df.loc[X_test.index].copy()
 df_test["PREDICTED_RISK_T_PLUS_1"] = y_pred
 
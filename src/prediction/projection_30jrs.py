@@ -1,5 +1,10 @@
 import pandas as pd
 import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.tracing import span, step
 
 # ======================================================
 # CONFIG
@@ -7,13 +12,16 @@ import numpy as np
 INPUT_FILE = "../scraper/prediction_future_risk.xlsx"
 
 print("📥 Chargement des prédictions t+1...")
-df = pd.read_excel(INPUT_FILE, sheet_name=0)
+with span("load", file=INPUT_FILE) as s:
+    df = pd.read_excel(INPUT_FILE, sheet_name=0)
+    s.rows = len(df)
 
 df.columns = df.columns.str.upper().str.strip()
 
 # ======================================================
 # 1) Mapping risque
 # ======================================================
+step("score", rows=len(df))
 RISK_MAP = {
     "NORMAL": 0,
     "LOW_RISK": 1,
@@ -30,9 +38,14 @@ df["RISK_NUM_T1"] = df["PREDICTED_RISK_LABEL"].map(RISK_MAP)
 # ======================================================
 print("📊 Calcul de la projection 30 jours...")
 
+# Groupement sur FUND_ID (int32) si présent; CODE_ISIN reste dans la sortie
+KEY = "FUND_ID" if "FUND_ID" in df.columns else "CODE_ISIN"
+ident = {"CODE_ISIN": ("CODE_ISIN", "first")} if KEY == "FUND_ID" else {}
+
 proj = (
-    df.groupby("CODE_ISIN")
+    df.groupby(KEY)
       .agg(
+          **ident,
           SOCIETE_DE_GESTION=("SOCIETE_DE_GESTION", "first"),
           OPCVM=("OPCVM", "first"),
           LAST_RISK_T1=("PREDICTED_RISK_LABEL", "last"),
@@ -83,6 +96,7 @@ wafa_proj = proj[
 # ======================================================
 # 6) Export → AJOUT DE FEUILLES
 # ======================================================
+step("export", rows=len(proj))
 with pd.ExcelWriter(
     INPUT_FILE,
     engine="openpyxl",
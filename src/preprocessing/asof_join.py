@@ -0,0 +1,132 @@
+"""
+Jointure as-of vectorisée (équivalent de pd.merge_asof(direction="backward", by=...)).
+
+Pour chaque ligne de gauche: dernière ligne de droite du même fonds dont la date
+est <= la date de gauche, en une seule passe triée (searchsorted sur une clé
+composite fonds x rang de date) au lieu d'une boucle par fonds. Les clés de
+date peuvent être entières (DATE_ID, BDAY_ID; MISSING = -1) ou datetime.
+
+- tolerance: ancienneté maximale de la ligne de droite (unités de la clé:
+  jours pour DATE_ID, séances pour BDAY_ID, Timedelta pour des datetime).
+- rapport: lignes de gauche non appariées, par motif.
+
+Usage (scripts du pipeline, après sys.path.append de la racine):
+    from src.preprocessing.asof_join import asof_join
+    df, report = asof_join(df_daily, df_weekly, on="BDAY_ID", by="FUND_ID", tolerance=10)
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+MISSING = -1
+
+
+def _time_key(s: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """(clé int64, masque valide) d'une colonne date ou entière."""
+    if pd.api.types.is_datetime64_any_dtype(s) or s.dtype == object:
+        d = pd.to_datetime(s, errors="coerce")
+        return d.to_numpy(dtype="datetime64[ns]").view(np.int64), d.notna().to_numpy()
+    x = pd.to_numeric(s, errors="coerce")
+    ok = x.notna().to_numpy() & (x.fillna(MISSING).to_numpy() != MISSING)
+    return x.fillna(MISSING).to_numpy(dtype=np.int64), ok
+
+
+def _tolerance(tolerance) -> Optional[int]:
+    if tolerance is None:
+        return None
+    if isinstance(tolerance, (pd.Timedelta, np.timedelta64)) or hasattr(tolerance, "total_seconds"):
+        return int(pd.Timedelta(tolerance).value)
+    return int(tolerance)
+
+
+def asof_positions(
+    left_by, left_time, right_by, right_time, tolerance=None,
+) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    Position (dans right) de la ligne appariée à chaque ligne de gauche, MISSING
+    sinon, et rapport des non-appariés. À date égale à droite: la dernière ligne
+    (comme merge_asof).
+    """
+    left_by, right_by = pd.Series(left_by), pd.Series(right_by)
+    n = len(left_by)
+    codes, _ = pd.factorize(pd.concat([left_by, right_by], ignore_index=True))
+    lc, rc = codes[:n], codes[n:]
+    lt, lok = _time_key(pd.Series(left_time))
+    rt, rok = _time_key(pd.Series(right_time))
+    lok &= lc >= 0
+    rok &= rc >= 0
+
+    # rang dense des dates (gauche + droite) => clé composite fonds x rang sans débordement
+    uniq = np.unique(np.concatenate([lt[lok], rt[rok]]))
+    width = len(uniq) + 1
+    ridx = np.flatnonzero(rok)
+    rkey = rc[ridx].astype(np.int64) * width + np.searchsorted(uniq, rt[ridx])
+    order = np.argsort(rkey, kind="stable")
+    rkey = rkey[order]
+    lkey = lc.astype(np.int64) * width + np.searchsorted(uniq, lt)
+
+    pos = np.searchsorted(rkey, lkey, side="right") - 1
+    cand = np.where(pos >= 0, ridx[order[np.maximum(pos, 0)]], 0) if len(ridx) else np.zeros(n, dtype=np.int64)
+    hit = lok & (pos >= 0) & (rc[cand] == lc) if len(ridx) else np.zeros(n, dtype=bool)
+
+    known = lok & np.isin(lc, rc[rok])
+    stale = np.zeros(n, dtype=bool)
+    tol = _tolerance(tolerance)
+    if tol is not None and len(ridx):
+        stale = hit & (lt - rt[cand] > tol)
+        hit &= ~stale
+
+    report = {
+        "rows": int(n),
+        "matched": int(hit.sum()),
+        "invalid_key": int((~lok).sum()),              # fonds / date manquants à gauche
+        "no_right_fund": int((lok & ~known).sum()),    # fonds absent à droite
+        "no_prior": int((known & ~hit & ~stale).sum()),  # aucune ligne de droite antérieure
+        "stale": int(stale.sum()),                     # au-delà de la tolérance
+    }
+    return np.where(hit, cand, MISSING), report
+
+
+def asof_join(
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    on: str,
+    right_on: Optional[str] = None,
+    by: str = "FUND_ID",
+    columns: Optional[List[str]] = None,
+    tolerance=None,
+    suffixes: Tuple[str, str] = ("_x", "_y"),
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Left join as-of backward de `right` sur `left` (ordre de left conservé).
+    Colonnes ajoutées: `columns` (toutes celles de right sauf `by` par défaut);
+    colonnes communes suffixées comme merge_asof. Retourne (df, rapport).
+    """
+    right_on = right_on or on
+    if columns is None:
+        columns = [c for c in right.columns if c != by and not (c == on and right_on == on)]
+
+    pos, report = asof_positions(left[by], left[on], right[by], right[right_on], tolerance)
+    hit = pos >= 0
+
+    out = left.reset_index(drop=True)
+    shared = [c for c in columns if c in out.columns]
+    out = out.rename(columns={c: f"{c}{suffixes[0]}" for c in shared})
+
+    if len(right):
+        picked = right[columns].iloc[np.where(hit, pos, 0)].reset_index(drop=True)
+        if not hit.all():
+            picked = picked.where(pd.Series(hit))
+    else:
+        picked = pd.DataFrame(np.nan, index=out.index, columns=columns)
+    picked = picked.rename(columns={c: f"{c}{suffixes[1]}" for c in shared})
+    return pd.concat([out, picked], axis=1), report
+
+
+def format_report(report: Dict[str, int]) -> str:
+    """Résumé une ligne pour les logs du pipeline."""
+    details = ", ".join(f"{k}={v}" for k, v in report.items() if k not in ("rows", "matched") and v)
+    return f"{report['matched']}/{report['rows']} lignes appariées" + (f" (non appariées: {details})" if details else "")
@@ -1,57 +1,56 @@
 import pandas as pd
 import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.preprocessing.data_quality import DQ_COLUMN, RULES, is_valid, rule_counts
 
 INPUT_FILE = "../scraper/performance_quotidienne_asfim_clean.xlsx"
 REPORT_FILE = "../scraper/sanity_report_daily.xlsx"
 
+# Rapport construit depuis DQ_FLAGS (évalué par clean_daily): pas de recalcul des règles
 print("📥 Chargement...")
-df = pd.read_excel(INPUT_FILE)
+df = pd.read_excel(INPUT_FILE, usecols=lambda c: str(c).upper().strip() in ["CODE_ISIN", "DATE", DQ_COLUMN])
+df.columns = df.columns.astype(str).str.upper().str.strip()
 
 # Colonnes attendues minimum
-required = ["CODE_ISIN", "DATE", "VL"]
+required = ["CODE_ISIN", "DATE", DQ_COLUMN]
 missing = [c for c in required if c not in df.columns]
 if missing:
-    raise ValueError(f"Colonnes manquantes : {missing}")
+    raise ValueError(f"Colonnes manquantes : {missing} (relancer clean_daily.py)")
 
-# Types
 df["DATE"] = pd.to_datetime(df["DATE"], errors="coerce")
-df = df.dropna(subset=["DATE", "CODE_ISIN"])
+flags = df[DQ_COLUMN].fillna(0).astype(np.int64)
+valid = is_valid(flags)
 
 # Stats de base
 summary = pd.DataFrame({
-    "metric": [
-        "rows", "unique_isin", "min_date", "max_date",
-        "missing_VL", "missing_1_JOUR", "missing_1_SEMAINE", "missing_YTD"
-    ],
+    "metric": ["rows", "unique_isin", "min_date", "max_date", "valid_rows_pct", "flagged_rows"],
     "value": [
         len(df),
         df["CODE_ISIN"].nunique(),
         df["DATE"].min(),
         df["DATE"].max(),
-        df["VL"].isna().sum() if "VL" in df.columns else np.nan,
-        df["1_JOUR"].isna().sum() if "1_JOUR" in df.columns else np.nan,
-        df["1_SEMAINE"].isna().sum() if "1_SEMAINE" in df.columns else np.nan,
-        df["YTD"].isna().sum() if "YTD" in df.columns else np.nan,
+        round(valid.mean() * 100, 2) if len(df) else np.nan,
+        int((flags != 0).sum()),
     ]
 })
 
-# Duplicates (même fonds, même date)
-dups = df.duplicated(subset=["CODE_ISIN", "DATE"]).sum()
-dup_df = pd.DataFrame({"duplicated_CODE_ISIN_DATE": [dups]})
+# Lignes par règle
+rules_df = rule_counts(flags)
 
-# Valeurs suspectes (VL <= 0, perf absurdes)
-suspects = []
-if "VL" in df.columns:
-    suspects.append(("VL<=0", int((df["VL"] <= 0).sum())))
-for col in ["1_JOUR", "1_SEMAINE", "1_MOIS", "YTD"]:
-    if col in df.columns:
-        suspects.append((f"{col} abs>50", int((df[col].abs() > 50).sum())))
-suspects_df = pd.DataFrame(suspects, columns=["rule", "count"])
+# Fonds: nombre de lignes par règle levée
+per_fund = pd.DataFrame({r.name: (flags & r.mask) != 0 for r in RULES})
+per_fund["CODE_ISIN"] = df["CODE_ISIN"].to_numpy()
+per_fund["INVALID"] = ~valid
+funds_df = per_fund.groupby("CODE_ISIN").sum()
+funds_df = funds_df[funds_df.sum(axis=1) > 0].sort_values("INVALID", ascending=False).reset_index()
 
 # Export report
 with pd.ExcelWriter(REPORT_FILE, engine="openpyxl") as w:
     summary.to_excel(w, sheet_name="summary", index=False)
-    dup_df.to_excel(w, sheet_name="duplicates", index=False)
-    suspects_df.to_excel(w, sheet_name="suspects", index=False)
+    rules_df.to_excel(w, sheet_name="rules", index=False)
+    funds_df.to_excel(w, sheet_name="funds", index=False)
 
 print(f"✅ Report généré : {REPORT_FILE}")
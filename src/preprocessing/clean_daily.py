@@ -1,19 +1,32 @@
 import pandas as pd
 import numpy as np
-import re
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.change_capture import append_changes, diff_snapshots, load_snapshot, row_snapshot, save_snapshot, summarize
+from src.pipeline.tracing import span, step
+from src.preprocessing.data_quality import DQ_COLUMN, evaluate, is_valid
+from src.preprocessing.fund_keys import assign_fund_ids, date_ids, ids_to_dates
+from src.preprocessing.trading_calendar import CALENDAR_FILE, TradingCalendar, dates_from_filenames
 
 # ======================================================
 # CONFIG
 # ======================================================
 INPUT_FILE = "../scraper/performance_quotidienne_asfim.xlsx"
 OUTPUT_FILE = "../scraper/performance_quotidienne_asfim_clean.xlsx"
+SNAPSHOT_FILE = "../scraper/.clean_daily_rows.npz"    # empreinte des lignes du run précédent
+CHANGES_FILE = "../scraper/changes_daily.csv"           # journal des republications
 
 print("📥 Chargement du fichier...")
-df = pd.read_excel(INPUT_FILE)
+with span("load", file=INPUT_FILE) as s:
+    df = pd.read_excel(INPUT_FILE)
+    s.rows = len(df)
 
 # ======================================================
 # 1) NORMALISATION DES COLONNES
 # ======================================================
+step("clean", rows=len(df))
 df.columns = (
     df.columns.astype(str)
       .str.upper()
@@ -35,20 +48,8 @@ print("✔ Colonnes UNNAMED supprimées")
 # ======================================================
 # 3) EXTRACTION DATE DEPUIS SOURCE_FILE
 # ======================================================
-def extract_date_from_filename(name):
-    if pd.isna(name):
-        return np.nan
-
-    match = re.search(r"(\d{2}[-_/]\d{2}[-_/]\d{4})", str(name))
-    if match:
-        return pd.to_datetime(
-            match.group(1).replace("_", "-"),
-            dayfirst=True,
-            errors="coerce"
-        )
-    return np.nan
-
-df["DATE"] = df["SOURCE_FILE"].apply(extract_date_from_filename)
+# vectorisé: regex évalué une fois par fichier source distinct
+df["DATE"] = dates_from_filenames(df["SOURCE_FILE"])
 df = df.dropna(subset=["DATE"])
 
 print("✔ DATE extraite depuis SOURCE_FILE")
@@ -119,14 +120,65 @@ print("✔ Conversion numérique terminée")
 # 7) SUPPRESSION DES DOUBLONS
 # ======================================================
 before = len(df)
-df = df.sort_values(["CODE_ISIN", "DATE"])
+# tri stable: à doublon, la dernière publication (ordre des fichiers source) est gardée
+df = df.sort_values(["CODE_ISIN", "DATE"], kind="stable")
+duplicated = df.duplicated(subset=["CODE_ISIN", "DATE"], keep=False)   # règle DQ DUPLICATE
 df = df.drop_duplicates(subset=["CODE_ISIN", "DATE"], keep="last")
+duplicated = duplicated.loc[df.index].to_numpy()
 after = len(df)
 
 print(f"✔ Doublons supprimés : {before - after}")
 
 # ======================================================
-# 8) EXPORT
+# 8) CLÉS ENTIÈRES (FUND_ID / DATE_ID / BDAY_ID)
+# ======================================================
+# FUND_ID stable d'un run à l'autre (registre src/scraper/fund_keys.csv, partagé
+# daily / weekly); les étapes suivantes joignent et groupent sur ces clés int32.
+df["FUND_ID"] = assign_fund_ids(df["CODE_ISIN"])
+df["DATE_ID"] = date_ids(df["DATE"])
+
+# Calendrier de séances = jours publiés; BDAY_ID = index de séance (J-1 = BDAY_ID - 1)
+cal = TradingCalendar.from_publications(df["DATE"])
+cal.save(CALENDAR_FILE)
+df["BDAY_ID"] = cal.index(df["DATE"])
+
+print(f"✔ Calendrier : {len(cal)} séances, {len(cal.gaps())} jours ouvrés sans publication")
+
+print(f"✔ Clés attribuées : {df['FUND_ID'].nunique()} fonds")
+
+# ======================================================
+# 9) QUALITÉ DES DONNÉES (DQ_FLAGS)
+# ======================================================
+# une passe vectorisée, un bit par règle (src/preprocessing/data_quality.py)
+step("quality", rows=len(df))
+df[DQ_COLUMN] = evaluate(df, date_col="DATE", duplicated=duplicated)
+
+print(f"✔ Qualité : {(~is_valid(df[DQ_COLUMN])).sum()} lignes invalides, "
+      f"{(df[DQ_COLUMN] != 0).sum()} lignes signalées")
+
+# ======================================================
+# 10) CHANGEMENTS VS RUN PRÉCÉDENT (republications ASFIM)
+# ======================================================
+# hash par ligne hors colonnes dérivées; (ISIN, date) ajouté / modifié / supprimé
+step("changes", rows=len(df))
+snapshot = row_snapshot(
+    df, keys=["CODE_ISIN", "DATE_ID"], values=["VL"],
+    exclude=["SOURCE_FILE", "FUND_ID", "DATE_ID", "BDAY_ID", DQ_COLUMN],
+)
+previous = load_snapshot(SNAPSHOT_FILE)
+changes = diff_snapshots(previous, snapshot, keys=["CODE_ISIN", "DATE_ID"])
+changes.insert(1, "DATE", ids_to_dates(changes["DATE_ID"]))
+append_changes(changes.drop(columns="DATE_ID"), CHANGES_FILE)
+
+if previous is None:
+    print("✔ Changements : première empreinte des lignes (pas de run précédent)")
+else:
+    print(f"✔ Changements : {summarize(changes)}")
+
+# ======================================================
+# 11) EXPORT
 # ======================================================
+step("export", rows=len(df))
 df.to_excel(OUTPUT_FILE, index=False)
+save_snapshot(snapshot, SNAPSHOT_FILE)   # après l'export: base du diff du prochain run
 print(f"\n🎉 Dataset DAILY nettoyé exporté → {OUTPUT_FILE}")
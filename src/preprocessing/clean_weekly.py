@@ -1,19 +1,35 @@
 import pandas as pd
 import numpy as np
-import re
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.change_capture import append_changes, diff_snapshots, load_snapshot, row_snapshot, save_snapshot, summarize
+from src.pipeline.tracing import span, step
+from src.preprocessing.asof_join import asof_join
+from src.preprocessing.data_quality import DQ_COLUMN, evaluate, is_valid
+from src.preprocessing.fund_keys import assign_fund_ids, date_ids, ids_to_dates
+from src.preprocessing.trading_calendar import CALENDAR_FILE, dates_from_filenames, load_calendar
 
 # ======================================================
 # CONFIG
 # ======================================================
 INPUT_FILE = "../scraper/performance_hebdomadaire_asfim.xlsx"
 OUTPUT_FILE = "../scraper/performance_hebdomadaire_asfim_clean.xlsx"
+SNAPSHOT_FILE = "../scraper/.clean_weekly_rows.npz"    # empreinte des lignes du run précédent
+CHANGES_FILE = "../scraper/changes_weekly.csv"           # journal des republications
+DAILY_CLEAN_FILE = "../scraper/performance_quotidienne_asfim_clean.xlsx"   # contrôle weekly/daily
 
 print("📥 Chargement du fichier WEEKLY...")
-df = pd.read_excel(INPUT_FILE)
+with span("load", file=INPUT_FILE) as s:
+    df = pd.read_excel(INPUT_FILE)
+    s.rows = len(df)
 
 # ======================================================
 # 1) NORMALISATION DES COLONNES
 # ======================================================
+step("clean", rows=len(df))
 df.columns = (
     df.columns.astype(str)
       .str.upper()
@@ -35,20 +51,8 @@ print("✔ Colonnes UNNAMED supprimées")
 # ======================================================
 # 3) EXTRACTION DATE HEBDO DEPUIS SOURCE_FILE
 # ======================================================
-def extract_date_from_filename(name):
-    if pd.isna(name):
-        return np.nan
-
-    match = re.search(r"(\d{2}[-_/]\d{2}[-_/]\d{4})", str(name))
-    if match:
-        return pd.to_datetime(
-            match.group(1).replace("_", "-"),
-            dayfirst=True,
-            errors="coerce"
-        )
-    return np.nan
-
-df["WEEK_DATE"] = df["SOURCE_FILE"].apply(extract_date_from_filename)
+# vectorisé: regex évalué une fois par fichier source distinct
+df["WEEK_DATE"] = dates_from_filenames(df["SOURCE_FILE"])
 df = df.dropna(subset=["WEEK_DATE"])
 
 print("✔ WEEK_DATE extraite depuis SOURCE_FILE")
@@ -119,14 +123,77 @@ print("✔ Conversion numérique terminée")
 # 7) SUPPRESSION DES DOUBLONS
 # ======================================================
 before = len(df)
-df = df.sort_values(["CODE_ISIN", "WEEK_DATE"])
+# tri stable: à doublon, la dernière publication (ordre des fichiers source) est gardée
+df = df.sort_values(["CODE_ISIN", "WEEK_DATE"], kind="stable")
+duplicated = df.duplicated(subset=["CODE_ISIN", "WEEK_DATE"], keep=False)   # règle DQ DUPLICATE
 df = df.drop_duplicates(subset=["CODE_ISIN", "WEEK_DATE"], keep="last")
+duplicated = duplicated.loc[df.index].to_numpy()
 after = len(df)
 
 print(f"✔ Doublons supprimés : {before - after}")
 
 # ======================================================
-# 8) EXPORT
+# 8) CLÉS ENTIÈRES (FUND_ID / DATE_ID / BDAY_ID)
+# ======================================================
+# FUND_ID stable d'un run à l'autre (registre src/scraper/fund_keys.csv, partagé
+# daily / weekly); les étapes suivantes joignent et groupent sur ces clés int32.
+df["FUND_ID"] = assign_fund_ids(df["CODE_ISIN"])
+df["DATE_ID"] = date_ids(df["WEEK_DATE"])
+
+# WEEK_DATE alignée sur la séance daily (ou précédente) du calendrier de clean_daily;
+# sans ce calendrier partagé, pas de BDAY_ID (un autre calendrier décalerait les index)
+cal = load_calendar(CALENDAR_FILE)
+if cal is None:
+    print(f"⚠ Calendrier daily absent ({CALENDAR_FILE}) → BDAY_ID non attribué (lancer clean_daily)")
+else:
+    df["BDAY_ID"] = cal.index(df["WEEK_DATE"])
+
+print(f"✔ Clés attribuées : {df['FUND_ID'].nunique()} fonds")
+
+# ======================================================
+# 9) QUALITÉ DES DONNÉES (DQ_FLAGS)
+# ======================================================
+# une passe vectorisée, un bit par règle (src/preprocessing/data_quality.py);
+# WEEKLY_MISMATCH compare la VL hebdo à la VL daily publiée le même jour
+step("quality", rows=len(df))
+reference_vl = None
+if os.path.exists(DAILY_CLEAN_FILE):
+    daily = pd.read_excel(DAILY_CLEAN_FILE, usecols=lambda c: str(c).upper().strip() in ["CODE_ISIN", "DATE", "VL"])
+    daily.columns = daily.columns.astype(str).str.upper().str.strip()
+    daily["DATE_ID"] = date_ids(daily["DATE"])
+    matched, _ = asof_join(
+        df, daily.rename(columns={"VL": "VL_DAILY"}),
+        on="DATE_ID", by="CODE_ISIN", columns=["VL_DAILY"], tolerance=0,
+    )
+    reference_vl = matched["VL_DAILY"].to_numpy(dtype=float)
+df[DQ_COLUMN] = evaluate(df, date_col="WEEK_DATE", duplicated=duplicated, reference_vl=reference_vl)
+
+print(f"✔ Qualité : {(~is_valid(df[DQ_COLUMN])).sum()} lignes invalides, "
+      f"{(df[DQ_COLUMN] != 0).sum()} lignes signalées")
+
+# ======================================================
+# 10) CHANGEMENTS VS RUN PRÉCÉDENT (republications ASFIM)
+# ======================================================
+# hash par ligne hors colonnes dérivées; (ISIN, date) ajouté / modifié / supprimé
+step("changes", rows=len(df))
+snapshot = row_snapshot(
+    df, keys=["CODE_ISIN", "DATE_ID"], values=["VL"],
+    exclude=["SOURCE_FILE", "FUND_ID", "DATE_ID", "BDAY_ID", DQ_COLUMN],
+)
+previous = load_snapshot(SNAPSHOT_FILE)
+changes = diff_snapshots(previous, snapshot, keys=["CODE_ISIN", "DATE_ID"])
+changes.insert(1, "WEEK_DATE", ids_to_dates(changes["DATE_ID"]))
+append_changes(changes.drop(columns="DATE_ID"), CHANGES_FILE)
+
+if previous is None:
+    print("✔ Changements : première empreinte des lignes (pas de run précédent)")
+else:
+    print(f"✔ Changements : {summarize(changes)}")
+
+# ======================================================
+# 11) EXPORT
 # ======================================================
+step("export", rows=len(df))
 df.to_excel(OUTPUT_FILE, index=False)
+save_snapshot(snapshot, SNAPSHOT_FILE)   # après l'export: base du diff du prochain run
 print(f"\n🎉 Dataset WEEKLY nettoyé exporté → {OUTPUT_FILE}")
@@ -0,0 +1,178 @@
+"""
+Contrôles qualité déclaratifs, évalués en une passe vectorisée au nettoyage.
+
+Chaque règle (RULES) occupe un bit de la colonne DQ_FLAGS (une valeur par
+(fonds, date)) des fichiers clean; la colonne suit les lignes dans tout le
+pipeline (features, anomalies, cross). Sévérité:
+- "error"   : ligne non exploitable => exclue de valid_data_pct (INVALID_MASK)
+- "warning" : ligne signalée (rapport sanity_report_daily.xlsx) mais valide
+
+Usage (scripts du pipeline, après sys.path.append de la racine):
+    from src.preprocessing.data_quality import DQ_COLUMN, evaluate
+    df[DQ_COLUMN] = evaluate(df, date_col="DATE")
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DQ_COLUMN = "DQ_FLAGS"
+DQ_DTYPE = np.int16
+
+PERF_COLS = ["1_JOUR", "1_SEMAINE", "1_MOIS", "YTD"]
+PERF_LIMIT = 50.0             # |perf| en % au-delà => aberrante
+VL_JUMP_LIMIT = 0.10          # variation de VL entre deux publications
+STALE_SESSIONS = 5            # VL identique sur N publications consécutives
+MAX_MISSING_SESSIONS = 5      # séances sans publication tolérées (VL hebdomadaires)
+WEEKLY_VL_TOLERANCE = 0.01    # écart VL hebdo / VL daily du même jour
+
+
+# ======================================================
+# Séries par fonds (tri et décalages calculés une seule fois)
+# ======================================================
+class _Series:
+    """Lignes triées par (fonds, séance) + valeurs précédentes du même fonds."""
+
+    def __init__(self, df, key, date_col, session_col, duplicated, reference_vl):
+        keys = pd.factorize(df[key])[0]
+        if session_col in df.columns:
+            session = pd.to_numeric(df[session_col], errors="coerce").fillna(-1).to_numpy(np.int64)
+        else:   # rang dense des dates publiées
+            session = pd.factorize(pd.to_datetime(df[date_col], errors="coerce"), sort=True)[0].astype(np.int64)
+        self.order = np.lexsort((np.arange(len(df)), session, keys))
+        self.keys = keys[self.order]
+        self.session = session[self.order]
+
+        n = len(self.order)
+        self.first = np.ones(n, dtype=bool)
+        self.first[1:] = self.keys[1:] != self.keys[:-1]
+        self.last = np.ones(n, dtype=bool)
+        self.last[:-1] = self.first[1:]
+
+        self.vl = self.col(df, "VL")
+        self.prev_vl = self._prev(self.vl)
+        self.gap = self.session - self._prev(self.session.astype(float), fill=np.nan)
+        self.max_session = self.session.max() if n else -1
+        self.duplicated = self._sorted(duplicated, False)
+        self.reference_vl = self._sorted(reference_vl, np.nan)
+        self.perf = [self.col(df, c) for c in PERF_COLS if c in df.columns]
+
+    def col(self, df, name) -> np.ndarray:
+        if name not in df.columns:
+            return np.full(len(self.order), np.nan)
+        return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float)[self.order]
+
+    def _sorted(self, values, fill) -> np.ndarray:
+        if values is None:
+            return np.full(len(self.order), fill)
+        return np.asarray(values)[self.order]
+
+    def _prev(self, x, fill=np.nan) -> np.ndarray:
+        out = np.empty(len(x), dtype=float)
+        if len(x):
+            out[0] = fill
+            out[1:] = x[:-1]
+        out[self.first] = fill
+        return out
+
+    def run_length(self, x) -> np.ndarray:
+        """Position (1, 2, ...) de chaque ligne dans sa suite de valeurs identiques du fonds."""
+        change = self.first | (x != self._prev(x)) | np.isnan(x)
+        start = np.maximum.accumulate(np.where(change, np.arange(len(x)), 0))
+        return np.arange(len(x)) - start + 1
+
+
+def _perf_outlier(s: _Series) -> np.ndarray:
+    out = np.zeros(len(s.order), dtype=bool)
+    for values in s.perf:
+        out |= np.abs(values) > PERF_LIMIT
+    return out
+
+
+def _vl_jump(s: _Series) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.abs(s.vl / s.prev_vl - 1) > VL_JUMP_LIMIT
+
+
+def _weekly_mismatch(s: _Series) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.abs(s.vl / s.reference_vl - 1) > WEEKLY_VL_TOLERANCE
+
+
+# ======================================================
+# Règles
+# ======================================================
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    bit: int
+    severity: str                           # "error" / "warning"
+    description: str
+    check: Callable[[_Series], np.ndarray]  # booléens dans l'ordre trié
+
+    @property
+    def mask(self) -> int:
+        return 1 << self.bit
+
+
+RULES: List[Rule] = [
+    Rule("MISSING_VL", 0, "error", "VL manquante", lambda s: np.isnan(s.vl)),
+    Rule("VL_NON_POSITIVE", 1, "error", "VL <= 0", lambda s: s.vl <= 0),
+    Rule("PERF_OUTLIER", 2, "error", f"performance |x| > {PERF_LIMIT:g} %", _perf_outlier),
+    Rule("DUPLICATE", 3, "warning", "plusieurs publications (fonds, date), dernière gardée", lambda s: s.duplicated),
+    Rule("SERIES_GAP", 4, "warning", f"plus de {MAX_MISSING_SESSIONS} séances sans publication avant la ligne",
+         lambda s: s.gap > MAX_MISSING_SESSIONS + 1),
+    Rule("VL_JUMP", 5, "warning", f"variation de VL > {VL_JUMP_LIMIT:.0%} depuis la publication précédente", _vl_jump),
+    Rule("STALE_PRICE", 6, "warning", f"VL inchangée sur {STALE_SESSIONS} publications ou plus",
+         lambda s: s.run_length(s.vl) >= STALE_SESSIONS),
+    Rule("ISIN_DISAPPEARED", 7, "warning", "dernière publication du fonds bien avant la dernière séance",
+         lambda s: s.last & (s.max_session - s.session > MAX_MISSING_SESSIONS)),
+    Rule("WEEKLY_MISMATCH", 8, "warning", f"VL hebdo ≠ VL daily du même jour (> {WEEKLY_VL_TOLERANCE:.0%})",
+         _weekly_mismatch),
+]
+
+INVALID_MASK = sum(r.mask for r in RULES if r.severity == "error")
+
+
+def evaluate(
+    df: pd.DataFrame,
+    date_col: str = "DATE",
+    key: str = "FUND_ID",
+    session_col: str = "BDAY_ID",
+    duplicated=None,
+    reference_vl=None,
+    rules: Optional[List[Rule]] = None,
+) -> np.ndarray:
+    """
+    DQ_FLAGS (int16, aligné sur df) : bit r.bit levé si la règle r est violée.
+    duplicated : booléens « doublon avant dédoublonnage » (même longueur que df).
+    reference_vl : VL daily du même (fonds, date) pour le contrôle weekly/daily.
+    """
+    s = _Series(df, key if key in df.columns else "CODE_ISIN", date_col, session_col, duplicated, reference_vl)
+    flags = np.zeros(len(df), dtype=np.int64)
+    for rule in rules or RULES:
+        hit = np.asarray(rule.check(s), dtype=bool)
+        flags[s.order[hit]] |= rule.mask
+    return flags.astype(DQ_DTYPE)
+
+
+def is_valid(flags) -> np.ndarray:
+    """Lignes sans règle bloquante (base de valid_data_pct)."""
+    return (pd.to_numeric(pd.Series(flags), errors="coerce").fillna(0).to_numpy(np.int64) & INVALID_MASK) == 0
+
+
+def rule_counts(flags, rules: Optional[List[Rule]] = None) -> pd.DataFrame:
+    """Nombre de lignes par règle (rapport qualité)."""
+    flags = pd.to_numeric(pd.Series(flags), errors="coerce").fillna(0).to_numpy(np.int64)
+    return pd.DataFrame(
+        [(r.name, r.bit, r.severity, r.description, int(((flags & r.mask) != 0).sum())) for r in rules or RULES],
+        columns=["rule", "bit", "severity", "description", "count"],
+    )
+
+
+def describe(value: int) -> List[str]:
+    """Noms des règles levées dans une valeur DQ_FLAGS."""
+    return [r.name for r in RULES if int(value) & r.mask]
@@ -0,0 +1,143 @@
+"""
+Clés de substitution entières (int32) des fonds et des dates.
+
+- FUND_ID : attribué au nettoyage (clean_daily / clean_weekly) via un registre
+  append-only CODE_ISIN -> FUND_ID (src/scraper/fund_keys.csv). Un ISIN garde son
+  identifiant d'un run à l'autre, les nouveaux ISIN reçoivent max + 1, 2, ...
+- DATE_ID : nombre de jours depuis 1970-01-01 (int32), -1 si date manquante.
+- Jointures : lookup() = tableau dense indexé par FUND_ID (positions dans la
+  table de droite), O(n) sans hachage de chaînes; join_on_fund() = left join.
+
+Usage (scripts du pipeline, après sys.path.append de la racine):
+    from src.preprocessing.fund_keys import assign_fund_ids, date_ids
+    df["FUND_ID"] = assign_fund_ids(df["CODE_ISIN"])
+    df["DATE_ID"] = date_ids(df["DATE"])
+"""
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+KEYS_FILE = Path(__file__).resolve().parents[1] / "scraper" / "fund_keys.csv"
+KEY_DTYPE = np.int32
+MISSING = -1
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+# ======================================================
+# Registre CODE_ISIN -> FUND_ID
+# ======================================================
+@contextmanager
+def _registry_lock(path: Path, timeout: float = 60.0):
+    """Verrou inter-process (fichier .lock créé en exclusif): clean_daily / clean_weekly en parallèle."""
+    lock = path.with_name(path.name + ".lock")
+    t0 = time.time()
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.time() - t0 > timeout:
+                raise TimeoutError(f"Registre des clés verrouillé: {lock}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.unlink(lock)
+
+
+def load_registry(path: Path = KEYS_FILE) -> pd.Series:
+    """Série CODE_ISIN -> FUND_ID (vide si le registre n'existe pas encore)."""
+    if not Path(path).exists():
+        return pd.Series(dtype=KEY_DTYPE, name="FUND_ID")
+    reg = pd.read_csv(path, dtype={"CODE_ISIN": str, "FUND_ID": KEY_DTYPE})
+    return reg.set_index("CODE_ISIN")["FUND_ID"]
+
+
+def assign_fund_ids(isins: Iterable[str], path: Path = KEYS_FILE) -> np.ndarray:
+    """
+    FUND_ID (int32) de chaque ISIN; les ISIN inconnus sont ajoutés au registre
+    (ordre alphabétique, à la suite du plus grand identifiant existant).
+    """
+    path = Path(path)
+    values = pd.Index(pd.Series(isins).astype(str).to_numpy())
+    with _registry_lock(path):
+        reg = load_registry(path)
+        new = values.unique().difference(reg.index).sort_values()
+        if len(new):
+            start = int(reg.max()) + 1 if len(reg) else 0
+            added = pd.Series(np.arange(start, start + len(new), dtype=KEY_DTYPE), index=new, name="FUND_ID")
+            reg = pd.concat([reg, added])
+            tmp = path.with_name(path.name + ".tmp")
+            reg.rename_axis("CODE_ISIN").reset_index().to_csv(tmp, index=False)
+            os.replace(tmp, path)
+    ids = reg.to_numpy(dtype=KEY_DTYPE)[reg.index.get_indexer(values)]
+    return ids.astype(KEY_DTYPE, copy=False)
+
+
+# ======================================================
+# DATE_ID
+# ======================================================
+def date_ids(dates) -> np.ndarray:
+    """Jours depuis 1970-01-01 (int32); NaT => MISSING."""
+    d = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy(dtype="datetime64[D]")
+    out = (d - EPOCH).astype(np.int64)
+    out[np.isnat(d)] = MISSING
+    return out.astype(KEY_DTYPE)
+
+
+def ids_to_dates(ids) -> pd.DatetimeIndex:
+    ids = np.asarray(ids, dtype=np.int64)
+    d = EPOCH + ids.astype("timedelta64[D]")
+    return pd.DatetimeIndex(np.where(ids == MISSING, np.datetime64("NaT"), d))
+
+
+# ======================================================
+# Jointures par FUND_ID
+# ======================================================
+def lookup(left_ids, right_ids) -> np.ndarray:
+    """
+    Position dans right_ids de chaque FUND_ID de left_ids (MISSING si absent).
+    Doublons à droite: la première occurrence gagne (comme drop_duplicates).
+    """
+    left = np.asarray(left_ids, dtype=np.int64)
+    right = np.asarray(right_ids, dtype=np.int64)
+    at = np.flatnonzero(right >= 0)   # MISSING à droite: jamais joint (pos[-1] sinon)
+    if not len(at):
+        return np.full(len(left), MISSING, dtype=np.int64)
+    size = int(max(right[at].max(), left.max() if len(left) else 0)) + 1
+    pos = np.full(size, MISSING, dtype=np.int64)
+    pos[right[at[::-1]]] = at[::-1]
+    out = np.full(len(left), MISSING, dtype=np.int64)
+    ok = left >= 0
+    out[ok] = pos[left[ok]]
+    return out
+
+
+def join_on_fund(left: pd.DataFrame, right: pd.DataFrame, columns: Optional[list] = None) -> pd.DataFrame:
+    """
+    Left join sur FUND_ID: colonnes `columns` de right (toutes sauf les clés par
+    défaut) ajoutées à left, NaN si le fonds est absent à droite.
+    """
+    if columns is None:
+        columns = [c for c in right.columns if c not in ("FUND_ID", "CODE_ISIN")]
+    out = left.reset_index(drop=True).copy()
+    if right.empty:
+        for c in columns:
+            out[c] = np.nan
+        return out
+    pos = lookup(left["FUND_ID"], right["FUND_ID"])
+    hit = pos >= 0
+    picked = right[columns].iloc[np.where(hit, pos, 0)].reset_index(drop=True)
+    if not hit.all():
+        picked = picked.where(pd.Series(hit))
+    for c in columns:
+        out[c] = picked[c].to_numpy()
+    return out
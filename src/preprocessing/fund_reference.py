@@ -0,0 +1,90 @@
+"""
+Référentiel fonds (dimension): une ligne par CODE_ISIN avec les derniers attributs
+publiés (OPCVM, SOCIETE_DE_GESTION, CLASSIFICATION, PERIODICITE_VL) et la période
+couverte. Sert aux listes déroulantes et aux libellés des pages / endpoints
+(src/app/fund_reference.py) au lieu de drop_duplicates() sur les tables de faits.
+
+Construction: python fund_reference.py (depuis src/preprocessing, après clean_daily / clean_weekly)
+"""
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.tracing import span, step
+
+# ======================================================
+# CONFIG
+# ======================================================
+DAILY_FILE = "../scraper/performance_quotidienne_asfim_clean.xlsx"
+WEEKLY_FILE = "../scraper/performance_hebdomadaire_asfim_clean.xlsx"
+OUTPUT_FILE = "../scraper/fund_reference.csv"
+
+ATTR_COLS = ["OPCVM", "SOCIETE_DE_GESTION", "CLASSIFICATION", "PERIODICITE_VL"]
+KEEP_COLS = ["CODE_ISIN", "FUND_ID", "DATE", "WEEK_DATE", *ATTR_COLS]
+
+
+def _load(path, source):
+    with span("load", file=path) as s:
+        df = pd.read_excel(path, usecols=lambda c: str(c).upper().strip() in KEEP_COLS)
+        s.rows = len(df)
+    df.columns = df.columns.astype(str).str.upper().str.strip()
+    if "WEEK_DATE" in df.columns:   # weekly clean: date de publication = WEEK_DATE
+        df = df.rename(columns={"WEEK_DATE": "DATE"})
+    df["SOURCE"] = source
+    return df
+
+
+print("📥 Chargement des fichiers clean...")
+frames = [_load(DAILY_FILE, "DAILY")]
+if os.path.exists(WEEKLY_FILE):
+    frames.append(_load(WEEKLY_FILE, "WEEKLY"))
+else:
+    print("⚠ Fichier weekly clean absent → référentiel daily seul")
+
+df = pd.concat(frames, ignore_index=True)
+
+# ======================================================
+# 1) NORMALISATION (mêmes règles que les loaders de l'app)
+# ======================================================
+step("clean", rows=len(df))
+df["CODE_ISIN"] = df["CODE_ISIN"].astype(str).str.strip().str.upper()
+df = df[df["CODE_ISIN"].str.match(r"^MA[0-9A-Z]+$", na=False)]
+df["DATE"] = pd.to_datetime(df["DATE"], errors="coerce")
+
+for col in ATTR_COLS:
+    if col not in df.columns:
+        df[col] = pd.NA
+    df[col] = df[col].astype("string").str.strip().replace(["", "nan", "None", "-"], pd.NA)
+df["SOCIETE_DE_GESTION"] = df["SOCIETE_DE_GESTION"].str.upper()
+
+print("✔ Colonnes normalisées")
+
+# ======================================================
+# 2) DERNIERS ATTRIBUTS CONNUS PAR ISIN
+# ======================================================
+# à date égale, la publication daily prime sur la weekly
+step("merge", rows=len(df))
+df["_PRIO"] = (df["SOURCE"] == "DAILY").astype(int)
+df = df.sort_values(["CODE_ISIN", "DATE", "_PRIO"], kind="stable", na_position="first")
+
+g = df.groupby("CODE_ISIN", sort=True)
+ref = g[ATTR_COLS].last()   # last() ignore les NaN => dernier libellé non vide
+if "FUND_ID" in df.columns:
+    ref.insert(0, "FUND_ID", g["FUND_ID"].max().astype("Int32"))   # registre fund_keys.csv
+ref["FIRST_DATE"] = g["DATE"].min()
+ref["LAST_DATE"] = g["DATE"].max()
+ref["IN_DAILY"] = g["_PRIO"].max().astype(bool)
+ref["IN_WEEKLY"] = g["_PRIO"].min().eq(0)
+ref = ref.reset_index()
+
+print(f"✔ {len(ref)} fonds, {ref['SOCIETE_DE_GESTION'].nunique()} sociétés de gestion")
+
+# ======================================================
+# 3) EXPORT
+# ======================================================
+step("export", rows=len(ref))
+ref.to_csv(OUTPUT_FILE, index=False, date_format="%Y-%m-%d")
+print(f"\n🎉 Référentiel fonds exporté → {OUTPUT_FILE}")
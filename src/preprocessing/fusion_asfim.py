@@ -1,7 +1,13 @@
 import pandas as pd
 import numpy as np
 import os
-import re
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.tracing import span, step
+from src.preprocessing.asof_join import asof_join, format_report
+from src.preprocessing.trading_calendar import dates_from_filenames
 
 # -----------------------------------------------
 # Chemins des fichiers d'entrée
@@ -10,39 +16,35 @@ DAILY_FILE = "../scraper/performance_quotidienne_asfim.xlsx"
 WEEKLY_FILE = "../scraper/performance_hebdomadaire_asfim.xlsx"
 OUTPUT_FILE = "../scraper/dataset_fusion_asfim.xlsx"
 
-print("📥 Chargement des fichiers ...")
+# Ancienneté max d'une publication hebdo rattachée à un jour (au-delà: colonnes weekly vides).
+# None = pas de limite (comportement historique); ex: pd.Timedelta(days=14) pour l'activer
+WEEKLY_TOLERANCE = None
 
-df_daily = pd.read_excel(DAILY_FILE)
-df_weekly = pd.read_excel(WEEKLY_FILE)
+print("📥 Chargement des fichiers ...")
 
-# -----------------------------------------------
-# Fonction extraction date depuis "source_file"
-# -----------------------------------------------
-def extract_date(x):
-    m = re.search(r"(\d{2}[-_/]\d{2}[-_/]\d{4})", str(x))
-    if m:
-        # format type 08-12-2025 → jour-mois-année
-        return pd.to_datetime(m.group(1).replace("_", "-").replace("/", "-"),
-                              format="%d-%m-%Y",
-                              dayfirst=True,
-                              errors="coerce")
-    return None
+with span("load", file=DAILY_FILE) as s:
+    df_daily = pd.read_excel(DAILY_FILE)
+    s.rows = len(df_daily)
+with span("load", file=WEEKLY_FILE) as s:
+    df_weekly = pd.read_excel(WEEKLY_FILE)
+    s.rows = len(df_weekly)
 
 # -----------------------------------------------
 # 1) TRAITEMENT DAILY
 # -----------------------------------------------
+step("clean", rows=len(df_daily))
 print("\n🔧 Préparation DAILY...")
 
 df_daily.columns = [c.upper().strip() for c in df_daily.columns]
 
-df_daily["DATE"] = df_daily["SOURCE_FILE"].apply(extract_date)
+df_daily["DATE"] = dates_from_filenames(df_daily["SOURCE_FILE"])
 df_daily = df_daily.dropna(subset=["DATE"])
 
 # Normaliser ISIN
 daily_isin = [c for c in df_daily.columns if "ISIN" in c][0]
 df_daily["CODE_ISIN"] = df_daily[daily_isin].astype(str).str.strip()
 
-# ⚠️ merge_asof exige que les clés "on" soient triées
+# ordre de sortie (la jointure as-of ne demande aucun tri préalable)
 df_daily = df_daily.sort_values(["DATE", "CODE_ISIN"]).reset_index(drop=True)
 
 print("✔ DAILY prêt.")
@@ -54,36 +56,35 @@ print("\n🔧 Préparation WEEKLY...")
 
 df_weekly.columns = [c.upper().strip() for c in df_weekly.columns]
 
-df_weekly["WEEK_DATE"] = df_weekly["SOURCE_FILE"].apply(extract_date)
+df_weekly["WEEK_DATE"] = dates_from_filenames(df_weekly["SOURCE_FILE"])
 df_weekly = df_weekly.dropna(subset=["WEEK_DATE"])
 
 weekly_isin = [c for c in df_weekly.columns if "ISIN" in c][0]
 df_weekly["CODE_ISIN"] = df_weekly[weekly_isin].astype(str).str.strip()
 
-# ⚠️ idem : tri d'abord par WEEK_DATE, puis ISIN
-df_weekly = df_weekly.sort_values(["WEEK_DATE", "CODE_ISIN"]).reset_index(drop=True)
-
 print("✔ WEEKLY prêt.")
 
 # -----------------------------------------------
-# 3) FUSION DAILY + WEEKLY (merge_asof)
+# 3) FUSION DAILY + WEEKLY (as-of: dernière publication hebdo <= DATE)
 # -----------------------------------------------
-print("\n🔗 Fusion intelligente (merge_asof)...")
+step("merge", rows=len(df_daily))
+print("\n🔗 Fusion intelligente (as-of)...")
 
-df_merged = pd.merge_asof(
+df_merged, report = asof_join(
     df_daily,
     df_weekly,
-    left_on="DATE",
+    on="DATE",
     right_on="WEEK_DATE",
     by="CODE_ISIN",
-    direction="backward"
+    tolerance=WEEKLY_TOLERANCE,
 )
 
-print("✔ Fusion terminée !")
+print(f"✔ Fusion terminée ! {format_report(report)}")
 
 # -----------------------------------------------
 # 4) Nettoyage final + export
 # -----------------------------------------------
+step("export", rows=len(df_merged))
 df_merged.columns = [
     c.upper().replace(" ", "_").replace("É", "E").replace("È", "E")
     for c in df_merged.columns
@@ -0,0 +1,191 @@
+"""
+Calendrier de cotation marocain et index de séance (BDAY_ID).
+
+- Séance = jour de publication des VL (ASFIM). Le calendrier est construit au
+  nettoyage daily à partir des dates publiées (clean_daily) puis persisté dans
+  src/scraper/trading_calendar.csv; BDAY_ID = position dense de la séance.
+- Règles marocaines (week-end + fériés civils fixes) pour les jours attendus:
+  les fêtes religieuses (calendrier lunaire) ne sont pas calculables à l'avance,
+  elles apparaissent comme jours ouvrés sans publication (gaps()).
+- Une date hors séance (ex: publication hebdo un jour férié) est rattachée à la
+  séance précédente => J-1 = index - 1, fenêtre de N séances = index - N.
+
+Usage (scripts du pipeline, après sys.path.append de la racine):
+    from src.preprocessing.trading_calendar import TradingCalendar, dates_from_filenames
+    cal = TradingCalendar.from_publications(df["DATE"])
+    df["BDAY_ID"] = cal.index(df["DATE"])
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+CALENDAR_FILE = Path(__file__).resolve().parents[1] / "scraper" / "trading_calendar.csv"
+MISSING = -1
+
+# Fériés civils fixes (mois, jour, première année d'application)
+FIXED_HOLIDAYS = [
+    (1, 1, None),      # Nouvel an
+    (1, 11, None),     # Manifeste de l'indépendance
+    (1, 14, 2024),     # Nouvel an amazigh
+    (5, 1, None),      # Fête du travail
+    (7, 30, None),     # Fête du Trône
+    (8, 14, None),     # Allégeance Oued Eddahab
+    (8, 20, None),     # Révolution du Roi et du Peuple
+    (8, 21, None),     # Fête de la jeunesse
+    (10, 31, 2025),    # Fête de l'Unité
+    (11, 6, None),     # Marche verte
+    (11, 18, None),    # Fête de l'indépendance
+]
+
+# dd-mm-yyyy (séparateurs - _ /) dans les noms de fichiers ASFIM
+DATE_PATTERN = r"(\d{2})[-_/](\d{2})[-_/](\d{4})"
+
+
+# ======================================================
+# Dates depuis SOURCE_FILE (vectorisé)
+# ======================================================
+def dates_from_filenames(names: pd.Series) -> pd.Series:
+    """
+    Date (jour-mois-année) contenue dans chaque nom de fichier, NaT sinon.
+    Le regex n'est évalué qu'une fois par nom distinct (quelques centaines de
+    fichiers pour des dizaines de milliers de lignes).
+    """
+    names = pd.Series(names)
+    codes, uniques = pd.factorize(names.astype("string"), use_na_sentinel=True)
+    parts = pd.Series(uniques, dtype="string").str.extract(DATE_PATTERN).astype(float)
+    parsed = pd.to_datetime(
+        pd.DataFrame({"year": parts[2], "month": parts[1], "day": parts[0]}), errors="coerce"
+    )
+    values = parsed.to_numpy(dtype="datetime64[ns]")
+    out = np.full(len(names), np.datetime64("NaT"), dtype="datetime64[ns]")
+    ok = codes >= 0
+    out[ok] = values[codes[ok]]
+    return pd.Series(out, index=names.index)
+
+
+# ======================================================
+# Règles marocaines
+# ======================================================
+def fixed_holidays(start, end) -> pd.DatetimeIndex:
+    """Fériés civils fixes entre start et end (inclus)."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    days = [
+        pd.Timestamp(year, month, day)
+        for year in range(start.year, end.year + 1)
+        for month, day, since in FIXED_HOLIDAYS
+        if since is None or year >= since
+    ]
+    out = pd.DatetimeIndex(days)
+    return out[(out >= start.normalize()) & (out <= end)]
+
+
+def business_days(start, end, holidays: Iterable = ()) -> pd.DatetimeIndex:
+    """Jours ouvrés marocains (lun-ven hors fériés fixes et `holidays`)."""
+    days = pd.bdate_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize())
+    closed = fixed_holidays(start, end).union(pd.DatetimeIndex(pd.to_datetime(list(holidays))))
+    return days.difference(closed)
+
+
+# ======================================================
+# Calendrier de séances
+# ======================================================
+class TradingCalendar:
+    """Séances triées; l'index d'une séance (BDAY_ID) est sa position."""
+
+    def __init__(self, sessions):
+        s = pd.DatetimeIndex(pd.to_datetime(pd.Series(sessions), errors="coerce").dropna())
+        self.sessions = s.normalize().unique().sort_values()
+        self._days = self.sessions.to_numpy(dtype="datetime64[D]")
+
+    @classmethod
+    def morocco(cls, start, end, holidays: Iterable = ()) -> "TradingCalendar":
+        """Calendrier théorique (règles seules), ex: pas encore de publication daily."""
+        return cls(business_days(start, end, holidays))
+
+    @classmethod
+    def from_publications(cls, dates) -> "TradingCalendar":
+        """Séances = jours effectivement publiés."""
+        return cls(dates)
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+    def index(self, dates) -> np.ndarray:
+        """
+        BDAY_ID (int32) de chaque date; une date hors séance prend la séance
+        précédente, MISSING si NaT ou antérieure à la première séance.
+        """
+        d = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy(dtype="datetime64[D]")
+        out = np.searchsorted(self._days, d, side="right").astype(np.int64) - 1
+        out[np.isnat(d)] = MISSING
+        return out.astype(np.int32)
+
+    def position(self, date) -> int:
+        """BDAY_ID d'une date (scalaire)."""
+        return int(self.index([date])[0])
+
+    def is_session(self, dates) -> np.ndarray:
+        d = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy(dtype="datetime64[D]")
+        pos = np.searchsorted(self._days, d)
+        ok = pos < len(self._days)
+        hit = np.zeros(len(d), dtype=bool)
+        hit[ok] = self._days[pos[ok]] == d[ok]
+        return hit
+
+    def date_at(self, idx):
+        """Date de la séance `idx` (scalaire ou tableau); NaT hors calendrier."""
+        scalar = np.ndim(idx) == 0
+        idx = np.atleast_1d(np.asarray(idx, dtype=np.int64))
+        ok = (idx >= 0) & (idx < len(self._days))
+        out = np.full(len(idx), np.datetime64("NaT"), dtype="datetime64[D]")
+        out[ok] = self._days[idx[ok]]
+        out = pd.DatetimeIndex(out)
+        return out[0] if scalar else out
+
+    def shift(self, date, n: int) -> pd.Timestamp:
+        """Séance située n séances après (n < 0: avant) celle de `date`."""
+        pos = self.position(date)
+        return self.date_at(pos + n) if pos != MISSING else pd.NaT
+
+    def window_start(self, date, sessions: int) -> pd.Timestamp:
+        """Début d'une fenêtre de `sessions` séances se terminant à `date` incluse (bornée au début)."""
+        pos = self.position(date)
+        if pos == MISSING:
+            return pd.NaT
+        return self.date_at(max(pos - sessions + 1, 0))
+
+    def gaps(self, holidays: Iterable = ()) -> pd.DatetimeIndex:
+        """Jours ouvrés attendus sans séance (fêtes religieuses, jours non publiés)."""
+        if not len(self):
+            return pd.DatetimeIndex([])
+        expected = business_days(self.sessions[0], self.sessions[-1], holidays)
+        return expected.difference(self.sessions)
+
+    # ------------------------------------------------------
+    # Persistance
+    # ------------------------------------------------------
+    def save(self, path: Path = CALENDAR_FILE) -> None:
+        path = Path(path)
+        frame = pd.DataFrame({"DATE": self.sessions, "BDAY_ID": np.arange(len(self), dtype=np.int32)})
+        tmp = path.with_name(path.name + ".tmp")
+        frame.to_csv(tmp, index=False, date_format="%Y-%m-%d")
+        tmp.replace(path)
+
+
+@lru_cache(maxsize=2)
+def _load(path: str, version: Tuple[int, int]) -> TradingCalendar:
+    return TradingCalendar(pd.read_csv(path, parse_dates=["DATE"])["DATE"])
+
+
+def load_calendar(path: Path = CALENDAR_FILE) -> Optional[TradingCalendar]:
+    """Calendrier persisté par clean_daily (rechargé si le fichier change), None s'il n'existe pas."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    st = path.stat()
+    return _load(str(path), (st.st_mtime_ns, st.st_size))
@@ -0,0 +1,263 @@
+"""
+Panel large (dates x ISIN) des VL et rendements journaliers, persisté en .npy
+et ouvert en memory-map (lecture seule).
+
+- Stockage colonne-major (ordre Fortran): la série d'un fonds = vl[:, j],
+  un bloc mémoire contigu => slice sans copie.
+- np.load(mmap_mode="r"): les pages sont partagées via le cache OS entre les
+  process FastAPI / Streamlit / workers, pas de duplication en RAM.
+- Versions: chaque build écrit vl_panel/v-<version>/, puis remplace
+  atomiquement le pointeur vl_panel/CURRENT (os.replace): le panel courant
+  existe à tout instant, les memmaps déjà ouverts gardent leur version.
+
+Construction: python vl_panel.py (depuis src/preprocessing, après clean_daily.py)
+Lecture: open_panel() (API: snapshot "vl_panel", UI: api_wafa_vs_market)
+"""
+import json
+import os
+import shutil
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# ======================================================
+# CONFIG
+# ======================================================
+INPUT_FILE = "../scraper/performance_quotidienne_asfim_clean.xlsx"
+PANEL_DIR = Path(__file__).resolve().parents[1] / "scraper" / "vl_panel"
+PANEL_DTYPE = "float64"   # "float32" divise la taille par 2 (précision ~7 chiffres)
+CURRENT = "CURRENT"       # pointeur: nom du dossier de la version courante
+KEEP_VERSIONS = 2         # versions gardées (lecteurs encore ouverts sur la précédente)
+ANNUALIZATION = 252
+
+FILES = {
+    "vl": "vl.npy",
+    "ret": "ret.npy",
+    "dates": "dates.npy",
+    "isins": "isins.npy",
+    "meta": "meta.json",
+}
+
+
+class VLPanel:
+    """
+    Vue lecture seule sur le panel. vl / ret sont des np.memmap (dates x ISIN).
+    """
+
+    def __init__(self, vl, ret, dates, isins, meta):
+        self.vl = vl
+        self.ret = ret
+        self.dates = pd.DatetimeIndex(dates)
+        self.isins = pd.Index(isins)
+        self.meta = meta
+        self._col = {isin: j for j, isin in enumerate(self.isins)}
+
+    @property
+    def shape(self):
+        return self.vl.shape
+
+    @property
+    def version(self) -> str:
+        return str(self.meta.get("version", ""))
+
+    def col(self, isin: str) -> int:
+        """Position de l'ISIN (KeyError si absent)."""
+        return self._col[str(isin).strip().upper()]
+
+    def series(self, isin: str, field: str = "vl") -> np.ndarray:
+        """Série complète d'un fonds (vue contiguë, aucune copie)."""
+        return getattr(self, field)[:, self.col(isin)]
+
+    def date_slice(self, start=None, end=None) -> slice:
+        """Lignes [start, end] (bornes incluses) via searchsorted sur l'axe dates."""
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side="left")
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        return slice(lo, hi)
+
+    def frame(self, field: str = "vl", isins=None, start=None, end=None) -> pd.DataFrame:
+        """DataFrame (dates x ISIN) sur une sous-période / sous-ensemble (copie limitée au résultat)."""
+        rows = self.date_slice(start, end)
+        arr = getattr(self, field)
+        if isins is None:
+            return pd.DataFrame(arr[rows], index=self.dates[rows], columns=self.isins)
+        cols = [self.col(i) for i in isins]
+        return pd.DataFrame(arr[rows][:, cols], index=self.dates[rows], columns=self.isins[cols])
+
+    def cumulative(self, isin: str, start=None, end=None) -> pd.Series:
+        """Performance cumulée d'un fonds sur [start, end] (VL / première VL connue - 1)."""
+        rows = self.date_slice(start, end)
+        vl = np.asarray(self.series(isin)[rows], dtype=float)
+        ok = np.flatnonzero(np.isfinite(vl))
+        out = vl / vl[ok[0]] - 1.0 if len(ok) else vl
+        return pd.Series(out, index=self.dates[rows], name=self.isins[self.col(isin)])
+
+    def performance(self, isins=None, start=None, end=None) -> pd.DataFrame:
+        """
+        Statistiques par fonds sur [start, end], calculées sur les tranches de
+        colonnes du panel: performance, volatilité annualisée, max drawdown.
+        """
+        rows = self.date_slice(start, end)
+        # tous les fonds: tranche de lignes = vue du memmap (aucune copie en float64)
+        cols = slice(None) if isins is None else np.array([self.col(i) for i in isins], dtype=int)
+        vl = np.asarray(self.vl[rows, cols], dtype=float)
+        ret = np.asarray(self.ret[rows, cols], dtype=float)
+        dates = self.dates[rows]
+        out = pd.DataFrame({"CODE_ISIN": self.isins[cols], "NB_POINTS": np.isfinite(vl).sum(axis=0)})
+        for c in ["FIRST_DATE", "LAST_DATE"]:
+            out[c] = pd.NaT
+        for c in ["PERFORMANCE", "VOLATILITY", "MAX_DRAWDOWN"]:
+            out[c] = np.nan
+        has = out["NB_POINTS"].to_numpy() > 0
+        if not has.any():
+            return out
+
+        j = np.flatnonzero(has)
+        v = vl if has.all() else vl[:, j]
+        first = np.argmax(np.isfinite(v), axis=0)
+        last = len(v) - 1 - np.argmax(np.isfinite(v[::-1]), axis=0)
+        k = np.arange(len(j))
+        out.loc[has, "FIRST_DATE"] = dates[first]
+        out.loc[has, "LAST_DATE"] = dates[last]
+        out.loc[has, "PERFORMANCE"] = v[last, k] / v[first, k] - 1.0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            peak = np.fmax.accumulate(v, axis=0)
+            out.loc[has, "MAX_DRAWDOWN"] = np.nanmin(v / peak - 1.0, axis=0)
+
+        r = ret[1:] if has.all() else ret[1:, j]   # rendement de la 1re date: calculé hors fenêtre
+        enough = np.isfinite(r).sum(axis=0) > 1
+        if enough.any():
+            out.loc[j[enough], "VOLATILITY"] = np.nanstd(r[:, enough], axis=0, ddof=1) * np.sqrt(ANNUALIZATION)
+        return out
+
+
+# ======================================================
+# Construction / écriture
+# ======================================================
+def build_panel(df: pd.DataFrame, dtype: str = PANEL_DTYPE):
+    """
+    Long (CODE_ISIN, DATE, VL) -> matrices (dates x ISIN) VL et rendements (ordre Fortran).
+    """
+    d = df[["CODE_ISIN", "DATE", "VL"]].copy()
+    d["DATE"] = pd.to_datetime(d["DATE"], errors="coerce").dt.normalize()
+    d["VL"] = pd.to_numeric(d["VL"], errors="coerce")
+    # nulls écartés AVANT astype(str) (sinon NaN => colonne "NAN" dans le panel)
+    d = d.dropna(subset=["CODE_ISIN", "DATE"])
+    d["CODE_ISIN"] = d["CODE_ISIN"].astype(str).str.strip().str.upper()
+    d = d[d["CODE_ISIN"] != ""]
+
+    dates, date_codes = np.unique(d["DATE"].to_numpy(dtype="datetime64[D]"), return_inverse=True)
+    isins, isin_codes = np.unique(d["CODE_ISIN"].to_numpy(dtype=str), return_inverse=True)
+
+    vl = np.full((len(dates), len(isins)), np.nan, dtype=np.float64, order="F")
+    # doublons (ISIN, DATE): la dernière ligne gagne, comme clean_daily (keep="last")
+    vl[date_codes, isin_codes] = d["VL"].to_numpy(dtype=np.float64)
+
+    ret = np.full_like(vl, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ret[1:] = vl[1:] / vl[:-1] - 1.0
+
+    return dates, isins, np.asfortranarray(vl.astype(dtype)), np.asfortranarray(ret.astype(dtype))
+
+
+def _current_dir(panel_dir) -> Path:
+    """Dossier de la version courante (disposition sans pointeur: le dossier lui-même)."""
+    panel_dir = Path(panel_dir)
+    pointer = panel_dir / CURRENT
+    if pointer.exists():
+        return panel_dir / pointer.read_text().strip()
+    return panel_dir
+
+
+def save_panel(df: pd.DataFrame, panel_dir=PANEL_DIR, dtype: str = PANEL_DTYPE) -> Path:
+    """
+    Écrit une nouvelle version (dossier temporaire renommé en v-<version>) puis
+    remplace atomiquement le pointeur CURRENT: pas de fenêtre sans panel, et les
+    lecteurs qui ont déjà un memmap ouvert gardent l'ancienne version intacte.
+    """
+    panel_dir = Path(panel_dir)
+    panel_dir.mkdir(parents=True, exist_ok=True)
+    dates, isins, vl, ret = build_panel(df, dtype=dtype)
+
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+    tmp = panel_dir / f".tmp-{version}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+
+    np.save(tmp / FILES["vl"], vl)
+    np.save(tmp / FILES["ret"], ret)
+    np.save(tmp / FILES["dates"], dates)
+    np.save(tmp / FILES["isins"], isins)
+    meta = {
+        "version": version,
+        "shape": list(vl.shape),
+        "dtype": str(vl.dtype),
+        "min_date": str(dates[0]) if len(dates) else None,
+        "max_date": str(dates[-1]) if len(dates) else None,
+    }
+    (tmp / FILES["meta"]).write_text(json.dumps(meta, indent=2))
+
+    target = panel_dir / f"v-{version}"
+    tmp.rename(target)
+    pointer = panel_dir / f"{CURRENT}.tmp-{os.getpid()}"
+    pointer.write_text(target.name)
+    os.replace(pointer, panel_dir / CURRENT)
+
+    # ménage: fichiers de l'ancienne disposition (sans pointeur) et vieilles versions
+    # (sous Windows, une version encore mappée ne se supprime pas: retentée au build suivant)
+    for name in FILES.values():
+        (panel_dir / name).unlink(missing_ok=True)
+    versions = sorted(p for p in panel_dir.glob("v-*") if p.is_dir())
+    for old in versions[:-KEEP_VERSIONS]:
+        if old != target:
+            shutil.rmtree(old, ignore_errors=True)
+    return target
+
+
+# ======================================================
+# Lecture (memory-map partagé)
+# ======================================================
+def load_panel(panel_dir=PANEL_DIR, mmap: bool = True) -> VLPanel:
+    panel_dir = _current_dir(panel_dir)
+    if not (panel_dir / FILES["meta"]).exists():
+        raise FileNotFoundError(
+            f"Panel VL introuvable: {panel_dir}\n"
+            "=> Lance src/preprocessing/vl_panel.py"
+        )
+    mode = "r" if mmap else None
+    meta = json.loads((panel_dir / FILES["meta"]).read_text())
+    return VLPanel(
+        vl=np.load(panel_dir / FILES["vl"], mmap_mode=mode),
+        ret=np.load(panel_dir / FILES["ret"], mmap_mode=mode),
+        dates=np.load(panel_dir / FILES["dates"]),
+        isins=np.load(panel_dir / FILES["isins"]),
+        meta=meta,
+    )
+
+
+@lru_cache(maxsize=4)
+def _open_panel_cached(version_dir: str) -> VLPanel:
+    return load_panel(version_dir)
+
+
+def open_panel(panel_dir=PANEL_DIR) -> VLPanel:
+    """
+    Panel partagé du process, rouvert seulement quand CURRENT pointe vers une
+    nouvelle version.
+    """
+    return _open_panel_cached(str(_current_dir(panel_dir)))
+
+
+if __name__ == "__main__":
+    print("📥 Chargement données daily clean...")
+    df = pd.read_excel(INPUT_FILE, usecols=lambda c: str(c).upper().strip() in ["CODE_ISIN", "DATE", "VL"])
+    df.columns = df.columns.astype(str).str.upper().str.strip()
+
+    print("🧱 Construction du panel (dates x ISIN)...")
+    out = save_panel(df)
+
+    panel = load_panel(out)
+    print(f"✔ Panel : {panel.shape[0]} dates x {panel.shape[1]} fonds ({panel.meta['dtype']})")
+    print(f"\n🎉 Panel VL memory-mappé exporté → {out}")
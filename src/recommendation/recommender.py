@@ -1,5 +1,11 @@
 import pandas as pd
 import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.tracing import span, step
+from src.preprocessing.fund_keys import join_on_fund
 
 # ======================================================
 # CONFIG
@@ -12,12 +18,17 @@ SHEET_FUND_SCORE = "ALL_FUNDS"
 SHEET_PRED_30D   = "PROJECTION_30D_ALL"
 
 print("📥 Chargement des fichiers...")
-df_hist = pd.read_excel(FUND_SCORE_FILE, sheet_name=SHEET_FUND_SCORE)
-df_30d  = pd.read_excel(PRED_30D_FILE, sheet_name=SHEET_PRED_30D)
+with span("load", file=FUND_SCORE_FILE) as s:
+    df_hist = pd.read_excel(FUND_SCORE_FILE, sheet_name=SHEET_FUND_SCORE)
+    s.rows = len(df_hist)
+with span("load", file=PRED_30D_FILE) as s:
+    df_30d = pd.read_excel(PRED_30D_FILE, sheet_name=SHEET_PRED_30D)
+    s.rows = len(df_30d)
 
 # ======================================================
 # 1) Normalisation minimale
 # ======================================================
+step("clean", rows=len(df_hist))
 df_hist.columns = df_hist.columns.str.upper().str.strip()
 df_30d.columns  = df_30d.columns.str.upper().str.strip()
 
@@ -30,9 +41,13 @@ if "SOCIETE_DE_GESTION" in df_30d.columns:
 # ======================================================
 # 2) Sélection des colonnes utiles
 # ======================================================
+# Clé de jointure entière (FUND_ID) si les deux fichiers la portent
+USE_KEYS = "FUND_ID" in df_hist.columns and "FUND_ID" in df_30d.columns
+KEY_COLS = ["FUND_ID", "CODE_ISIN"] if USE_KEYS else ["CODE_ISIN"]
+
 # Historique (fund_risk_score)
 need_hist = [
-    "CODE_ISIN", "SOCIETE_DE_GESTION", "OPCVM",
+    *KEY_COLS, "SOCIETE_DE_GESTION", "OPCVM",
     "RISK_SCORE", "FINAL_RISK_CLASS", "PCT_HIGH_RISK", "PCT_MEDIUM_HIGH"
 ]
 for c in need_hist:
@@ -43,7 +58,7 @@ df_hist = df_hist[need_hist].copy()
 
 # Projection 30 jours
 need_30d = [
-    "CODE_ISIN", "SOCIETE_DE_GESTION", "OPCVM",
+    *KEY_COLS, "SOCIETE_DE_GESTION", "OPCVM",
     "RISK_SCORE_30D", "FINAL_RISK_CLASS_30D",
     "P_HIGH_RISK_30D", "P_MEDIUM_OR_HIGH_30D", "NB_DAYS"
 ]
@@ -57,7 +72,15 @@ df_30d = df_30d[need_30d].copy()
 # 3) Merge Historique + Futur30
 # ======================================================
 print("🔗 Fusion des infos (historique + 30 jours)...")
-df = pd.merge(df_30d, df_hist, on="CODE_ISIN", how="left", suffixes=("_30D", "_HIST"))
+if USE_KEYS:
+    # lookup par FUND_ID (tableau dense), mêmes suffixes que le merge
+    shared = ["SOCIETE_DE_GESTION", "OPCVM"]
+    df = join_on_fund(
+        df_30d.rename(columns={c: f"{c}_30D" for c in shared}),
+        df_hist.rename(columns={c: f"{c}_HIST" for c in shared}),
+    )
+else:
+    df = pd.merge(df_30d, df_hist, on="CODE_ISIN", how="left", suffixes=("_30D", "_HIST"))
 
 # Harmoniser OPCVM / SG si manque côté 30D
 df["SOCIETE_DE_GESTION"] = df["SOCIETE_DE_GESTION_30D"].combine_first(df["SOCIETE_DE_GESTION_HIST"])
@@ -67,7 +90,7 @@ df["OPCVM"] = df["OPCVM_30D"].combine_first(df["OPCVM_HIST"])
 drop_cols = [c for c in df.columns if c.endswith("_30D") or c.endswith("_HIST")]
 # On garde les versions "propres" qu'on vient de créer + les métriques
 keep_cols = [
-    "CODE_ISIN", "SOCIETE_DE_GESTION", "OPCVM",
+    *KEY_COLS, "SOCIETE_DE_GESTION", "OPCVM",
     "FINAL_RISK_CLASS", "RISK_SCORE", "PCT_HIGH_RISK", "PCT_MEDIUM_HIGH",
     "FINAL_RISK_CLASS_30D", "RISK_SCORE_30D", "P_HIGH_RISK_30D", "P_MEDIUM_OR_HIGH_30D", "NB_DAYS"
 ]
@@ -76,6 +99,7 @@ df = df[keep_cols].copy()
 # ======================================================
 # 4) Recommandation (règles métier)
 # ======================================================
+step("score", rows=len(df))
 def reco_rule(hist, fut):
     hist = str(hist).upper()
     fut  = str(fut).upper()
@@ -158,6 +182,7 @@ summary = (
 # ======================================================
 # 9) Export multi-feuilles
 # ======================================================
+step("export", rows=len(df))
 print("💾 Export Excel...")
 with pd.ExcelWriter(OUTPUT_FILE, engine="openpyxl") as writer:
     df.to_excel(writer, sheet_name="ALL_FUNDS_RECO", index=False)
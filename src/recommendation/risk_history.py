@@ -0,0 +1,343 @@
+"""
+Historique bitemporel des classes de risque et recommandations par fonds.
+
+- Clé (FUND_ID, AS_OF): AS_OF = date de valeur (dernière séance des données,
+  trading_calendar.csv), RECORDED_AT = instant d'enregistrement (run du batch).
+  Une republication (change_capture) recalculée pour la même séance ajoute une
+  version plus récente sans effacer l'ancienne: as_of(date, known_at=...) rejoue
+  ce que l'on savait à un instant donné.
+- Append-only, delta: un snapshot n'écrit que les fonds dont une valeur suivie
+  a changé depuis l'état connu (+ une ligne ALIVE=0 pour un fonds disparu).
+  Une séance passée peut être ré-enregistrée (republication): ses lignes sont
+  ajoutées à sa date de valeur, et l'état du snapshot suivant est ré-ancré pour
+  que les dates ultérieures restent inchangées.
+- Colonnaire, compressé: colonnes entières (classes = codes d'un dictionnaire
+  append-only, scores quantifiés à 1e-4), chacune delta-encodée puis deflate
+  (np.savez_compressed) dans src/scraper/risk_history/seg_*.npz; manifest.json
+  liste les segments, fusionnés tous les COMPACT_SEGMENTS snapshots.
+
+Usage:
+    python risk_history.py                      # étape du pipeline (après recommender)
+
+    from src.recommendation.risk_history import open_history
+    h = open_history()
+    h.as_of("2024-06-28")                         # état de chaque fonds à cette date
+    h.as_of("2024-06-28", known_at="2024-07-01")  # ... tel que connu le 1er juillet
+    h.timeline(fund_id)                           # changements d'un fonds
+"""
+from __future__ import annotations
+
+import json
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.preprocessing.fund_keys import KEYS_FILE, date_ids, ids_to_dates, join_on_fund, load_registry, lookup
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "scraper"
+HISTORY_DIR = DATA_DIR / "risk_history"
+MANIFEST = "manifest.json"
+FORMAT = 1
+
+SCORE_SCALE = 10_000          # scores stockés à 1e-4 près
+NA_INT = np.iinfo(np.int64).min
+COMPACT_SEGMENTS = 64         # au-delà: segments fusionnés en un seul fichier
+
+# (fichier, feuille, colonnes suivies)
+SOURCES = [
+    ("fund_risk_score.xlsx", "ALL_FUNDS", ["FINAL_RISK_CLASS", "RISK_SCORE"]),
+    ("prediction_future_risk.xlsx", "PROJECTION_30D_ALL", ["FINAL_RISK_CLASS_30D", "RISK_SCORE_30D", "P_HIGH_RISK_30D"]),
+    ("recommendations.xlsx", "ALL_FUNDS_RECO", ["RECOMMENDATION", "PRIORITY_SCORE"]),
+]
+CATEGORY_FIELDS = ["FINAL_RISK_CLASS", "FINAL_RISK_CLASS_30D", "RECOMMENDATION"]
+SCORE_FIELDS = ["RISK_SCORE", "RISK_SCORE_30D", "P_HIGH_RISK_30D", "PRIORITY_SCORE"]
+FIELDS = [c for _, _, cols in SOURCES for c in cols]
+KEY_COLUMNS = ["FUND_ID", "AS_OF", "RECORDED_AT", "ALIVE"]
+
+
+# ======================================================
+# Encodage des colonnes (entiers, delta)
+# ======================================================
+def _delta(x: np.ndarray) -> np.ndarray:
+    return np.diff(x.astype(np.int64), prepend=np.int64(0))
+
+
+def _undelta(d: np.ndarray) -> np.ndarray:
+    return np.cumsum(d, dtype=np.int64)
+
+
+def _quantize(values) -> np.ndarray:
+    v = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+    out = np.full(len(v), NA_INT, dtype=np.int64)
+    ok = np.isfinite(v)
+    out[ok] = np.rint(v[ok] * SCORE_SCALE).astype(np.int64)
+    return out
+
+
+def _dequantize(q: np.ndarray) -> np.ndarray:
+    return np.where(q == NA_INT, np.nan, q / SCORE_SCALE)
+
+
+def _codes(values, dictionary: List[str]) -> np.ndarray:
+    """Codes (-1 = manquant) dans le dictionnaire, étendu en place avec les nouvelles valeurs."""
+    s = pd.Series(values, dtype=object)
+    s = s.where(s.notna(), None)
+    known = {v: i for i, v in enumerate(dictionary)}
+    for v in pd.unique(s.dropna().astype(str)):
+        if v not in known:
+            known[v] = len(dictionary)
+            dictionary.append(v)
+    return np.array([known[str(v)] if v is not None else -1 for v in s], dtype=np.int64)
+
+
+def _write_segment(path: Path, cols: Dict[str, np.ndarray]) -> None:
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez_compressed(tmp, **{c: _delta(v) for c, v in cols.items()})
+    tmp.replace(path)
+
+
+def _read_segment(path: Path) -> Dict[str, np.ndarray]:
+    with np.load(path, allow_pickle=False) as z:
+        return {c: _undelta(z[c]) for c in z.files}
+
+
+# ======================================================
+# Lecture / requêtes as-of
+# ======================================================
+class RiskHistory:
+    """Lignes de changement triées par (FUND_ID, AS_OF, RECORDED_AT)."""
+
+    def __init__(self, cols: Dict[str, np.ndarray], manifest: dict, registry: Optional[pd.Series] = None):
+        self.manifest = manifest
+        # CODE_ISIN <-> FUND_ID résolus une fois au chargement (pas de lecture par requête)
+        self.fund_ids = registry if registry is not None else pd.Series(dtype=np.int32)
+        self.isins = pd.Series(self.fund_ids.index.to_numpy(), index=self.fund_ids.to_numpy())
+        self.dictionaries: Dict[str, List[str]] = manifest.get("dictionaries", {})
+        n = len(cols.get("FUND_ID", []))
+        cols = {c: cols.get(c, np.full(n, NA_INT if c in SCORE_FIELDS else -1, dtype=np.int64))
+                for c in KEY_COLUMNS + FIELDS}
+        order = np.lexsort((cols["RECORDED_AT"], cols["AS_OF"], cols["FUND_ID"]))
+        self.cols = {c: v[order] for c, v in cols.items()}
+
+    def __len__(self) -> int:
+        return len(self.cols["FUND_ID"])
+
+    def _decode(self, idx: np.ndarray) -> pd.DataFrame:
+        c = {k: v[idx] for k, v in self.cols.items()}
+        out = pd.DataFrame({
+            "FUND_ID": c["FUND_ID"].astype(np.int32),
+            "AS_OF_DATE": ids_to_dates(c["AS_OF"]),
+            "RECORDED_AT": pd.to_datetime(c["RECORDED_AT"], unit="s"),
+        })
+        out.insert(1, "CODE_ISIN", self.isins.reindex(out["FUND_ID"].to_numpy()).to_numpy())
+        for f in FIELDS:
+            if f in CATEGORY_FIELDS:
+                labels = np.array(self.dictionaries.get(f, []) + [None], dtype=object)
+                out[f] = labels[c[f]]   # -1 => None (dernier élément)
+            else:
+                out[f] = _dequantize(c[f])
+        out["ALIVE"] = c["ALIVE"].astype(bool)
+        return out
+
+    def _last_rows(self, date, known_at=None) -> np.ndarray:
+        """Dernière version connue de chaque fonds (positions), AS_OF <= date, RECORDED_AT <= known_at."""
+        ok = self.cols["AS_OF"] <= int(date_ids([date])[0])
+        if known_at is not None:
+            ok &= self.cols["RECORDED_AT"] <= int(pd.Timestamp(known_at).timestamp())
+        idx = np.flatnonzero(ok)
+        if not len(idx):
+            return idx
+        f = self.cols["FUND_ID"][idx]
+        last = idx[np.r_[f[1:] != f[:-1], True]]
+        return last[self.cols["ALIVE"][last] == 1]
+
+    def as_of(self, date, known_at=None) -> pd.DataFrame:
+        """État de chaque fonds à la date de valeur `date` (tel que connu à `known_at`, défaut: maintenant)."""
+        return self._decode(self._last_rows(date, known_at)).drop(columns="ALIVE")
+
+    def timeline(self, fund_id: int, known_at=None) -> pd.DataFrame:
+        """Versions successives d'un fonds (une ligne par changement enregistré)."""
+        f = self.cols["FUND_ID"]
+        lo, hi = np.searchsorted(f, fund_id), np.searchsorted(f, fund_id, side="right")
+        idx = np.arange(lo, hi)
+        if known_at is not None:
+            idx = idx[self.cols["RECORDED_AT"][idx] <= int(pd.Timestamp(known_at).timestamp())]
+        return self._decode(idx)
+
+    def fund_id(self, isin: str) -> Optional[int]:
+        code = isin.strip().upper()
+        return int(self.fund_ids[code]) if code in self.fund_ids.index else None
+
+    def last_as_of(self) -> Optional[pd.Timestamp]:
+        return ids_to_dates([self.cols["AS_OF"].max()])[0] if len(self) else None
+
+
+def _load_manifest(history_dir: Path) -> dict:
+    path = history_dir / MANIFEST
+    if not path.exists():
+        return {"format": FORMAT, "scale": SCORE_SCALE, "dictionaries": {f: [] for f in CATEGORY_FIELDS},
+                "segments": [], "snapshots": []}
+    return json.loads(path.read_text())
+
+
+def load_history(history_dir=HISTORY_DIR, keys_file=KEYS_FILE) -> RiskHistory:
+    """Historique complet; keys_file=None: sans résolution des ISIN (écriture)."""
+    history_dir = Path(history_dir)
+    manifest = _load_manifest(history_dir)
+    parts = [_read_segment(history_dir / s["file"]) for s in manifest["segments"]]
+    cols = {c: np.concatenate([p[c] for p in parts]) for c in parts[0]} if parts else {}
+    return RiskHistory(cols, manifest, load_registry(keys_file) if keys_file is not None else None)
+
+
+@lru_cache(maxsize=2)
+def _open_history_cached(history_dir: str, mtime: float) -> RiskHistory:
+    return load_history(history_dir)
+
+
+def open_history(history_dir=HISTORY_DIR) -> RiskHistory:
+    """Historique partagé du process, relu seulement quand le manifest change."""
+    manifest = Path(history_dir) / MANIFEST
+    mtime = manifest.stat().st_mtime if manifest.exists() else 0.0
+    return _open_history_cached(str(history_dir), mtime)
+
+
+# ======================================================
+# Écriture (append-only)
+# ======================================================
+def _save_manifest(history_dir: Path, manifest: dict) -> None:
+    tmp = history_dir / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, ensure_ascii=False))
+    tmp.replace(history_dir / MANIFEST)
+
+
+def _compact(history_dir: Path, manifest: dict) -> None:
+    """Fusionne les segments en un seul fichier trié par fonds (deltas quasi nuls => meilleure compression)."""
+    hist = load_history(history_dir, keys_file=None)
+    name = f"seg_{len(manifest['snapshots']):06d}_base.npz"
+    _write_segment(history_dir / name, hist.cols)
+    old = [s["file"] for s in manifest["segments"]]
+    manifest["segments"] = [{"file": name, "rows": len(hist)}]
+    _save_manifest(history_dir, manifest)
+    for f in old:
+        if f != name:
+            (history_dir / f).unlink(missing_ok=True)
+
+
+def append_snapshot(current: pd.DataFrame, as_of, recorded_at=None, history_dir=HISTORY_DIR) -> int:
+    """
+    Enregistre l'état `current` (FUND_ID + FIELDS) à la date de valeur `as_of`.
+    Seuls les fonds modifiés / nouveaux / disparus sont écrits; retourne le nombre
+    de fonds écrits à `as_of`. `as_of` peut être antérieur au dernier snapshot
+    (séance republiée): les fonds écrits sont ré-ancrés au snapshot suivant.
+    """
+    history_dir = Path(history_dir)
+    history_dir.mkdir(parents=True, exist_ok=True)
+    hist = load_history(history_dir, keys_file=None)
+    manifest = hist.manifest
+    as_of_id = int(date_ids([as_of])[0])
+    recorded = int(recorded_at if recorded_at is not None else time.time())
+
+    # encodage du snapshot courant
+    cur = {"FUND_ID": pd.to_numeric(current["FUND_ID"]).to_numpy(dtype=np.int64)}
+    for f in FIELDS:
+        values = current[f] if f in current.columns else pd.Series(np.nan, index=current.index)
+        cur[f] = _codes(values, manifest["dictionaries"].setdefault(f, [])) if f in CATEGORY_FIELDS else _quantize(values)
+    order = np.argsort(cur["FUND_ID"], kind="stable")
+    cur = {c: v[order] for c, v in cur.items()}
+
+    # état connu à cette date (dernière version de chaque fonds vivant)
+    last = hist._last_rows(ids_to_dates([as_of_id])[0])
+    prev_fund = hist.cols["FUND_ID"][last]
+    pos = np.searchsorted(prev_fund, cur["FUND_ID"])
+    pos_ok = np.minimum(pos, max(len(prev_fund) - 1, 0))
+    known = (pos < len(prev_fund)) & (prev_fund[pos_ok] == cur["FUND_ID"]) if len(prev_fund) else np.zeros(len(pos), bool)
+    changed = ~known
+    for f in FIELDS:
+        if len(prev_fund):
+            changed |= hist.cols[f][last][pos_ok] != cur[f]
+    gone = prev_fund[~np.isin(prev_fund, cur["FUND_ID"])]
+
+    n_rows = int(changed.sum()) + len(gone)
+    rows = {c: np.concatenate([v[changed], np.full(len(gone), NA_INT if c in SCORE_FIELDS else -1)])
+            for c, v in cur.items() if c != "FUND_ID"}
+    rows["FUND_ID"] = np.concatenate([cur["FUND_ID"][changed], gone])
+    rows["AS_OF"] = np.full(n_rows, as_of_id, dtype=np.int64)
+    rows["ALIVE"] = np.r_[np.ones(int(changed.sum()), dtype=np.int64), np.zeros(len(gone), dtype=np.int64)]
+
+    # Séance republiée: au snapshot suivant, les fonds écrits sans ligne propre à
+    # cette date hériteraient de la nouvelle valeur => ligne reprenant l'état
+    # connu à cette date (ou ALIVE=0), enregistrée au même instant
+    later = [s["as_of"] for s in manifest["snapshots"] if s["as_of"] > as_of_id]
+    anchored = 0
+    if n_rows and later:
+        nxt = min(later)
+        need = rows["FUND_ID"][~np.isin(rows["FUND_ID"], hist.cols["FUND_ID"][hist.cols["AS_OF"] == nxt])]
+        known_next = hist._last_rows(ids_to_dates([nxt])[0])
+        at = lookup(need, hist.cols["FUND_ID"][known_next])
+        alive = at >= 0
+        anchor = {c: np.full(len(need), NA_INT if c in SCORE_FIELDS else -1, dtype=np.int64) for c in FIELDS}
+        for c in FIELDS:
+            anchor[c][alive] = hist.cols[c][known_next[at[alive]]]
+        anchor["FUND_ID"] = need
+        anchor["AS_OF"] = np.full(len(need), nxt, dtype=np.int64)
+        anchor["ALIVE"] = alive.astype(np.int64)
+        rows = {c: np.concatenate([rows[c], anchor[c]]) for c in rows}
+        anchored = len(need)
+
+    total = n_rows + anchored
+    rows["RECORDED_AT"] = np.full(total, recorded, dtype=np.int64)
+    manifest["snapshots"].append({"as_of": as_of_id, "recorded_at": recorded, "rows": total})
+    if total:
+        name = f"seg_{len(manifest['snapshots']):06d}.npz"
+        _write_segment(history_dir / name, rows)
+        manifest["segments"].append({"file": name, "rows": total})
+    _save_manifest(history_dir, manifest)
+
+    if len(manifest["segments"]) > COMPACT_SEGMENTS:
+        _compact(history_dir, manifest)
+    return n_rows
+
+
+# ======================================================
+# Étape du pipeline
+# ======================================================
+def load_current(data_dir=DATA_DIR) -> pd.DataFrame:
+    """Classes / scores courants des trois sorties, joints sur FUND_ID."""
+    frames = []
+    for file, sheet, cols in SOURCES:
+        df = pd.read_excel(Path(data_dir) / file, sheet_name=sheet,
+                           usecols=lambda c: str(c).upper().strip() in ["FUND_ID", *cols])
+        df.columns = df.columns.astype(str).str.upper().str.strip()
+        frames.append(df.dropna(subset=["FUND_ID"]).drop_duplicates("FUND_ID"))
+    out = frames[0]
+    for df in frames[1:]:
+        out = join_on_fund(out, df)
+    return out
+
+
+if __name__ == "__main__":
+    from src.pipeline.tracing import span, step
+    from src.preprocessing.trading_calendar import load_calendar
+
+    print("📥 Chargement risque / projection 30j / recommandations...")
+    with span("load") as s:
+        current = load_current()
+        s.rows = len(current)
+
+    cal = load_calendar()
+    as_of = cal.sessions[-1] if cal is not None and len(cal) else pd.Timestamp.today().normalize()
+
+    step("append", rows=len(current))
+    written = append_snapshot(current, as_of)
+
+    h = load_history()
+    size = sum((HISTORY_DIR / s["file"]).stat().st_size for s in h.manifest["segments"])
+    print(f"✔ Snapshot {pd.Timestamp(as_of).date()} : {written} fonds modifiés / {len(current)}")
+    print(f"✔ Historique : {len(h.manifest['snapshots'])} snapshots, {len(h)} lignes, {size / 1024:.1f} Ko")
+    print(f"\n🎉 Historique des classes de risque → {HISTORY_DIR / MANIFEST}")
@@ -1,7 +1,9 @@
 import os
+import sys
 import time
 import requests
 import pandas as pd
+from pathlib import Path
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
@@ -10,6 +12,10 @@ from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.pipeline.change_capture import SourceManifest
+from src.preprocessing.trading_calendar import dates_from_filenames
+
 # ==========================================================
 # 0) CONFIGURATION DES DOSSIERS
 # ==========================================================
@@ -17,6 +23,10 @@ from webdriver_manager.chrome import ChromeDriverManager
 download_folder = "data/asfim_weekly/"
 os.makedirs(download_folder, exist_ok=True)
 
+# fichiers re-téléchargés (et comparés au sha256 du manifest) si publiés il y a
+# moins de RECHECK_DAYS jours: l'ASFIM peut republier un tableau corrigé
+RECHECK_DAYS = 30
+
 output_file = "performance_hebdomadaire_asfim.xlsx"
 
 # ==========================================================
@@ -129,28 +139,42 @@ print(f"\n🔎 Total fichiers trouvés : {len(all_links)}")
 
 
 # ==========================================================
-# 7) TÉLÉCHARGER UNIQUEMENT LES NOUVEAUX FICHIERS
+# 7) TÉLÉCHARGER LES NOUVEAUX FICHIERS + REVÉRIFIER LES RÉCENTS
 # ==========================================================
 
+manifest = SourceManifest(download_folder)
+names = [nom.replace(" ", "_").replace("/", "-") + ".xlsx" for nom, _ in all_links]
+file_dates = dates_from_filenames(pd.Series(names))
+recheck_from = file_dates.max() - pd.Timedelta(days=RECHECK_DAYS)
+
 downloaded = []
+restated = []
 
-for nom, url in all_links:
-    safe = nom.replace(" ", "_").replace("/", "-") + ".xlsx"
+for (nom, url), safe, file_date in zip(all_links, names, file_dates):
     path = os.path.join(download_folder, safe)
 
-    if os.path.exists(path):
+    if os.path.exists(path) and pd.notna(file_date) and file_date < recheck_from:
         print(f"✔ Déjà présent → {safe}")
     else:
         try:
             print(f"⬇ Téléchargement : {safe}")
             r = requests.get(url)
-            with open(path, "wb") as f:
-                f.write(r.content)
+            r.raise_for_status()   # une page d'erreur ne remplace pas un fichier valide
+            status = manifest.record(safe, r.content)
+            if status == "restated":
+                restated.append(safe)
+                print(f"♻ Republication détectée (contenu modifié) : {safe}")
         except Exception as e:
             print(f"❌ Erreur téléchargement {safe} :", e)
 
     downloaded.append(path)
 
+manifest.save()
+print(f"✔ Fichiers republiés : {len(restated)}")
+
+# ordre de fusion = ordre de publication: à doublon (ISIN, date), clean garde la dernière version
+downloaded = manifest.by_publication(downloaded)
+
 
 # ==========================================================
 # 8) FUSION DES FICHIERS EXCEL HEBDOMADAIRES
@@ -3,21 +3,35 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from src.app.columns import usecols
+from src.app.downsample import downsample_frame, memo
+from src.app.fund_reference import fund_label, load_fund_reference
+from src.app.anomaly_index import (
+    build_anomaly_index, company_isins, count_rows, date_extent, filter_ranges, range_positions, top_recent,
+)
+
 DATA_DIR = Path("src/scraper")
 FILE = DATA_DIR / "anomaly_results_daily.xlsx"
 
+# Colonnes utilisées par la page (filtres, flag, graphes, table): seules colonnes lues
+REQUIRED_COLUMNS = (
+    "DATE", "CODE_ISIN", "OPCVM", "SOCIETE_DE_GESTION", "CLASSIFICATION", "VL",
+    "RET_1J", "ZSCORE_1J", "VOL_20D", "DRAWDOWN", "ANOMALY_SCORE_IF",
+    "ANOMALY_LABEL_IF", "ANOMALY_FLAG", "ANOMALY_FLAG_IF", "IS_ANOMALY",
+)
+
 # Limites anti-freeze (tu peux ajuster)
 MAX_CHART_POINTS_DEFAULT = 1200
 MAX_TABLE_ROWS_DEFAULT = 1200
 
 
 @st.cache_data(ttl=3600, show_spinner=False)
-def load_daily() -> pd.DataFrame:
+def load_daily(columns: tuple | None = REQUIRED_COLUMNS) -> pd.DataFrame:
     if not FILE.exists():
         raise FileNotFoundError(f"Fichier introuvable: {FILE}")
 
-    # Lecture brute
-    df = pd.read_excel(FILE)
+    # Lecture projetée (None => toutes les colonnes)
+    df = pd.read_excel(FILE, usecols=usecols(columns))
 
     # Normaliser noms colonnes
     df.columns = df.columns.astype(str).str.upper().str.strip()
@@ -43,31 +57,33 @@ def load_daily() -> pd.DataFrame:
     return df
 
 
-def _infer_anomaly_count(df: pd.DataFrame) -> int:
-    """Compter anomalies de façon robuste."""
-    for c in ["ANOMALY_LABEL_IF", "ANOMALY_FLAG", "ANOMALY_LABEL", "IS_ANOMALY"]:
-        if c in df.columns:
-            s = df[c]
-            # IF classique: -1 anomalie / 1 normal
-            if c == "ANOMALY_LABEL_IF":
-                return int((pd.to_numeric(s, errors="coerce") == -1).sum())
-
-            # bool / numeric / string
-            if s.dtype == bool:
-                return int(s.sum())
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_daily_index(mtime: float):
+    """
+    Index trié (CODE_ISIN, DATE) de la table daily, construit une fois par version
+    du fichier (mtime) et partagé entre les reruns: chaque changement de filtre ne
+    coûte ensuite que la taille du résultat.
+    """
+    df = load_daily()
+    if "DATE" not in df.columns:
+        df = df.assign(DATE=pd.NaT)
+    return build_anomaly_index(df, "DATE", flag=_anomaly_flag(df).to_numpy())
 
-            sn = pd.to_numeric(s, errors="coerce")
-            if sn.notna().any():
-                return int((sn.astype("Int64") == 1).sum())
 
-            ss = s.astype(str).str.upper().str.strip()
-            return int(ss.isin(["-1", "ANOMALY", "TRUE", "1"]).sum())
-    return 0
+def _anomaly_flag(df: pd.DataFrame) -> pd.Series:
+    """Flag anomalie ligne à ligne (IF: -1 = anomalie, sinon flag 0/1)."""
+    if "ANOMALY_LABEL_IF" in df.columns:
+        return pd.to_numeric(df["ANOMALY_LABEL_IF"], errors="coerce") == -1
+    for c in ["ANOMALY_FLAG", "ANOMALY_FLAG_IF", "IS_ANOMALY"]:
+        if c in df.columns:
+            return pd.to_numeric(df[c], errors="coerce") == 1
+    return pd.Series(False, index=df.index)
 
 
-def _downsample_time_series(df_ts: pd.DataFrame, date_col: str, max_points: int) -> pd.DataFrame:
+def _downsample_time_series(df_ts: pd.DataFrame, date_col: str, max_points: int, keep_col: str | None = None) -> pd.DataFrame:
     """
-    Anti-freeze: agrège par date + downsample si trop de points.
+    Anti-freeze: agrège par date + downsample LTTB si trop de points
+    (pics / creux conservés, jours avec anomalie toujours gardés via keep_col).
     df_ts doit contenir date_col + colonnes numériques.
     """
     if df_ts.empty:
@@ -77,16 +93,15 @@ def _downsample_time_series(df_ts: pd.DataFrame, date_col: str, max_points: int)
     d[date_col] = pd.to_datetime(d[date_col], errors="coerce")
     d = d.dropna(subset=[date_col]).sort_values(date_col)
 
-    # Agrégation par date (si plusieurs lignes par jour)
-    num_cols = [c for c in d.columns if c != date_col]
-    d = d.groupby(pd.Grouper(key=date_col, freq="D"))[num_cols].mean(numeric_only=True).reset_index()
-    d = d.dropna(subset=[date_col])
-
-    if len(d) <= max_points:
-        return d
+    # Agrégation par date (si plusieurs lignes par jour); anomalie du jour = au moins une
+    num_cols = [c for c in d.columns if c not in (date_col, keep_col)]
+    g = d.groupby(pd.Grouper(key=date_col, freq="D"))
+    agg = g[num_cols].mean(numeric_only=True)
+    if keep_col:
+        agg[keep_col] = g[keep_col].max()
+    d = agg.reset_index().dropna(subset=[date_col])
 
-    step = int(np.ceil(len(d) / max_points))
-    return d.iloc[::step, :]
+    return downsample_frame(d, date_col, num_cols, max_points, keep_col=keep_col)
 
 
 def _histogram_series(s: pd.Series, bins: int) -> pd.Series:
@@ -116,16 +131,18 @@ def render():
     except Exception as e:
         st.warning(f"Impossible de préparer le téléchargement: {e}")
 
-    # Load data
+    # Load data (index pré-construit, partagé entre les reruns)
     try:
-        df_all = load_daily()
+        if not FILE.exists():
+            raise FileNotFoundError(f"Fichier introuvable: {FILE}")
+        index = load_daily_index(FILE.stat().st_mtime)
+    except KeyError:
+        st.error("Colonne CODE_ISIN introuvable dans anomaly_results_daily.xlsx")
+        return
     except Exception as e:
         st.error(str(e))
         return
-
-    if "CODE_ISIN" not in df_all.columns:
-        st.error("Colonne CODE_ISIN introuvable dans anomaly_results_daily.xlsx")
-        return
+    df_all = index["df"]
 
     # Options performance
     st.divider()
@@ -139,30 +156,32 @@ def render():
 
     st.divider()
 
-    # Filtres
+    # Filtres (résolus sur l'index: société -> ISIN -> intervalles de dates)
     colA, colB, colC = st.columns([1.4, 1.4, 1.2])
-    df = df_all
 
     # Société
-    if "SOCIETE_DE_GESTION" in df.columns:
-        companies = sorted([c for c in df["SOCIETE_DE_GESTION"].dropna().unique().tolist() if c and c != "NAN"])
+    if "SOCIETE_DE_GESTION" in df_all.columns:
+        companies = sorted([c for c in index["by_company"] if c and c != "NAN"])
         selected_company = colA.selectbox("Société de gestion", ["(ALL)"] + companies, index=0)
-        if selected_company != "(ALL)":
-            df = df[df["SOCIETE_DE_GESTION"] == selected_company]
     else:
         colA.info("Colonne SOCIETE_DE_GESTION absente → affichage ALL.")
         selected_company = "(ALL)"
+    company = None if selected_company == "(ALL)" else selected_company
 
     # ISIN
-    isins = sorted(df["CODE_ISIN"].dropna().astype(str).unique().tolist())
-    selected_isin = colB.selectbox("Fonds (CODE_ISIN)", ["(ALL)"] + isins, index=0)
-    if selected_isin != "(ALL)":
-        df = df[df["CODE_ISIN"].astype(str) == str(selected_isin)]
+    isins = company_isins(index, company)
+    ref = load_fund_reference()
+    selected_isin = colB.selectbox(
+        "Fonds (CODE_ISIN)", ["(ALL)"] + isins, index=0,
+        format_func=lambda i: i if i == "(ALL)" else fund_label(ref, i),
+    )
+    isin = None if selected_isin == "(ALL)" else selected_isin
 
     # Date
-    if "DATE" in df.columns and df["DATE"].notna().any():
-        min_d = df["DATE"].min()
-        max_d = df["DATE"].max()
+    dstart = dend = None
+    extent = date_extent(index, company, isin)
+    if extent is not None:
+        min_d, max_d = extent
         start, end = colC.date_input(
             "Période",
             value=(min_d.date(), max_d.date()),
@@ -171,57 +190,69 @@ def render():
         )
         dstart = pd.to_datetime(start)
         dend = pd.to_datetime(end) + pd.Timedelta(days=1) - pd.Timedelta(milliseconds=1)
-        df = df[(df["DATE"] >= dstart) & (df["DATE"] <= dend)]
     else:
         colC.info("Pas de DATE exploitable → pas de filtre période.")
 
+    ranges = filter_ranges(index, company, isin, dstart, dend)
+
     # Résumé
     st.subheader("Résumé")
-    total_rows = int(len(df))
-    total_anom = _infer_anomaly_count(df)
+    total_rows, total_anom = count_rows(index, ranges)
 
     c1, c2, c3 = st.columns(3)
     c1.metric("Nb lignes", total_rows)
     c2.metric("Nb anomalies", total_anom)
     c3.metric("Taux anomalies (%)", round((total_anom / total_rows * 100), 2) if total_rows else 0.0)
 
-    # Table (limit)
+    # Table (limit): les N plus récentes sans tri global
     st.subheader("Table (limitée)")
-    if df.empty:
+    if total_rows == 0:
         st.warning("Aucune donnée après filtres.")
         return
 
-    df_view = df
-    if "DATE" in df_view.columns:
-        df_view = df_view.sort_values("DATE", ascending=False)
-
-    if fast_mode and len(df_view) > max_rows:
-        st.info(f"Affichage limité à {max_rows} lignes (sur {len(df_view)}). Augmente 'Max lignes tableau' si besoin.")
-        df_view = df_view.head(max_rows)
+    n_view = min(max_rows, total_rows) if fast_mode else total_rows
+    if n_view < total_rows:
+        st.info(f"Affichage limité à {max_rows} lignes (sur {total_rows}). Augmente 'Max lignes tableau' si besoin.")
+    df_view = df_all.iloc[top_recent(index, ranges, n_view)]
 
     st.dataframe(df_view, use_container_width=True, height=520)
 
+    # lignes filtrées (graphes / histogramme)
+    positions = range_positions(index, ranges)
+    df = df_all.iloc[positions]
+    flag = pd.Series(index["anomaly"][positions], index=df.index)
+
     # Graphes
     st.subheader("Graphes (optimisés)")
     if fast_mode:
         st.caption("Mode rapide activé : agrégation par date + downsample anti-freeze.")
 
+    # clé de cache des séries: version du fichier + filtres + résolution
+    chart_key = (
+        FILE.stat().st_mtime if FILE.exists() else 0,
+        selected_company, selected_isin, str(dstart), str(dend),
+        total_rows, max_points,
+    )
+
+    def _chart_frame(cols):
+        tmp = df[["DATE"] + cols].dropna()
+        if tmp.empty or not fast_mode:
+            return tmp
+        tmp = tmp.assign(_ANOMALY=flag.loc[tmp.index])
+        return _downsample_time_series(tmp, "DATE", max_points=max_points, keep_col="_ANOMALY")
+
     # 1) Anomaly Score IF (time series)
     if "DATE" in df.columns and "ANOMALY_SCORE_IF" in df.columns:
-        tmp = df[["DATE", "ANOMALY_SCORE_IF"]].dropna()
+        tmp = memo(("daily_score_if",) + chart_key + (fast_mode,), lambda: _chart_frame(["ANOMALY_SCORE_IF"]))
         if not tmp.empty:
-            if fast_mode:
-                tmp = _downsample_time_series(tmp, "DATE", max_points=max_points)
             tmp = tmp.set_index("DATE")
             st.line_chart(tmp["ANOMALY_SCORE_IF"], height=260)
 
     # 2) VOL / DRAWDOWN / ZSCORE (time series)
     metrics = [c for c in ["VOL_20D", "DRAWDOWN", "ZSCORE_1J"] if c in df.columns]
     if "DATE" in df.columns and metrics:
-        tmp2 = df[["DATE"] + metrics].dropna()
+        tmp2 = memo(("daily_metrics", tuple(metrics)) + chart_key + (fast_mode,), lambda: _chart_frame(metrics))
         if not tmp2.empty:
-            if fast_mode:
-                tmp2 = _downsample_time_series(tmp2, "DATE", max_points=max_points)
             tmp2 = tmp2.set_index("DATE")
             st.line_chart(tmp2[metrics], height=320)
 
@@ -2,11 +2,18 @@ import streamlit as st
 import pandas as pd
 from pathlib import Path
 
-from src.app.api_anomaly_weekly import load_weekly_anomalies, get_weekly_filters
+from src.app.api_anomaly_weekly import FLAG_COLUMNS, load_weekly_anomalies, get_weekly_filters
 
 DATA_DIR = Path("src/scraper")
 WEEKLY_FILE = DATA_DIR / "anomaly_results_weekly.xlsx"
 
+# Colonnes utilisées par la page (seules colonnes lues dans le fichier)
+REQUIRED_COLUMNS = (
+    "CODE_ISIN", "OPCVM", "DENOMINATION_OPCVM", "SOCIETE_DE_GESTION", "WEEK_DATE",
+    "RET_1W", "ZSCORE_1W", "VOL_12W", "DRAWDOWN", "MOM_4W", "MOM_12W",
+    *FLAG_COLUMNS,
+)
+
 
 def _download_excel_button():
     if not WEEKLY_FILE.exists():
@@ -31,7 +38,7 @@ def render():
 
     # Chargement (cache)
     try:
-        df = load_weekly_anomalies()
+        df = load_weekly_anomalies(REQUIRED_COLUMNS)
     except Exception as e:
         st.error(str(e))
         return
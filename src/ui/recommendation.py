@@ -2,12 +2,12 @@ import streamlit as st
 import pandas as pd
 
 from src.app.api_recommendation import (
-    load_recommendations_merged,
+    load_priority_index,
     load_recommendations_summary,
-    get_company_options,
-    filter_by_company,
+    get_company_entry,
+    get_top_k,
+    get_bucket_rows,
     get_reco_file_bytes,
-    build_reco_kpis,
 )
 
 def render():
@@ -16,7 +16,7 @@ def render():
 
     # ===== Load =====
     try:
-        df_merged = load_recommendations_merged()
+        index = load_priority_index()
         df_summary = load_recommendations_summary()
     except Exception as e:
         st.error(f"Erreur de chargement des recommandations: {e}")
@@ -35,13 +35,15 @@ def render():
         st.warning(f"Download indisponible: {e}")
 
     # ===== Company filter =====
-    companies = get_company_options(df_merged)
+    companies = index["companies"]
     company = st.selectbox("Société de gestion", companies, index=0)
 
-    df_company = filter_by_company(df_merged, company)
+    # bloc pré-calculé (déjà trié par PRIORITY_SCORE)
+    entry = get_company_entry(index, company)
+    df_company = entry["rows"]
 
     # ===== KPIs =====
-    kpis = build_reco_kpis(df_company)
+    kpis = entry["kpis"]
 
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Fonds", int(kpis["total_funds"]))
@@ -93,43 +95,36 @@ def render():
         if not want:
             st.dataframe(df_company.head(200), use_container_width=True)
         else:
-            view = df_company[want].copy()
-
-            # Tri "intelligent"
-            if "PRIORITY_SCORE" in view.columns:
-                view = view.sort_values("PRIORITY_SCORE", ascending=False)
-            elif "AVG_PRIORITY_SCORE" in view.columns:
-                view = view.sort_values("AVG_PRIORITY_SCORE", ascending=False)
-
-            st.dataframe(view, use_container_width=True, height=520)
+            # déjà trié par priorité dans l'index
+            st.dataframe(df_company[want], use_container_width=True, height=520)
 
         # Top 15 par priorité (graph)
         if "PRIORITY_SCORE" in df_company.columns and "OPCVM" in df_company.columns:
-            top = df_company[["OPCVM", "PRIORITY_SCORE"]].copy()
-            top["PRIORITY_SCORE"] = pd.to_numeric(top["PRIORITY_SCORE"], errors="coerce")
-            top = top.dropna().sort_values("PRIORITY_SCORE", ascending=False).head(15).set_index("OPCVM")
+            top = get_top_k(index, company, k=15)[["OPCVM", "PRIORITY_SCORE"]].dropna().set_index("OPCVM")
             st.subheader("Top 15 (Priority Score)")
             st.bar_chart(top)
 
+        # Compteurs par recommandation (pré-calculés)
+        counts = pd.Series(entry["counts"], name="NB_FUNDS")
+        counts = counts[counts > 0]
+        if not counts.empty:
+            st.subheader("Fonds par recommandation")
+            st.bar_chart(counts)
+
     # ----------------
     # TAB 3: Watchlist
     # ----------------
     with tab3:
         st.subheader("Fonds à surveiller (WATCHLIST / KEEP_WATCH)")
 
-        reco_col = "RECOMMENDATION" if "RECOMMENDATION" in df_company.columns else None
-        if not reco_col:
+        if not index.get("reco_col"):
             st.info("Colonne RECOMMENDATION introuvable dans ALL_FUNDS_RECO.")
             st.stop()
 
-        watch = df_company[df_company[reco_col].astype(str).str.contains("WATCH", case=False, na=False)].copy()
+        # buckets *WATCH* de l'index (ordre de priorité conservé)
+        watch = get_bucket_rows(index, company, "WATCH")
 
         if watch.empty:
             st.success("Aucun fonds Watchlist détecté pour ce filtre.")
         else:
-            # affiche trié par priorité si possible
-            if "PRIORITY_SCORE" in watch.columns:
-                watch["PRIORITY_SCORE"] = pd.to_numeric(watch["PRIORITY_SCORE"], errors="coerce")
-                watch = watch.sort_values("PRIORITY_SCORE", ascending=False)
-
             st.dataframe(watch, use_container_width=True, height=520)
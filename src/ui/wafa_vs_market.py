@@ -6,12 +6,27 @@ from src.app.api_wafa_vs_market import (
     get_hist_file_path,
     get_30d_file_path,
     get_file_bytes,
-    load_all_sheets,
+    list_sheets,
+    load_sheet,
+    sheet_columns,
     list_companies,
     filter_company,
     filter_isin,
     compute_basic_metrics,
+    load_peer_cube,
+    list_peer_companies,
+    get_company_vs_market,
+    company_vs_market_table,
+    load_peer_daily_series,
+    get_company_series,
+    load_benchmark_metrics,
+    fund_performance,
+    fund_cumulative,
+    panel_version,
 )
+from src.app.downsample import downsample_frame, memo
+
+CHART_MAX_POINTS = 1000
 
 
 def _fmt(x, digits=3):
@@ -126,17 +141,79 @@ def _render_visuals(df: pd.DataFrame, title_prefix: str):
         st.dataframe(corr, use_container_width=True)
 
 
+def _render_peer_cube():
+    """
+    Société (au choix) vs marché hors société: simple lookup dans le cube pré-calculé.
+    """
+    try:
+        cube = load_peer_cube()
+    except Exception as e:
+        st.info(f"Cube société vs marché indisponible: {e}")
+        return
+
+    companies = list_peer_companies(cube)
+    if not companies:
+        st.info("Cube société vs marché vide.")
+        return
+
+    default = next((i for i, c in enumerate(companies) if "WAFA" in c), 0)
+    company = st.selectbox("Société (vs marché hors société)", companies, index=default, key="peer_company")
+    rows = get_company_vs_market(cube, company)
+
+    labels = {"HIST": "Historique", "30D": "Horizon 30 jours", "PERF": "Performance"}
+    tabs = st.tabs([labels.get(h, h) for h in rows])
+    for tab, (horizon, row) in zip(tabs, rows.items()):
+        with tab:
+            if not row:
+                st.info("Société absente de cet horizon.")
+                continue
+            st.dataframe(company_vs_market_table(row), use_container_width=True, hide_index=True)
+
+    # ========= Tendance quotidienne (série pré-agrégée) =========
+    try:
+        series = load_peer_daily_series()
+    except Exception as e:
+        st.info(f"Série quotidienne indisponible: {e}")
+        return
+
+    metric_labels = {
+        "RISK_POINTS": "Risque moyen (points)",
+        "PCT_HIGH_RISK": "% fonds HIGH_RISK",
+        "YTD": "Perf YTD moyenne",
+        "1_MOIS": "Perf 1 mois moyenne",
+    }
+    metric = st.selectbox(
+        "Tendance quotidienne",
+        options=list(metric_labels),
+        format_func=lambda k: metric_labels[k],
+        key="peer_metric",
+    )
+    ts = memo(
+        ("peer_series", company, metric, len(series), str(series["DATE"].max()), CHART_MAX_POINTS),
+        lambda: downsample_frame(
+            get_company_series(series, company, metric).reset_index(), "DATE",
+            ["COMPANY", "MARKET_EX_COMPANY", "SPREAD"], CHART_MAX_POINTS,
+        ).set_index("DATE"),
+    )
+    if ts.empty:
+        st.info("Pas d'historique quotidien pour cette société.")
+    else:
+        st.line_chart(ts[["COMPANY", "MARKET_EX_COMPANY"]], height=280)
+        st.caption("Écart société - marché hors société")
+        st.area_chart(ts["SPREAD"], height=180)
+
+
 def render():
     st.title("Wafa vs Market")
     st.caption("Comparaison performance & risque vs benchmark (Historique + Horizon 30 jours) — toutes feuilles.")
 
-    # ========= Load all sheets =========
+    # ========= Feuilles (noms + en-têtes seulement, chargement à la demande) =========
     try:
         hist_path = get_hist_file_path()
         d30_path = get_30d_file_path()
 
-        hist_sheets = load_all_sheets(hist_path)
-        d30_sheets = load_all_sheets(d30_path)
+        hist_sheets = list_sheets(hist_path)
+        d30_sheets = list_sheets(d30_path)
     except Exception as e:
         st.error(f"Erreur de chargement Wafa vs Market: {e}")
         st.stop()
@@ -162,14 +239,20 @@ def render():
 
     st.divider()
 
+    # ========= Toute société vs marché (cube) =========
+    st.header("🏢 Société vs Marché (hors société)")
+    _render_peer_cube()
+
+    st.divider()
+
     # ========= Choisir une feuille “référence” pour filtres =========
-    def _first_df_with_company(sheets_dict):
-        for _, d in sheets_dict.items():
-            if "SOCIETE_DE_GESTION" in d.columns:
-                return d
-        return next(iter(sheets_dict.values()))
+    def _first_sheet_with_company(path):
+        for name, cols in sheet_columns(path).items():
+            if "SOCIETE_DE_GESTION" in cols:
+                return name
+        return list_sheets(path)[0]
 
-    df_ref = _first_df_with_company(hist_sheets)
+    df_ref = load_sheet(hist_path, _first_sheet_with_company(hist_path))
     companies = list_companies(df_ref)
     company = st.selectbox("Société de gestion", companies, index=0)
 
@@ -179,14 +262,61 @@ def render():
         isins = ["ALL"] + sorted(isins)
         isin = st.selectbox("Filtrer par ISIN", isins, index=0)
 
+    # ========= Bêta / corrélation vs indice catégorie =========
+    st.divider()
+    st.header("📐 Risque relatif vs indice catégorie")
+    try:
+        bench = load_benchmark_metrics()
+        dfb = filter_isin(filter_company(bench, company.upper() if company != "ALL" else company), isin)
+        m = compute_basic_metrics(dfb)
+        tcol = "TRACKING_ERROR" if "TRACKING_ERROR" in dfb.columns else None
+        b1, b2, b3, b4 = st.columns(4)
+        b1.metric("Beta (avg)", _fmt(m["beta"]))
+        b2.metric("Corr (avg)", _fmt(m["correlation"]))
+        b3.metric("Sharpe (avg)", _fmt(m["sharpe"]))
+        b4.metric("Tracking error (avg)", _fmt(pd.to_numeric(dfb[tcol], errors="coerce").mean() if tcol else None))
+        st.caption(f"Fonds: {int(m['n_rows'])} — fenêtre glissante par défaut (colonnes *_30D / *_90D / *_250D dans le tableau)")
+        with st.expander("Détail par fonds", expanded=False):
+            st.dataframe(dfb, use_container_width=True, hide_index=True)
+    except Exception as e:
+        st.info(f"Analytics vs indice catégorie indisponibles: {e}")
+
+    # ========= Performance / volatilité (panel VL memory-mappé) =========
+    st.divider()
+    st.header("📊 Performance par fonds (panel VL)")
+    try:
+        scope = filter_isin(filter_company(df_ref, company), isin)
+        isins_perf = None
+        if (company != "ALL" or isin != "ALL") and "CODE_ISIN" in scope.columns:
+            isins_perf = scope["CODE_ISIN"].dropna().astype(str).unique().tolist()
+        perf = fund_performance(isins_perf)
+        p1, p2, p3 = st.columns(3)
+        p1.metric("Performance (avg)", _fmt(perf["PERFORMANCE"].mean()))
+        p2.metric("Volatilité ann. (avg)", _fmt(perf["VOLATILITY"].mean()))
+        p3.metric("Max drawdown (avg)", _fmt(perf["MAX_DRAWDOWN"].mean()))
+        if isin != "ALL":
+            cum = fund_cumulative(isin)
+            ts = memo(
+                ("panel_cumulative", isin, panel_version(), CHART_MAX_POINTS),
+                lambda: downsample_frame(
+                    cum.rename("PERFORMANCE").rename_axis("DATE").reset_index(), "DATE",
+                    ["PERFORMANCE"], CHART_MAX_POINTS,
+                ).set_index("DATE"),
+            )
+            st.line_chart(ts["PERFORMANCE"], height=260)
+        with st.expander("Détail par fonds", expanded=False):
+            st.dataframe(perf, use_container_width=True, hide_index=True)
+    except Exception as e:
+        st.info(f"Panel VL indisponible: {e}")
+
     st.divider()
     show_all = st.checkbox("Afficher toutes les feuilles (Historique + 30j)", value=False)
 
     # ========= HISTORIQUE =========
     st.header("📈 Historique — Toutes feuilles")
     if not show_all:
-        hist_sheet_name = st.selectbox("Feuille (Historique)", options=list(hist_sheets.keys()))
-        df_hist = filter_isin(filter_company(hist_sheets[hist_sheet_name], company), isin)
+        hist_sheet_name = st.selectbox("Feuille (Historique)", options=hist_sheets)
+        df_hist = filter_isin(filter_company(load_sheet(hist_path, hist_sheet_name), company), isin)
 
         m = compute_basic_metrics(df_hist)
         c1, c2, c3, c4, c5, c6 = st.columns(6)
@@ -200,9 +330,9 @@ def render():
 
         _render_visuals(df_hist, f"Historique — {hist_sheet_name}")
     else:
-        for sname, df in hist_sheets.items():
+        for sname in hist_sheets:
             with st.expander(f"Historique — Feuille: {sname}", expanded=False):
-                dff = filter_isin(filter_company(df, company), isin)
+                dff = filter_isin(filter_company(load_sheet(hist_path, sname), company), isin)
                 m = compute_basic_metrics(dff)
                 c1, c2, c3 = st.columns(3)
                 c1.metric("Outperf(avg)", _fmt(m["outperformance"]))
@@ -216,8 +346,8 @@ def render():
     # ========= 30 JOURS =========
     st.header("🗓️ Horizon 30 jours — Toutes feuilles")
     if not show_all:
-        d30_sheet_name = st.selectbox("Feuille (30 jours)", options=list(d30_sheets.keys()))
-        df_30 = filter_isin(filter_company(d30_sheets[d30_sheet_name], company), isin)
+        d30_sheet_name = st.selectbox("Feuille (30 jours)", options=d30_sheets)
+        df_30 = filter_isin(filter_company(load_sheet(d30_path, d30_sheet_name), company), isin)
 
         m = compute_basic_metrics(df_30)
         c1, c2, c3, c4, c5, c6 = st.columns(6)
@@ -231,9 +361,9 @@ def render():
 
         _render_visuals(df_30, f"30 jours — {d30_sheet_name}")
     else:
-        for sname, df in d30_sheets.items():
+        for sname in d30_sheets:
             with st.expander(f"30 jours — Feuille: {sname}", expanded=False):
-                dff = filter_isin(filter_company(df, company), isin)
+                dff = filter_isin(filter_company(load_sheet(d30_path, sname), company), isin)
                 m = compute_basic_metrics(dff)
                 c1, c2, c3 = st.columns(3)
                 c1.metric("Outperf(avg)", _fmt(m["outperformance"]))